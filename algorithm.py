@@ -1,7 +1,12 @@
 from igraph import *
 from collections import Counter
+from itertools import chain
 import numpy as np
 from string import ascii_lowercase
+from time import perf_counter, process_time
+import sys
+import tracemalloc
+from balancing import solve_transportation, solve_assignment
 
 
 class GenericGraph:
@@ -10,6 +15,65 @@ class GenericGraph:
     """
     def __init__(self, graph: Graph):
         self.graph = graph
+        self.vertex_labels = None   # cached list: vertex index -> label
+        self.label_index = None     # cached dictionary: label -> vertex index
+
+    def get_vertex_labels(self):
+        """
+        Returns labels of all vertices, cached. Cache is rebuilt if number of vertices has changed.
+        :return: list of labels, ordered by vertex index.
+        """
+        if self.vertex_labels is None or len(self.vertex_labels) != self.graph.vcount():
+            self.vertex_labels = self.read_vertex_labels()
+            self.label_index = None
+        return self.vertex_labels
+
+    def read_vertex_labels(self):
+        """
+        :return: list of labels read from the graph (not cached)
+        """
+        return self.graph.vs["label"] if "label" in self.graph.vs.attributes() else [None] * self.graph.vcount()
+
+    def get_vertex_index(self, label):
+        """
+        Returns index of the (first) vertex with given label, using cached label -> index dictionary
+        instead of scanning vertices. Labels changed in place are detected: found vertex has to have the label
+        & before a label is reported as unknown, cached labels are compared with the graph's ones (one pass
+        in igraph, no Python loop) - the dictionary is rebuilt only if they differ.
+        :param label: vertex label
+        :return: vertex index
+        """
+        labels = self.get_vertex_labels()
+        if self.label_index is None:
+            self.label_index = {lbl: idx for idx, lbl in reversed(list(enumerate(labels)))}
+        index = self.label_index.get(label)
+        if index is not None and ("label" not in self.graph.vs.attributes() or self.graph.vs[index]["label"] == label):
+            return index
+
+        current_labels = self.read_vertex_labels()
+        if current_labels != labels:
+            self.vertex_labels = current_labels
+            self.label_index = {lbl: idx for idx, lbl in reversed(list(enumerate(current_labels)))}
+            index = self.label_index.get(label)
+            if index is not None:
+                return index
+        raise UnknownVertexLabel("Unknown vertex label: {}".format(label))
+
+    @staticmethod
+    def make_edge_list(sources, targets):
+        """
+        Converts arrays of edges' ends to the list of (source, target) tuples, as igraph takes edges.
+        Zipping two plain lists is several times faster than converting 2D numpy array to nested lists.
+        :return: list of tuples
+        """
+        return list(zip(np.asarray(sources).tolist(), np.asarray(targets).tolist()))
+
+    def invalidate_labels(self):
+        """
+        Drops cached labels of vertices - has to be called after labels are changed in place.
+        """
+        self.vertex_labels = None
+        self.label_index = None
 
     def is_connected(self):
         """
@@ -18,6 +82,22 @@ class GenericGraph:
         """
         return self.graph.is_connected(mode=WEAK)
 
+    def check_feasibility(self):
+        """
+        Linear time feasibility precheck - strongly connected components, with undirected edges of G
+        (transformed edges of G1 & G2) treated as two-way.
+        :return: FeasibilityReport
+        """
+        g = self.graph
+        edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        if "transformed" in g.es.attributes():
+            two_way = [bool(flag) for flag in g.es["transformed"]]
+        elif "directed" in g.es.attributes():
+            two_way = [not flag for flag in g.es["directed"]]
+        else:
+            two_way = np.zeros(g.ecount(), dtype=bool)
+        return FeasibilityReport(g.vcount(), edges[:, 0], edges[:, 1], two_way)
+
     def plotGraph(self, margin=10, bbox=(1000, 1000)):
         visual_style = {}
         visual_style["layout"] = self.graph.layout("kk")
@@ -54,10 +134,79 @@ class PartiallyDirectedGraph(GenericGraph):
     """
     def __init__(self, full_adjacency_matrix: np.ndarray, weights: list, labels: list = None):
         super(PartiallyDirectedGraph, self).__init__(self.get_graph_from_full_adj_mat(full_adjacency_matrix))
+        self.set_attributes(weights, labels)
+
+    @classmethod
+    def from_edge_arrays(cls, sources, targets, directed, weights=None, labels: list = None,
+                         vertex_count: int = None):
+        """
+        Alternative constructor - creates graph G directly from compact edge arrays.
+        Memory usage is proportional to the number of edges (no full adjacency matrix is built).
+        :param sources: array of edges' start vertices (any of both ends for undirected edges)
+        :param targets: array of edges' end vertices
+        :param directed: boolean array - is given edge directed?
+        :param weights: array of edges' weights
+        :param labels: labels of vertices
+        :param vertex_count: number of vertices; by default deduced from labels or edge arrays
+        :return: partially directed graph.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        directed = np.asarray(directed, dtype=bool)
+
+        # safety check
+        if sources.ndim != 1 or sources.shape != targets.shape or sources.shape != directed.shape:
+            raise RuntimeError("Wrong argument")
+
+        if vertex_count is None:
+            if labels is not None:
+                vertex_count = len(labels)
+            elif sources.size > 0:
+                vertex_count = int(max(sources.max(), targets.max())) + 1
+            else:
+                vertex_count = 0
+        if sources.size > 0 and (min(sources.min(), targets.min()) < 0
+                                 or max(sources.max(), targets.max()) >= vertex_count):
+            raise RuntimeError("Vertex id out of range")
+
+        graph_G = cls.__new__(cls)
+        GenericGraph.__init__(graph_G, cls.build_graph(vertex_count, sources, targets, directed))
+        graph_G.set_attributes(weights, labels)
+        return graph_G
+
+    @classmethod
+    def from_incidence(cls, incidence_matrix, weights=None, labels: list = None):
+        """
+        Alternative constructor - creates graph G from full adjacency (incidence) matrix
+        given either as numpy array or as scipy.sparse matrix (any format).
+        :param incidence_matrix: full adjacency matrix of shape (vertices x edges)
+        :param weights: array of edges' weights
+        :param labels: labels of vertices
+        :return: partially directed graph.
+        """
+        sources, targets, directed = cls.get_edge_arrays_from_full_adj_mat(incidence_matrix)
+        return cls.from_edge_arrays(sources, targets, directed, weights, labels,
+                                    vertex_count=incidence_matrix.shape[0])
+
+    def set_attributes(self, weights, labels: list = None):
+        """
+        Sets labels of vertices & weights of edges.
+        :param weights: edges' weights (None leaves graph unweighted)
+        :param labels: vertices' labels; by default consecutive letters (or vertex ids for bigger graphs)
+        """
         if labels is None:
-            labels = list(ascii_lowercase[:full_adjacency_matrix.shape[0]])
+            vertex_count = self.graph.vcount()
+            if vertex_count <= len(ascii_lowercase):
+                labels = list(ascii_lowercase[:vertex_count])
+            else:
+                labels = [str(i) for i in range(vertex_count)]
+        elif isinstance(labels, np.ndarray):
+            labels = labels.tolist()
+        if isinstance(weights, np.ndarray):
+            weights = weights.tolist()
         self.graph.vs["label"] = labels
         self.graph.es["weight"] = weights
+        self.invalidate_labels()
 
     #-----------------------------------------------------------------------
     def get_edge_between(self, vertex_1, vertex_2):
@@ -96,55 +245,66 @@ class PartiallyDirectedGraph(GenericGraph):
         :param full_adjacency_matrix: (list of lists) full adjacency matrix
         :return: Directed graph with edges flagged if these are directed or not.
         """
+        sources, targets, directed = PartiallyDirectedGraph.get_edge_arrays_from_full_adj_mat(full_adjacency_matrix)
+        return PartiallyDirectedGraph.build_graph(full_adjacency_matrix.shape[0], sources, targets, directed)
+
+    @staticmethod
+    def get_edge_arrays_from_full_adj_mat(full_adjacency_matrix):
+        """
+        Extracts edges from full adjacency matrix (numpy array or scipy.sparse matrix) in a vectorized way.
+        In every column, 1 marks start & -1 marks end of directed edge; two -1 mark undirected edge.
+        :param full_adjacency_matrix: full adjacency matrix of shape (vertices x edges)
+        :return: (sources, targets, directed) - arrays describing consecutive edges (columns)
+        """
         # safety check
         if full_adjacency_matrix.ndim != 2:
             raise RuntimeError("Wrong argument")
-
-        # prepare graph g, at first without edges
-        g = Graph(directed=True)
-        vertex_count = full_adjacency_matrix.shape[0]
         edge_count = full_adjacency_matrix.shape[1]
-        g.add_vertices(vertex_count)
-        edges = np.empty((edge_count, 2), dtype=int)
-        directed_flags = np.empty(edge_count, dtype=bool)
-
-        # iterate through the matrix & add edges to the graph
-        end_flag = 'e'
-        start_flag = 's'
-        # for every edge...
-        for edge_idx in range(edge_count):
-
-            new_edge = []   # data structure for edge; consists of 2 tuples: (vertex id , end/start flag)
-            # find vertices incident to the edge
-            for vertex_idx in range(vertex_count):
-                edge_flag = full_adjacency_matrix[vertex_idx][edge_idx]
-                if edge_flag == -1:
-                    new_edge.append((vertex_idx, end_flag))
-                elif edge_flag == 1:
-                    new_edge.append((vertex_idx, start_flag))
-                else:
-                    continue
-                # check if new_edge already consists of 2 vertices
-                if len(new_edge) == 2:
-                    break
 
-            # having obtained new edge, decide if it is directed or undirected
-            if new_edge[0][1] == start_flag and new_edge[1][1] == end_flag:
-                edge_to_add = (new_edge[0][0], new_edge[1][0])
-                directed_flags[edge_idx] = True
-            elif new_edge[0][1] == end_flag and new_edge[1][1] == start_flag:
-                edge_to_add = (new_edge[1][0], new_edge[0][0])
-                directed_flags[edge_idx] = True
-            elif new_edge[0][1] == end_flag and new_edge[1][1] == end_flag:
-                edge_to_add = (new_edge[0][0], new_edge[1][0])
-                directed_flags[edge_idx] = False
-            else:
-                raise RuntimeError("Incorrect structure of full_adjacency_matrix!")
-            edges[edge_idx][0] = edge_to_add[0]
-            edges[edge_idx][1] = edge_to_add[1]
+        # get non-zero cells only - for sparse matrices without densifying them
+        if hasattr(full_adjacency_matrix, "tocoo"):
+            coo = full_adjacency_matrix.tocoo()
+            coo.sum_duplicates()
+            rows, cols, values = coo.row, coo.col, coo.data
+            is_nonzero = values != 0
+            rows, cols, values = rows[is_nonzero], cols[is_nonzero], values[is_nonzero]
+        else:
+            full_adjacency_matrix = np.asarray(full_adjacency_matrix)
+            rows, cols = np.nonzero(full_adjacency_matrix)
+            values = full_adjacency_matrix[rows, cols]
+
+        # every edge (column) has to be incident to exactly 2 vertices
+        if np.any(np.bincount(cols, minlength=edge_count) != 2):
+            raise RuntimeError("Incorrect structure of full_adjacency_matrix!")
+
+        # sort cells by column, then by row - so the pair for k-th edge lies at positions 2k & 2k+1
+        order = np.lexsort((rows, cols))
+        rows = rows[order].reshape(edge_count, 2)
+        values = values[order].reshape(edge_count, 2)
+        first_flag, second_flag = values[:, 0], values[:, 1]
+
+        is_forward = (first_flag == 1) & (second_flag == -1)
+        is_backward = (first_flag == -1) & (second_flag == 1)
+        is_undirected = (first_flag == -1) & (second_flag == -1)
+        if not np.all(is_forward | is_backward | is_undirected):
+            raise RuntimeError("Incorrect structure of full_adjacency_matrix!")
+
+        sources = np.where(is_backward, rows[:, 1], rows[:, 0])
+        targets = np.where(is_backward, rows[:, 0], rows[:, 1])
+        return sources, targets, ~is_undirected
 
-        g.add_edges(list(map(tuple, edges)))
-        g.es['directed'] = directed_flags.tolist()
+    @staticmethod
+    def build_graph(vertex_count: int, sources: np.ndarray, targets: np.ndarray, directed: np.ndarray):
+        """
+        Builds igraph's directed graph with all edges added in one bulk call.
+        :param vertex_count: number of vertices
+        :param sources: array of edges' start vertices
+        :param targets: array of edges' end vertices
+        :param directed: boolean array - is given edge directed?
+        :return: Directed graph with edges flagged if these are directed or not.
+        """
+        g = Graph(n=vertex_count, edges=GenericGraph.make_edge_list(sources, targets), directed=True)
+        g.es["directed"] = np.asarray(directed, dtype=bool).tolist()
         return g
 
     @staticmethod
@@ -154,7 +314,25 @@ class PartiallyDirectedGraph(GenericGraph):
         :param adjacency_matrix: Full adjacency matrix representing graph.
         :return: partially directed graph.
         """
+        sources, targets = PartiallyDirectedGraph.transform_adj_mat_to_edges(adjacency_matrix)
+        vertex_count = adjacency_matrix.shape[0]
+        edge_ids = np.arange(sources.size)
+
+        # transform edges to full adjacency matrix
+        full_adjacency_matrix = np.zeros((vertex_count, sources.size), dtype=np.int16)
+        full_adjacency_matrix[sources, edge_ids] = 1
+        full_adjacency_matrix[targets, edge_ids] = -1
 
+        return full_adjacency_matrix
+
+    @staticmethod
+    def transform_adj_mat_to_edges(adjacency_matrix):
+        """
+        Extracts directed edges from adjacency matrix (igraph's Matrix, numpy array or scipy.sparse matrix).
+        Cost is linear in number of non-zero cells; edges are ordered by (source, target).
+        :param adjacency_matrix: Adjacency matrix representing graph.
+        :return: (sources, targets) - arrays of edges' start & end vertices.
+        """
         if isinstance(adjacency_matrix, Matrix):
             adjacency_matrix = np.array(adjacency_matrix.data, dtype=np.int16)
 
@@ -162,26 +340,47 @@ class PartiallyDirectedGraph(GenericGraph):
         if adjacency_matrix.ndim != 2 or adjacency_matrix.shape[0] != adjacency_matrix.shape[1]:
             raise RuntimeError("Wrong argument")
 
-        vertex_count = adjacency_matrix.shape[0]
-        # get all edges
-        edges = set()
-        for i in range(vertex_count):
-            for j in range(vertex_count):
-                if adjacency_matrix[i][j] > 0:
-                    edges.add((i, j))
+        if hasattr(adjacency_matrix, "tocoo"):
+            coo = adjacency_matrix.tocoo()
+            coo.sum_duplicates()
+            is_edge = coo.data > 0
+            sources, targets = coo.row[is_edge], coo.col[is_edge]
+            order = np.lexsort((targets, sources))
+            return sources[order].astype(np.int64), targets[order].astype(np.int64)
 
-        # transform edges to full adjacency matrix
-        full_adjacency_matrix = np.zeros((vertex_count, len(edges)), dtype=np.int16)
-        for i, edge in enumerate(edges):
-            full_adjacency_matrix[edge[0]][i] = 1
-            full_adjacency_matrix[edge[1]][i] = -1
+        sources, targets = np.nonzero(np.asarray(adjacency_matrix) > 0)
+        return sources.astype(np.int64), targets.astype(np.int64)
 
-        return full_adjacency_matrix
+    @staticmethod
+    def get_canonical_edges(sources: np.ndarray, targets: np.ndarray, directed: np.ndarray, weights=None):
+        """
+        Returns canonical, sorted representation of the edge multiset.
+        Undirected edges have their ends ordered, so (u, v) & (v, u) are the same edge.
+        :param sources: array of edges' start vertices
+        :param targets: array of edges' end vertices
+        :param directed: boolean array - is given edge directed?
+        :param weights: array of edges' weights - if given, weight is a part of the edge
+        :return: array of shape (edges x 3) with rows (source, target, directed flag), sorted
+                 (edges x 4 float array with weight in the last column, if weights are given).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        directed = np.asarray(directed, dtype=np.int64)
+        first = np.where(directed, sources, np.minimum(sources, targets))
+        second = np.where(directed, targets, np.maximum(sources, targets))
+        if weights is None:
+            order = np.lexsort((directed, second, first))
+            return np.column_stack((first[order], second[order], directed[order]))
+        weights = np.asarray(weights, dtype=float)
+        order = np.lexsort((weights, directed, second, first))
+        return np.column_stack((first[order], second[order], directed[order], weights[order]))
 
     @staticmethod
     def are_full_adj_mat_equal(adj_mat_1: np.ndarray, adj_mat_2: np.ndarray):
         """
         Method that compares two full adjacency matrices and checks if there are representing the same graph.
+        Columns are compared as multisets (parallel edges have to occur the same number of times),
+        regardless of their order. Cost is a sort plus a compare.
         :param adj_mat_1: First full adjacency matrix
         :param adj_mat_2: Second full adjacency matrix
         :return: Boolean value - if these are equal.
@@ -190,18 +389,110 @@ class PartiallyDirectedGraph(GenericGraph):
         if adj_mat_1.shape != adj_mat_2.shape:
             return False
 
-        are_equal = True
-        for i in range(adj_mat_1.shape[1]):
-            is_column_ok = False
-            for j in range(adj_mat_2.shape[1]):
-                if np.array_equal(adj_mat_1[:, i], adj_mat_2[:, j]):
-                    is_column_ok = True
-                    break
-            if not is_column_ok:
-                are_equal = False
-                break
+        try:
+            edges_1 = PartiallyDirectedGraph.get_canonical_edges(
+                *PartiallyDirectedGraph.get_edge_arrays_from_full_adj_mat(adj_mat_1))
+            edges_2 = PartiallyDirectedGraph.get_canonical_edges(
+                *PartiallyDirectedGraph.get_edge_arrays_from_full_adj_mat(adj_mat_2))
+        except RuntimeError:
+            # columns not describing proper edges - compare lexicographically sorted columns
+            if hasattr(adj_mat_1, "toarray"):
+                adj_mat_1 = adj_mat_1.toarray()
+            if hasattr(adj_mat_2, "toarray"):
+                adj_mat_2 = adj_mat_2.toarray()
+            adj_mat_1, adj_mat_2 = np.asarray(adj_mat_1), np.asarray(adj_mat_2)
+            edges_1 = adj_mat_1[:, np.lexsort(adj_mat_1[::-1])]
+            edges_2 = adj_mat_2[:, np.lexsort(adj_mat_2[::-1])]
+
+        return np.array_equal(edges_1, edges_2)
+
+
+class ShortestPaths:
+    """
+    Shortest paths in graph with penalty edges (G2) from vertices with positive degree
+    to vertices with negative degree - used for balancing graph G1.
+    One Dijkstra search is run per distinct source vertex against all targets at once (search stops
+    when all targets are settled). Predecessor trees are kept, so paths are reconstructed without searching again.
+    """
+    def __init__(self, g2: GenericGraph, sources, targets, reuse: tuple = None):
+        """
+        :param g2: graph with penalty edges
+        :param sources: ids of paths' start vertices
+        :param targets: ids of paths' end vertices
+        :param reuse: (previous ShortestPaths, ids of sources whose results are still valid, array mapping ids
+                      of previous graph's edges to ids of g2's edges) - valid results are copied instead of
+                      searching again; they are used only if previous targets include all the targets
+        """
+        self.graph = g2.graph
+        self.sources = np.unique(np.asarray(sources, dtype=np.int64))
+        self.targets = np.unique(np.asarray(targets, dtype=np.int64))
+        self.source_index = {vertex: i for i, vertex in enumerate(self.sources.tolist())}
+        self.target_index = {vertex: j for j, vertex in enumerate(self.targets.tolist())}
+        self.distances = np.full((self.sources.size, self.targets.size), np.inf)
+        # for every source: (sorted ids of vertices in the tree, ids of edges leading to them)
+        self.predecessors = []
+
+        edges = np.array(self.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        self.edge_sources = edges[:, 0]
+        edge_targets = edges[:, 1]
+        weights = np.asarray(self.graph.es["weight"], dtype=float)
+        targets_list = self.targets.tolist()
+        if reuse is not None:
+            previous, valid_sources, edge_map = reuse
+            if not np.isin(self.targets, previous.targets).all():
+                valid_sources = ()
+            previous_columns = [previous.target_index.get(target) for target in targets_list]
+        self.is_reused = np.zeros(self.sources.size, dtype=bool)     # was the search of given source reused?
+        for i, source in enumerate(self.sources.tolist()):
+            if reuse is not None and source in valid_sources:
+                row = previous.source_index[source]
+                tree_vertices, tree_edges = previous.predecessors[row]
+                self.distances[i] = previous.distances[row, previous_columns]
+                self.predecessors.append((tree_vertices, edge_map[tree_edges]))
+                self.is_reused[i] = True
+                continue
+
+            edge_paths = self.graph.get_shortest_paths(source, targets_list, "weight", OUT, output="epath") \
+                if targets_list else []
+
+            # all paths from one search form a tree - process them at once, as flat arrays
+            lengths = np.fromiter(map(len, edge_paths), dtype=np.int64, count=len(edge_paths))
+            path_edges = np.fromiter(chain.from_iterable(edge_paths), dtype=np.int64, count=int(lengths.sum()))
+            ends = np.cumsum(lengths)
+            cumulative_weights = np.concatenate(([0.0], np.cumsum(weights[path_edges])))
+            is_reached = (lengths > 0) | (self.targets == source)
+            self.distances[i] = np.where(is_reached, cumulative_weights[ends] - cumulative_weights[ends - lengths],
+                                         np.inf)
+
+            tree_vertices, first_occurrences = np.unique(edge_targets[path_edges], return_index=True)
+            self.predecessors.append((tree_vertices, path_edges[first_occurrences]))
+
+    def get_distance(self, source: int, target: int):
+        """
+        :return: length of the shortest path between given vertices (np.inf if there is no path)
+        """
+        return self.distances[self.source_index[source], self.target_index[target]]
+
+    def get_edge_path(self, source: int, target: int):
+        """
+        Reconstructs the shortest path from the predecessor tree of its source.
+        :param source: id of path's start vertex
+        :param target: id of path's end vertex
+        :return: list of edges' ids (in g2) forming the path
+        """
+        tree_vertices, tree_edges = self.predecessors[self.source_index[source]]
 
-        return are_equal
+        edge_path = []
+        vertex = target
+        while vertex != source:
+            position = np.searchsorted(tree_vertices, vertex)
+            if position == tree_vertices.size or tree_vertices[position] != vertex:
+                raise RuntimeError("No path between given vertices")
+            edge_id = int(tree_edges[position])
+            edge_path.append(edge_id)
+            vertex = int(self.edge_sources[edge_id])
+        edge_path.reverse()
+        return edge_path
 
 
 class G1(GenericGraph):
@@ -209,137 +500,149 @@ class G1(GenericGraph):
     Adapter for graph object from igraph library.
     Represents fully directed graph. Marked as graph of type G1 in the documentation.
     """
+    traversal_counts = None     # array - how many times the tour goes through every edge (None - once each)
+    pending_duplicates = None   # (g2, Counter: id of edge in g2 -> times) - duplicates not applied yet
+
     def __init__(self, graph_G: PartiallyDirectedGraph):
         super(G1, self).__init__(self.transform_from_partially_directed(graph_G))
 
+    @classmethod
+    def from_orientation(cls, graph_G: PartiallyDirectedGraph, sources, targets):
+        """
+        Alternative constructor - G1 with undirected edges of G oriented as given, instead of greedy orientation.
+        :param sources: array of edges' start vertices in G1 (directed edges of G have to keep their direction)
+        :param targets: array of edges' end vertices in G1
+        :return: graph G1 based on G.
+        """
+        graph_G1 = cls.__new__(cls)
+        GenericGraph.__init__(graph_G1, cls.transform_from_partially_directed(graph_G, sources, targets))
+        return graph_G1
+
     @staticmethod
-    def transform_from_partially_directed(graph_G: PartiallyDirectedGraph):
+    def transform_from_partially_directed(graph_G: PartiallyDirectedGraph, sources=None, targets=None):
         """
         Transformation from graph G to G1 as in step 2 of the documentation.
+        Orientation of undirected edges is decided in a single sweep & G1 is built once, in bulk.
+        Edges of G1 keep ids of corresponding edges of G.
+        :param sources: edges' start vertices in G1, if orientation is already decided
+        :param targets: edges' end vertices in G1, if orientation is already decided
         :return: graph G1 based on G.
         """
-        g = graph_G.graph.copy()
-
-        # count correction values because undirected edges are causing miscalculations of vertices' degrees
-        correction_for_vs = defaultdict(int)    # default value is zero
-        for edge in g.es:
-            edge["transformed"] = False
-            if not edge["directed"]:
-                correction_for_vs[edge.source] += 1
-                correction_for_vs[edge.target] -= 1
-
-        # greedy transformation of undirected edges
-        for edge in g.es:
-            if not edge["directed"]:
-                source_vertex_id = edge.source
-                target_vertex_id = edge.target
-                edge_weight = edge["weight"]
-
-                # degree = incoming - outgoing + correction
-                source_vertex_degree = g.degree(source_vertex_id, type="in") - g.degree(source_vertex_id, type="out") \
-                                       + correction_for_vs[source_vertex_id]
-                if source_vertex_degree < 0:
-                    # transform edge into outgoing
-                    # in fact - reverse existing edge: delete current edge and add reversed one
-                    g.delete_edges([(source_vertex_id, target_vertex_id)])
-                    edge = g.add_edge(target_vertex_id, source_vertex_id)
-                    edge["weight"] = edge_weight
-                else:
-                    # transform edge into incoming
-                    # in fact - leave as it is, just flag it differently
-                    pass
-                edge["directed"] = True
-                edge["transformed"] = True
-                correction_for_vs[source_vertex_id] += 1
-                correction_for_vs[target_vertex_id] -= 1
+        g = graph_G.graph
+        directed = np.array(g.es["directed"], dtype=bool)
+        if sources is None:
+            edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+            sources, targets = G1.orient_undirected_edges(g.vcount(), edges[:, 0], edges[:, 1], directed)
+
+        g1 = Graph(n=g.vcount(), edges=GenericGraph.make_edge_list(sources, targets), directed=True)
+        for attribute in g.vs.attributes():
+            g1.vs[attribute] = g.vs[attribute]
+        for attribute in g.es.attributes():
+            g1.es[attribute] = g.es[attribute]
+        g1.es["directed"] = True
+        g1.es["transformed"] = (~directed).tolist()
+        return g1
 
-        return g
+    @staticmethod
+    def orient_undirected_edges(vertex_count: int, sources: np.ndarray, targets: np.ndarray, directed: np.ndarray):
+        """
+        Greedy orientation of undirected edges, in order of their ids.
+        Vertices' degrees (incoming - outgoing) are counted once from directed edges and then updated
+        after every decision. If start vertex of undirected edge has more outgoing than incoming edges,
+        the edge is turned into incoming one (reversed), otherwise it is left as outgoing.
+        :param vertex_count: number of vertices
+        :param sources: array of edges' start vertices
+        :param targets: array of edges' end vertices
+        :param directed: boolean array - is given edge directed?
+        :return: (sources, targets) - new arrays with all edges directed.
+        """
+        directed = np.asarray(directed, dtype=bool)
+        degrees = (np.bincount(targets[directed], minlength=vertex_count)
+                   - np.bincount(sources[directed], minlength=vertex_count)).tolist()
+
+        # plain lists are much faster than numpy arrays for element-wise access
+        new_sources = np.asarray(sources, dtype=np.int64).tolist()
+        new_targets = np.asarray(targets, dtype=np.int64).tolist()
+        for edge_idx in np.flatnonzero(~directed).tolist():
+            source_vertex_id = new_sources[edge_idx]
+            target_vertex_id = new_targets[edge_idx]
+            if degrees[source_vertex_id] < 0:
+                # transform edge into incoming (reverse it)
+                new_sources[edge_idx] = target_vertex_id
+                new_targets[edge_idx] = source_vertex_id
+                degrees[source_vertex_id] += 1
+                degrees[target_vertex_id] -= 1
+            else:
+                # transform edge into outgoing (leave it as it is)
+                degrees[source_vertex_id] -= 1
+                degrees[target_vertex_id] += 1
+
+        return np.array(new_sources, dtype=np.int64), np.array(new_targets, dtype=np.int64)
 
     #------------------------------------------------------------------------
     def have_euler_tour(self, deg_list: list):
         """
-        Check for Euler tour in graph
+        Check for Euler tour in graph. Every edge is counted as many times as the tour goes through it
+        (see get_traversal_counts), so G1 which is already balanced is not balanced again.
         :param: deg_list - list for storing vertices degrees
         :return: boolean
         """
         if not self.is_connected(): return False
-        degIn_list = self.graph.indegree()
-        degOut_list = self.graph.outdegree()
-        #print("Lista In: " + str(degIn_list))
-        #print("Lista Out: " + str(degOut_list))
-        
-        deg_list.clear()
-        prev_deg = degIn_list[0] - degOut_list[0]
-        deg_list.append(prev_deg)
-        for i in range(1, len(degIn_list) ):
-            deg = degIn_list[i] - degOut_list[i]
-            deg_list.append(deg)
+        edges = np.array(self.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        counts = self.get_traversal_counts()
+        vertex_count = self.graph.vcount()
+        degrees = np.bincount(edges[:, 1], weights=counts, minlength=vertex_count).astype(np.int64) \
+            - np.bincount(edges[:, 0], weights=counts, minlength=vertex_count).astype(np.int64)
 
-        for i in range(1, len(degIn_list) ):
-            deg = degIn_list[i] - degOut_list[i]
-            if deg != prev_deg:
-                return False
-
-        return True
+        deg_list.clear()
+        deg_list.extend(degrees.tolist())
+        return bool((degrees == degrees[0]).all()) if vertex_count else True
 
     #------------------------------------------------------------------------
-    def create_complete_bipart(self, deg_list: list, g2 : GenericGraph):
+    def create_complete_bipart(self, deg_list: list, g2 : GenericGraph, paths: ShortestPaths = None):
         """
         Create complete bipartie grapgh from given G1 graph
         as mentioned in 3a step in documentation. Based on g2 adding weights for egdes in bipartite graph
         :param: deg_list as vertices degrees in G1 graph, g2 : GenericGraph - graph with penalty edges
+        :param paths: shortest paths between unbalanced vertices in g2 (computed if not given)
         :return: Complete Biparte graph GD
         """
-        iNeg, iPos = 0, 0
-        for v in deg_list:
-            if v > 0:
-                iPos = iPos + v #number of vertices with positive degree
-            elif v < 0:
-                iNeg = iNeg + abs(v) # number of vertices with negative degree 
-        
+        degrees = np.asarray(deg_list, dtype=np.int64)
+        iPos = int(degrees[degrees > 0].sum())      # number of vertices with positive degree
+        iNeg = int(-degrees[degrees < 0].sum())     # number of vertices with negative degree
+
                 # safety chec
         if iNeg != iPos:
-            print("Error: Problem not solvable for this graph")
-            return None
+            raise RuntimeError("Problem not solvable for this graph: vertices' degrees sum up to {}".format(
+                iNeg - iPos))
+
+        if paths is None:
+            paths = ShortestPaths(g2, np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0))
 
         gd = Graph.Full_Bipartite(iNeg, iPos)
                     # set vertices labels in bipartite graph as in G1
-        i, k, l = 0, 0, 0
-        for v in deg_list:
-            if v < 0:
-                vs = self.graph.vs[i]
-                for j in range(abs(v)):
-                    gd.vs[k + j]["label"] = vs["label"]
-                k = k + abs(v)
-            elif v > 0:
-                vs = self.graph.vs[i]
-                for j in range(abs(v)):
-                    gd.vs[l + j + iNeg]["label"] = vs["label"]
-                l = l + v
-            i = i + 1
-        
-                    # calculate weights for egdes in bipartite graph gd based on weights in graph G2
-        for edg in gd.es:
-            src_vetrex_id = edg.source
-            target_vertex_id = edg.target
+                    # every vertex of G1 is repeated as many times as its degree says
+        neg_vertices = np.flatnonzero(degrees < 0)
+        pos_vertices = np.flatnonzero(degrees > 0)
+        neg_columns = np.repeat(np.array([paths.target_index[v] for v in neg_vertices.tolist()], dtype=np.int64),
+                                -degrees[neg_vertices])
+        pos_rows = np.repeat(np.array([paths.source_index[v] for v in pos_vertices.tolist()], dtype=np.int64),
+                             degrees[pos_vertices])
+        labels = self.get_vertex_labels()
+        gd.vs["vertex_id"] = np.repeat(neg_vertices, -degrees[neg_vertices]).tolist() \
+                             + np.repeat(pos_vertices, degrees[pos_vertices]).tolist()
+        gd.vs["label"] = [labels[v] for v in gd.vs["vertex_id"]]
+
+                    # calculate weights for egdes in bipartite graph gd based on distances in graph G2
                     # if src_vert have negative degree it need to be target in path calc on G2
-            if src_vetrex_id < iNeg:
-                target_label = gd.vs[src_vetrex_id]["label"]
-                source_label = gd.vs[target_vertex_id]["label"]
-            else:
-                target_label = gd.vs[target_vertex_id]["label"]
-                source_label = gd.vs[src_vetrex_id]["label"]
-
-                    # get vertex in g2 from given label
-            src_g2 = g2.graph.vs.find(label=source_label)
-            trg_g2 = g2.graph.vs.find(label=target_label)
-            weight_mtrx = g2.graph.shortest_paths_dijkstra(src_g2.index, trg_g2.index, "weight", OUT)
-            edg["weight"] = weight_mtrx[0][0]
-            #print("Path weight in bipartite graph: {}, src: {}, trg: {}".format(weight_mtrx[0][0], source_label, target_label) )
-            
+        edges = np.array(gd.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        neg_side = np.where(edges[:, 0] < iNeg, edges[:, 0], edges[:, 1])
+        pos_side = np.where(edges[:, 0] < iNeg, edges[:, 1], edges[:, 0]) - iNeg
+        gd.es["weight"] = paths.distances[pos_rows[pos_side], neg_columns[neg_side]].tolist()
+
         gd.es["directed"] = False
         return GenericGraph(gd), iNeg
-    
+
     #------------------------------------------------------------------------
     def add_penaltyTm_edges(self, penaltyT: int, useConstW = False, constWeight = 80):
         """
@@ -351,31 +654,11 @@ class G1(GenericGraph):
         :param constWeight = 80 - set value of const peanalty edges weight. Used mainly for test purpose
         :return: New graph with penalty edges
         """
-        g2 = self.graph.copy()
-                # At start all edges are legal
-        g2.es["IsPenalty"] = False
-
-        for e in self.graph.es:
-            source_vertex_id = e.source
-            target_vertex_id = e.target
-                    # if edge was transformed add egde 
-                    # in reverse direction with the same weight
-            if e["transformed"]:
-                new_e = g2.add_edge(e.target, e.source)
-                new_e["weight"] = e["weight"]
-                new_e["IsPenalty"] = False
-                new_e["transformed"] = True
-            else:
-                new_e = g2.add_edge(e.target, e.source)
-                if not useConstW:
-                    new_e["weight"] = ( int(e["weight"]) * penaltyT)
-                else: 
-                    new_e["weight"] = constWeight
-                new_e["IsPenalty"] = True
-                new_e["transformed"] = False
-
-        g2.es["directed"] = True
-        return GenericGraph(g2)
+        if useConstW:
+            penalty_weights = np.full(self.graph.ecount(), constWeight)
+        else:
+            penalty_weights = np.asarray(self.graph.es["weight"]).astype(np.int64) * penaltyT
+        return self.add_penalty_edges(penalty_weights)
 
     #------------------------------------------------------------------------
     def add_penaltyAvg_edges(self, penaltyT: int):
@@ -387,192 +670,977 @@ class G1(GenericGraph):
         :param: PenaltyT - specifies how many times multiply average weight of edges
         :return: New graph with penalty edges
         """
+        return self.add_penalty_edges(np.full(self.graph.ecount(), self.get_average_weight() * penaltyT))
+
+    def get_average_weight(self):
+        """
+        :return: average weight of edges in G1, rounded to integer
+        """
+        weights = np.asarray(self.graph.es["weight"], dtype=float)
+        return int((weights.sum() / weights.size) + 0.5)
+
+    def add_penalty_edges(self, penalty_weights):
+        """
+        Creates G2 - copy of G1 with edge in reverse direction added for every edge, all in one bulk call.
+        Reverse edge of transformed (originally undirected) edge is legal & has the same weight,
+        reverse edge of directed one is penalty edge. Reverse edge of i-th edge has id (number of edges + i).
+        Every edge of G2 knows id of G1 edge it comes from (attribute "g1_edge_id", see apply_duplicates).
+        :param penalty_weights: array - weight of penalty edge for every edge of G1 (used for directed ones)
+        :return: New graph with penalty edges
+        """
         g2 = self.graph.copy()
                 # At start all edges are legal
         g2.es["IsPenalty"] = False
-        
-        sum_w = 0
-        for e in g2.es:
-            sum_w += e["weight"]
-            
-        avg_w = int( (sum_w / len(g2.es)) + 0.5)
-
-        for e in self.graph.es:
-            source_vertex_id = e.source
-            target_vertex_id = e.target
-                    # if edge was transformed add egde 
-                    # in reverse direction with the same weight
-            if e["transformed"]:
-                new_e = g2.add_edge(e.target, e.source)
-                new_e["weight"] = e["weight"]
-                new_e["IsPenalty"] = False
-                new_e["transformed"] = True
-            else:
-                new_e = g2.add_edge(e.target, e.source)
-                new_e["weight"] = (avg_w * penaltyT)
-                new_e["IsPenalty"] = True
+
+        edges = np.array(self.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        transformed = np.array([bool(flag) for flag in self.graph.es["transformed"]], dtype=bool)
+        weights = np.asarray(self.graph.es["weight"])
+        g2.add_edges(edges[:, ::-1].tolist(), attributes={
+            "weight": np.where(transformed, weights, np.asarray(penalty_weights)).tolist(),
+            "IsPenalty": (~transformed).tolist(),
+            "transformed": transformed.tolist(),
+        })
+        g2.es["g1_edge_id"] = list(range(edges.shape[0])) * 2
 
         g2.es["directed"] = True
         return GenericGraph(g2)
 
     #------------------------------------------------------------------------
-    def GraphBalancing(self, gd : GenericGraph, g2: GenericGraph):
+    def GraphBalancing(self, gd : GenericGraph, g2: GenericGraph, paths: ShortestPaths = None,
+                       useAssignmentSolver: bool = False):
         """
         Use Hungarian method to find optimal matching in given bipartite graph. In documentation described at 3d)
         Then get selcted egdes from biGraph (representing minimal paths in g1) 
         and find edge sequences corresponding to them in graph g1.
         Duplicate selected edges in g1 - documentation point 3e)
         :param: gd - complete bipartite graph, g2 - graph with penalty edges
+        :param paths: shortest paths used to build gd; if given, paths are not searched again
+        :param useAssignmentSolver: if True, minimum cost assignment is solved directly on the cost matrix
+                                    (any non-negative, also float costs), instead of igraph's maximum matching
         :return: penalties - number of added penalty edges
         """
                 # At start graph G1 dont have penalty edges
         self.graph.es["IsPenalty"] = False
 
+        penalties = 0
+        for src_g2, trg_g2 in self.get_balancing_pairs(gd, g2, useAssignmentSolver):
+            penalties += self.duplicate_path(src_g2, trg_g2, g2, paths=paths)
+
+        return penalties
+
+    def get_balancing_pairs(self, gd : GenericGraph, g2: GenericGraph, useAssignmentSolver: bool = False):
+        """
+        Finds optimal matching in given bipartite graph (see GraphBalancing).
+        :return: list of (source, target) - ids of vertices in G2, between which edges should be duplicated
+        """
+        if useAssignmentSolver:
+            matched_pairs = self.get_min_cost_assignment(gd)
+        else:
                 # we need to find minimum matching so to do that invert weight values
-                # method don't support negative weight values
-        for e in gd.graph.es:
-            e["weight"] = 10000 - e["weight"]
-        
-        lstW = gd.graph.es["weight"]
-        matching = gd.graph.maximum_bipartite_matching(weights = lstW)
-        
-        ###TEST
-        #for e in matching.edges():
-        #    print("Matching: {}".format(e))
-        #    print("Src: {}, Trg: {}".format(gd.graph.vs[e.source]["label"], gd.graph.vs[e.target]["label"]))
-        ###END TEST
-
-        for e in gd.graph.es:
-            e["weight"] = 10000 - e["weight"]
+                # method don't support negative weight values, so invert against the biggest weight
+            weights = np.asarray(gd.graph.es["weight"], dtype=float)
+            inverted_weights = (weights.max() + 1 - weights).tolist() if weights.size else []
+            matching = gd.graph.maximum_bipartite_matching(weights = inverted_weights)
+            matched_pairs = [e.tuple for e in matching.edges()]
+
+        # vertices of gd know their ids in G1 (& G2) - labels are used only for bipartite graphs made elsewhere
+        has_vertex_ids = "vertex_id" in gd.graph.vs.attributes()
+        vertex_ids = gd.graph.vs["vertex_id"] if has_vertex_ids else None
+        gd_labels = gd.get_vertex_labels()
+
+        pairs = []
+        for neg_vertex, pos_vertex in matched_pairs:
+                    # in bipartite graph edges source are vertices with negative degree
+                    # so we need to swap target with source
+            if has_vertex_ids:
+                trg_g2 = vertex_ids[neg_vertex]
+                src_g2 = vertex_ids[pos_vertex]
+            else:
+                trg_g2 = g2.get_vertex_index(gd_labels[neg_vertex])
+                src_g2 = g2.get_vertex_index(gd_labels[pos_vertex])
+            pairs.append((src_g2, trg_g2))
+        return pairs
+
+    @staticmethod
+    def get_min_cost_assignment(gd: GenericGraph):
+        """
+        Finds perfect matching of minimal cost in bipartite graph, using dense cost matrix.
+        Weights are used as they are - no transformation of them is needed.
+        :param gd: bipartite graph (vertices' attribute "type" tells the part: False - negative, True - positive degree)
+        :return: list of matched pairs (vertex of the 1st part, vertex of the 2nd part)
+        """
+        types = np.asarray(gd.graph.vs["type"], dtype=bool)
+        first_part = np.flatnonzero(~types)
+        second_part = np.flatnonzero(types)
+        position = np.empty(types.size, dtype=np.int64)     # position of the vertex within its part
+        position[first_part] = np.arange(first_part.size)
+        position[second_part] = np.arange(second_part.size)
+
+        edges = np.array(gd.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        is_reversed = types[edges[:, 0]]
+        first_ends = np.where(is_reversed, edges[:, 1], edges[:, 0])
+        second_ends = np.where(is_reversed, edges[:, 0], edges[:, 1])
+
+        # cost matrix - missing edges & parallel ones are handled by keeping the cheapest edge
+        costs = np.full((first_part.size, second_part.size), np.inf)
+        np.minimum.at(costs, (position[first_ends], position[second_ends]),
+                      np.asarray(gd.graph.es["weight"], dtype=float))
+
+        rows, columns = solve_assignment(costs)
+        return list(zip(first_part[rows].tolist(), second_part[columns].tolist()))
+
+    #------------------------------------------------------------------------
+    def FlowBalancing(self, deg_list: list, g2: GenericGraph, paths: ShortestPaths = None):
+        """
+        Alternative to create_complete_bipart & GraphBalancing (points 3a-3e of the documentation).
+        Solves transportation problem between vertices with positive degree (supplies)
+        and vertices with negative degree (demands), where cost of sending one unit is the length
+        of the shortest path in g2. Every vertex is taken once, whatever its degree is.
+        Then duplicates edges of shortest paths in g1 as many times as flow between vertices says.
+        :param: deg_list as vertices degrees in G1 graph, g2 : GenericGraph - graph with penalty edges
+        :param paths: shortest paths between unbalanced vertices in g2 (computed if not given)
+        :return: penalties - number of added penalty edges
+        """
+                # At start graph G1 dont have penalty edges
+        self.graph.es["IsPenalty"] = False
+
+        degrees = np.asarray(deg_list, dtype=np.int64)
+        if paths is None:
+            paths = ShortestPaths(g2, np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0))
+        flows = solve_transportation(degrees[paths.sources], -degrees[paths.targets], paths.distances)
 
         penalties = 0
-        for e in matching.edges():
-                    # in bipartite graph edges source are vertices with positive degree
-                    # so we need to swap target with source
-            trg_lb = gd.graph.vs[e.source]["label"]
-            src_lb = gd.graph.vs[e.target]["label"]
-            src_g2 = g2.graph.vs.find(label=src_lb)
-            trg_g2 = g2.graph.vs.find(label=trg_lb)
-            #print("Src_G2: {}, Trg_G2: {}".format(src_g2["label"], trg_g2["label"]))
-            vertex_sequnce_for_path = g2.graph.get_shortest_paths(src_g2.index, trg_g2.index, "weight")
-            #print(vertex_sequnce_for_path)
-
-            i, ipre  = 0, -1
-            for iVi in vertex_sequnce_for_path[0]:
-                if i > 0:
-                   ed1 = self.graph.add_edge(ipre, iVi) #add(duplicate) edge in g1
-                   ed2 = g2.graph.es.find(_source=ipre, _target=iVi)
-                   ed1["weight"] = ed2["weight"]
-                   ed1["directed"] = ed2["directed"]
-                   ed1["IsPenalty"] = ed2["IsPenalty"]
-                   if ed1["IsPenalty"] == True: penalties += 1
-                i = i + 1
-                ipre = iVi
+        for i, j in zip(*np.nonzero(flows)):
+            penalties += self.duplicate_path(int(paths.sources[i]), int(paths.targets[j]), g2,
+                                             int(flows[i, j]), paths)
 
         return penalties
 
     #------------------------------------------------------------------------
-    def FindEuler(self, start_label: str):
+    def duplicate_path(self, source: int, target: int, g2: GenericGraph, times: int = 1,
+                       paths: ShortestPaths = None):
+        """
+        Finds the shortest path between given vertices in g2 & duplicates its edges in g1 - documentation point 3e)
+        :param source: id of path's start vertex
+        :param target: id of path's end vertex
+        :param g2: graph with penalty edges
+        :param times: how many times edges of the path should be duplicated
+        :param paths: already computed shortest paths; if not given, the path is searched in g2
+        :return: number of added penalty edges
+        """
+        if paths is not None:
+            edge_sequence_for_path = paths.get_edge_path(source, target)
+        else:
+            edge_sequence_for_path = g2.graph.get_shortest_paths(source, target, "weight", OUT, output="epath")[0]
+        return self.duplicate_edges(edge_sequence_for_path, g2, times)
+
+    def duplicate_edges(self, edge_sequence_for_path: list, g2: GenericGraph, times: int = 1):
+        """
+        Duplicates given edges of g2 in g1 (e.g. edges of a path found elsewhere). Edges are not added
+        one by one - only their counts are collected & applied to the graph at once (see apply_duplicates),
+        so g1 does not grow with the number of duplicates.
+        :param edge_sequence_for_path: ids of edges in g2
+        :param times: how many times the edges should be duplicated
+        :return: number of added penalty edges
+        """
+        edge_ids = list(edge_sequence_for_path)
+        if not edge_ids or times == 0:
+            return 0
+        if self.pending_duplicates is None or self.pending_duplicates[0] is not g2:
+            self.apply_duplicates()
+            self.pending_duplicates = (g2, Counter())
+        duplicates = self.pending_duplicates[1]
+        for edge_id in edge_ids:
+            duplicates[edge_id] += times
+        return times * sum(flag == True for flag in g2.graph.es[edge_ids]["IsPenalty"])
+
+    def apply_duplicates(self):
+        """
+        Applies collected duplicates to traversal counts of edges. Edge of g2 comes from edge of g1 (its id is
+        in attribute "g1_edge_id" of g2; without it, ids of edges in g2 built as in add_penalty_edges are used).
+        Edge of g2 going the same way as its g1 edge raises the count of that very edge, so parallel edges
+        are told apart. Edge of g2 going backwards (penalty edge or transformed edge traversed backwards)
+        is added to g1 once, in one bulk call, whatever its count is - it remembers the reversed edge
+        (attribute "reverse_of") & is reused by later balancing.
+        """
+        if self.pending_duplicates is None:
+            return
+        g2, duplicates = self.pending_duplicates
+        self.pending_duplicates = None
+        edge_count = self.graph.ecount()
+        counts = self.traversal_counts if self.traversal_counts is not None else np.ones(edge_count, dtype=np.int64)
+
+        g2_ids = list(duplicates.keys())
+        duplicated = g2.graph.es[g2_ids]
+        if "g1_edge_id" in g2.graph.es.attributes():
+            origins = duplicated["g1_edge_id"]
+        else:
+            half = g2.graph.ecount() // 2
+            origins = [edge_id % half for edge_id in g2_ids]
+        g1_edges = self.graph.get_edgelist()
+        reverse_index = {}      # (id of reversed edge in g1, weight) -> id of reverse edge in g1
+        if "reverse_of" in self.graph.es.attributes():
+            for edge_id, (reverse_of, weight) in enumerate(zip(self.graph.es["reverse_of"], self.graph.es["weight"])):
+                if reverse_of is not None:
+                    reverse_index.setdefault((reverse_of, weight), edge_id)
+
+        new_edges = []
+        new_attributes = {"weight": [], "directed": [], "IsPenalty": [], "reverse_of": []}
+        g1_ids = []
+        for edge, origin, weight, directed, is_penalty in zip(duplicated, origins, duplicated["weight"],
+                                                              duplicated["directed"], duplicated["IsPenalty"]):
+            if edge.tuple == g1_edges[origin]:
+                g1_ids.append(origin)
+                continue
+            key = (origin, weight)
+            if key not in reverse_index:
+                reverse_index[key] = edge_count + len(new_edges)
+                new_edges.append(edge.tuple)        #add edge (missing in g1) once
+                new_attributes["weight"].append(weight)
+                new_attributes["directed"].append(directed)
+                new_attributes["IsPenalty"].append(is_penalty == True)
+                new_attributes["reverse_of"].append(origin)
+            g1_ids.append(reverse_index[key])
+        if new_edges:
+            self.graph.add_edges(new_edges, attributes=new_attributes)
+            counts = np.concatenate((counts, np.zeros(len(new_edges), dtype=np.int64)))
+        np.add.at(counts, g1_ids, [duplicates[edge_id] for edge_id in g2_ids])
+        self.traversal_counts = counts
+
+    def get_traversal_counts(self):
+        """
+        :return: array - how many times the tour goes through every edge of g1 (after balancing)
+        """
+        self.apply_duplicates()
+        if self.traversal_counts is None:
+            return np.ones(self.graph.ecount(), dtype=np.int64)
+        return self.traversal_counts
+
+    #------------------------------------------------------------------------
+    def FindEuler(self, start_label: str, start_vertex: int = None, quiet: bool = False):
         """
         Finding Euler cycle in graph G1
         :param: start_label - starting vertex label
-        :return:
+        :param: start_vertex - starting vertex index; if given, start_label is ignored
+        :param: quiet - if True, nothing is printed & list of labels is not built (None is returned instead)
+        :return: (total_weight, labels, vertex ids, edge ids) - cost & consecutive vertices/edges of the cycle
         """
-        adj = self.graph.get_adjlist()
-        total_weight = 0
-        startVer = self.graph.vs.find(label = start_label)
-        if startVer is None:
+        if start_vertex is None:
+            start_vertex = self.get_vertex_index(start_label)
+        if not 0 <= start_vertex < self.graph.vcount():
             raise RuntimeError("Incorrect start label in finding Euler cycle")
 
         # Hierholzer’s Algorithm from
         # https://www.geeksforgeeks.org/hierholzers-algorithm-directed-graph/
         # not supported in igraph library
-
-        if len(adj) == 0:
-            return # empty graph
-
-        # Maintain a stack to keep vertices
-        # We can start from any vertex, here we start with 0
-        curr_path = [startVer.index]
-
-        # list to store final circuit
+        # It walks through outgoing edges' ids (not neighbours), so parallel edges are told apart.
+        # Edge stays in incidence list until it is traversed as many times as its traversal count says.
+        counts = self.get_traversal_counts()
+        remaining = counts.tolist()
+        inc = self.graph.get_inclist(mode=OUT)
+        edge_targets = [target for _, target in self.graph.get_edgelist()]
+
+        # Maintain a stack to keep vertices & a stack of edges leading to them
+        curr_path = [start_vertex]
+        curr_edges = []
+
+        # lists to store final circuit
         circuit = []
+        edge_circuit = []
 
         while curr_path:
 
             curr_v = curr_path[-1]
 
-            # If there's remaining edge in adjacency list
+            # If there's remaining edge in incidence list
             # of the current vertex
-            if adj[curr_v]:
+            if inc[curr_v]:
 
-                # Find and remove the next vertex that is
-                # adjacent to the current vertex
-                next_v = adj[curr_v].pop()
+                # Find the next edge that is outgoing from the current vertex
+                # (& remove it when it is traversed for the last time)
+                next_e = inc[curr_v][-1]
+                remaining[next_e] -= 1
+                if remaining[next_e] <= 0:
+                    inc[curr_v].pop()
 
-                # Push the new vertex to the stack
-                curr_path.append(next_v)
+                # Push the edge & its end vertex to the stacks
+                curr_edges.append(next_e)
+                curr_path.append(edge_targets[next_e])
 
             # back-track to find remaining circuit
             else:
-                # Remove the current vertex and
+                # Remove the current vertex (& edge leading to it) and
                 # put it in the curcuit
                 circuit.append(curr_path.pop())
+                if curr_edges:
+                    edge_circuit.append(curr_edges.pop())
 
-        # we've got the circuit, now print it in reverse
-        print("Euler cycle - postman route: ")
-        for i in range(len(circuit) - 1, -1, -1):
-            #print(circuit[i], end = "")
+        if len(edge_circuit) != int(counts.sum()):
+            raise RuntimeError("G1 has no Euler cycle")
 
-            if i > 0:
-                ed = self.graph.es.find(_source=circuit[i], _target=circuit[i-1])
-                total_weight += ed["weight"]
+        circuit.reverse()
+        edge_circuit.reverse()
+        weights = self.graph.es["weight"]
+        total_weight = sum(weights[e] for e in edge_circuit)
 
-                    # result path printing
-            label = self.graph.vs[circuit[i]]["label"]
-            print(label, end = "")
-            if i:
-                print(" -> ", end = "")
+        if quiet:
+            return total_weight, None, circuit, edge_circuit
 
-        print("\nTotal weight: {}".format(total_weight))
-        circuit.reverse()
-        return total_weight, [self.graph.vs[vs]["label"] for vs in circuit], circuit
+        # we've got the circuit, now print it
+        labels = self.get_vertex_labels()
+        print("Euler cycle - postman route: ")
+        print(" -> ".join(str(labels[v]) for v in circuit))
+        print("Total weight: {}".format(total_weight))
+        return total_weight, [labels[vs] for vs in circuit], circuit, edge_circuit
 
     #------------------------------------------------------------------------
-    def get_postman_tour(self, useAvgPenalty, penalty, starting_vertex_label, useConstW = False, constW = 80):
+    def get_postman_tour(self, useAvgPenalty, penalty, starting_vertex_label, useConstW = False, constW = 80,
+                         balancing = "matching", starting_vertex: int = None, quiet: bool = False,
+                         monitor: "SolveMonitor" = None, strict: bool = False, time_budget: float = None):
         """
         The top layer of the algorithm for chinese postman problem.
         :param useAvgPenalty - if true use add_penaltyAvg_edges otherwise use add_penaltyTm_edges method.
         :param penalty: penalty for choosing incorrect direction
         :param starting_vertex_label: label for starting vertex.
+        :param balancing: "matching" - complete bipartite graph & matching (GraphBalancing),
+                          "assignment" - complete bipartite graph & min cost assignment on its cost matrix,
+                          "flow" - transportation problem solved on unbalanced vertices (FlowBalancing).
+        :param starting_vertex: index of starting vertex; if given, starting_vertex_label is ignored.
+        :param quiet: if True, nothing is printed & PostmanTour object is returned instead of the tuple.
+        :param monitor: SolveMonitor measuring stages & counting work done; its callbacks may report progress
+                        & cancel solving (SolveCancelled is raised then).
+        :param strict: if True, network which is not strongly connected (with undirected edges as two-way)
+                       is rejected before penalty graph is built, instead of being solved with penalty edges.
+                       InfeasibleNetwork (with FeasibilityReport) is raised for rejected networks.
+        :param time_budget: anytime mode - seconds the solve may take. Tour for greedy orientation is found first,
+                            then orientation of undirected edges is improved by local search until the budget
+                            expires (see get_anytime_tour) & the best tour found is returned.
         :return: (cost, tour, iPenCnt) - cost of the tour & tour itself & number of penalty egdes in tour
         """
-        if not self.is_connected():
-            raise RuntimeError("G1 is not connected.")
-
-        deg_list = []  # for storing vertices degrees(our degree = DegIn - degOut)
-        if not self.have_euler_tour(deg_list):
-            self.graph.vs["deg"] = deg_list
-                    # choosing rule for adding penalty edges
-            if not useAvgPenalty:
-                if not useConstW:
-                    g2 = self.add_penaltyTm_edges(penalty)      # create G2 as mentioned in documentation
+        report = (lambda message: None) if quiet else print
+
+        if not self.is_connected() or strict:
+            feasibility = self.check_feasibility()
+            if not feasibility.is_connected:
+                raise InfeasibleNetwork("G1 is not connected: " + feasibility.describe(self.get_vertex_labels()),
+                                        feasibility)
+            if not feasibility.is_strongly_connected:
+                raise InfeasibleNetwork("Network is not strongly connected: "
+                                        + feasibility.describe(self.get_vertex_labels()), feasibility)
+        if balancing not in ("matching", "assignment", "flow"):
+            raise RuntimeError("Unknown balancing method: {}".format(balancing))
+        if starting_vertex is None:
+            starting_vertex = self.get_vertex_index(starting_vertex_label)
+        if time_budget is not None:
+            tour = self.get_anytime_tour(useAvgPenalty, penalty, starting_vertex, useConstW, constW, balancing,
+                                         time_budget, monitor)
+            if quiet:
+                return tour
+            route = tour.as_tuple()
+            print("Anytime search: cost {} -> {} in {} evaluations".format(
+                tour.stats["greedy_cost"], tour.cost, tour.stats["evaluations"]))
+            print("Euler cycle - postman route: ")
+            print(" -> ".join(str(label) for label in route[1]))
+            print("Total weight: {}".format(tour.cost))
+            return route
+
+        if monitor is not None:
+            monitor.start()
+        try:
+            iPenCnt = 0
+            stats = {"vertices": self.graph.vcount(), "edges": self.graph.ecount()}
+            stage_start = perf_counter()
+            deg_list = []  # for storing vertices degrees(our degree = DegIn - degOut)
+            if not self.have_euler_tour(deg_list):
+                self.graph.vs["deg"] = deg_list
+                        # choosing rule for adding penalty edges
+                if not useAvgPenalty:
+                    if not useConstW:
+                        g2 = self.add_penaltyTm_edges(penalty)      # create G2 as mentioned in documentation
+                    else:
+                        g2 = self.add_penaltyTm_edges(penalty, useConstW, constW) # create G2 as in test case
                 else:
-                    g2 = self.add_penaltyTm_edges(penalty, useConstW, constW) # create G2 as in test case
+                    g2 = self.add_penaltyAvg_edges(penalty)
+                stage_start = self.record_stage_time(monitor, stats, "penalty_graph", stage_start)
+                report("Graph g2 created")
+                degrees = np.asarray(deg_list)
+                paths = ShortestPaths(g2, np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0))
+                stats["unbalanced_vertices"] = paths.sources.size + paths.targets.size
+                if monitor is not None:
+                    monitor.count("shortest_path_searches", paths.sources.size)
+                stage_start = self.record_stage_time(monitor, stats, "shortest_paths", stage_start)
+                report("shortest paths found")
+                if balancing == "flow":
+                    iPenCnt = self.FlowBalancing(deg_list, g2, paths)
+                else:
+                    gd, iNeg = self.create_complete_bipart(deg_list, g2, paths)
+                    report("bipartite graph generated")
+                    if monitor is not None:
+                        monitor.count("bipartite_edges", gd.graph.ecount())
+                    iPenCnt = self.GraphBalancing(gd, g2, paths, useAssignmentSolver=(balancing == "assignment"))
+                stats["added_edges"] = int(self.get_traversal_counts().sum()) - stats["edges"]
+                if monitor is not None:
+                    monitor.count("duplicated_edges", stats["added_edges"])
+                    monitor.count("penalty_edges", iPenCnt)
+                stage_start = self.record_stage_time(monitor, stats, "balancing", stage_start)
+                report("Finding Euler tour...")
             else:
-                g2 = self.add_penaltyAvg_edges(penalty)
-            print("Graph g2 created")
-            gd, iNeg = self.create_complete_bipart(deg_list, g2)
-            print("bipartite graph generated")
-            if gd is not None:
-                iPenCnt = self.GraphBalancing(gd, g2)
-                print("Finding Euler tour...")
-                cost, tour, tour_by_id = self.FindEuler(starting_vertex_label)
+                report("Finding Euler...")
+            cost, tour, tour_by_id, tour_edges = self.FindEuler(starting_vertex_label, starting_vertex, quiet)
+            self.record_stage_time(monitor, stats, "euler_cycle", stage_start)
+
+            if quiet:
+                return PostmanTour(self, cost, tour_by_id, tour_edges, iPenCnt, stats)
+            return cost, tour, tour_by_id, iPenCnt
+        finally:
+            if monitor is not None:
+                monitor.finish()
+
+    @staticmethod
+    def record_stage_time(monitor: "SolveMonitor", stats: dict, stage: str, stage_start: float):
+        """
+        Stores duration of the stage (in seconds) in stats, under key "time_<stage>" & passes the stage to monitor.
+        :return: end time of the stage, being start time of the next one.
+        """
+        stage_end = perf_counter()
+        stats["time_" + stage] = stage_end - stage_start
+        if monitor is not None:
+            monitor.end_stage(stage)
+        return stage_end
+
+    def penalty_sweep(self, penalties, useAvgPenalty = False, balancing = "flow"):
+        """
+        Cost & number of penalty edges of the tour for many values of penalty multiplier, without changing G1.
+        G2 is built once - only weights of its penalty edges are updated for every value. Values are processed
+        in ascending order, so searches whose shortest paths contain no penalty edge stay valid & are reused
+        (raising penalty makes other paths only longer). Balanced graph is not built - the cost is the weight
+        of G1 plus lengths of paths chosen by balancing.
+        :param penalties: values of penalty multiplier (as penalty of get_postman_tour)
+        :param useAvgPenalty: if true penalty edges are weighted as in add_penaltyAvg_edges,
+                              otherwise as in add_penaltyTm_edges
+        :param balancing: "matching", "assignment" or "flow" - as in get_postman_tour
+        :return: list of dictionaries {"penalty", "cost", "penalty_edges", "reused_sources"}, in order of penalties
+        """
+        if balancing not in ("matching", "assignment", "flow"):
+            raise RuntimeError("Unknown balancing method: {}".format(balancing))
+        deg_list = []
+        is_balanced = self.have_euler_tour(deg_list)
+        base_cost = sum(weight * count for weight, count in zip(self.graph.es["weight"],
+                                                                 self.get_traversal_counts().tolist()))
+        if is_balanced:
+            return [{"penalty": penalty, "cost": base_cost, "penalty_edges": 0, "reused_sources": 0}
+                    for penalty in penalties]
+
+        if useAvgPenalty:
+            unit_weights = np.full(self.graph.ecount(), self.get_average_weight())
+        else:
+            unit_weights = np.asarray(self.graph.es["weight"]).astype(np.int64)
+        g2 = self.add_penalty_edges(unit_weights)
+        is_penalty = np.array(g2.graph.es["IsPenalty"], dtype=bool)
+        penalty_edges = np.flatnonzero(is_penalty)
+        g2_weights = np.array(g2.graph.es["weight"])
+        unit_weights = g2_weights[penalty_edges]
+        edge_map = np.arange(g2.graph.ecount())
+
+        degrees = np.asarray(deg_list, dtype=np.int64)
+        sources, targets = np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0)
+        results = [None] * len(penalties)
+        paths = None
+        for index in sorted(range(len(penalties)), key=lambda i: penalties[i]):
+            penalty = penalties[index]
+            g2_weights = g2_weights.astype(np.result_type(g2_weights, unit_weights * penalty))
+            g2_weights[penalty_edges] = unit_weights * penalty
+            weight_list = g2_weights.tolist()
+            g2.graph.es["weight"] = weight_list
+
+            reuse = None
+            if paths is not None:
+                valid_sources = {source for source, (_, tree_edges) in zip(paths.sources.tolist(), paths.predecessors)
+                                 if not is_penalty[tree_edges].any()}
+                reuse = (paths, valid_sources, edge_map)
+            paths = ShortestPaths(g2, sources, targets, reuse)
+
+            if balancing == "flow":
+                flows = solve_transportation(degrees[paths.sources], -degrees[paths.targets], paths.distances)
+                pairs = [(int(paths.sources[i]), int(paths.targets[j]), int(flows[i, j]))
+                         for i, j in zip(*np.nonzero(flows))]
             else:
-                raise RuntimeError("Uncovered logic path")
+                gd, _ = self.create_complete_bipart(deg_list, g2, paths)
+                pairs = [(source, target, 1) for source, target in
+                         self.get_balancing_pairs(gd, g2, useAssignmentSolver=(balancing == "assignment"))]
+
+            cost = base_cost
+            penalty_count = 0
+            for source, target, times in pairs:
+                edge_path = paths.get_edge_path(source, target)
+                cost += times * sum(weight_list[edge_id] for edge_id in edge_path)
+                penalty_count += times * int(is_penalty[edge_path].sum())
+            results[index] = {"penalty": penalty, "cost": cost, "penalty_edges": penalty_count,
+                              "reused_sources": int(paths.is_reused.sum())}
+        return results
+
+    def get_anytime_tour(self, useAvgPenalty, penalty, starting_vertex: int, useConstW = False, constW = 80,
+                         balancing = "flow", time_budget: float = 1.0, monitor: "SolveMonitor" = None):
+        """
+        Anytime mode of get_postman_tour (parameters as there). Tour for greedy orientation is found first
+        (whatever the budget is), then improve_orientation searches for better orientation of undirected
+        edges while time allows - leaving time for balancing the graph once more, as long as the greedy
+        solve took. Improved orientation is solved in a new G1 (this one stays balanced greedily).
+        Monitor measures the greedy solve, then gets progress of the search ("anytime_search" stage, fraction
+        of its time used) & may cancel it after every evaluation.
+        :return: PostmanTour - the best one found; its stats tell "greedy_cost", "evaluations" & "flipped_edges"
+        """
+        deadline = perf_counter() + time_budget
+        unbalanced = GenericGraph(self.graph.copy())
+        tour = self.get_postman_tour(useAvgPenalty, penalty, None, useConstW, constW, balancing, starting_vertex,
+                                     quiet=True, monitor=monitor)
+        stats = dict(tour.stats, greedy_cost=tour.cost, evaluations=0, flipped_edges=0)
+        tour.stats = stats
+        solve_time = sum(value for key, value in stats.items() if key.startswith("time_"))
+        if perf_counter() + solve_time >= deadline or "time_balancing" not in stats:
+            return tour
+
+        g1 = G1.__new__(G1)
+        GenericGraph.__init__(g1, unbalanced.graph)
+        if useAvgPenalty:
+            g2 = g1.add_penaltyAvg_edges(penalty)
+        else:
+            g2 = g1.add_penaltyTm_edges(penalty, useConstW, constW)
+        flipped, stats["evaluations"] = g1.improve_orientation(g2, deadline - solve_time, monitor)
+        stats["flipped_edges"] = int(flipped.size)
+        if not flipped.size:
+            return tour
+        if monitor is not None:
+            monitor.check_cancel()
+
+        edges = np.array(g1.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        edges[flipped] = edges[flipped, ::-1]
+        improved = Graph(n=g1.graph.vcount(), edges=GenericGraph.make_edge_list(edges[:, 0], edges[:, 1]),
+                         directed=True)
+        for attribute in g1.graph.vs.attributes():
+            improved.vs[attribute] = g1.graph.vs[attribute]
+        for attribute in g1.graph.es.attributes():
+            improved.es[attribute] = g1.graph.es[attribute]
+        improved_g1 = G1.__new__(G1)
+        GenericGraph.__init__(improved_g1, improved)
+        improved_tour = improved_g1.get_postman_tour(useAvgPenalty, penalty, None, useConstW, constW, balancing,
+                                                     starting_vertex, quiet=True)
+        if improved_tour.cost >= tour.cost:
+            return tour
+        improved_tour.stats = dict(improved_tour.stats, greedy_cost=stats["greedy_cost"],
+                                   evaluations=stats["evaluations"], flipped_edges=stats["flipped_edges"])
+        return improved_tour
+
+    def improve_orientation(self, g2: GenericGraph, deadline: float, monitor: "SolveMonitor" = None):
+        """
+        Local search over orientation of transformed (originally undirected) edges of unbalanced G1.
+        G2 does not depend on their orientation (both directions are legal), so cost of an orientation
+        is the weight of G1 plus cost of optimal flow balancing between its unbalanced vertices.
+        Reversing edge u -> v raises degree of u & lowers degree of v by 2 - edges whose reversal does not
+        make vertices more unbalanced are tried, the ones reducing imbalance most first, & kept if the cost
+        drops. Flows of the current orientation are a warm start of the next transportation problem.
+        Passes over candidates are repeated until no edge helps or deadline (perf_counter time) comes.
+        :param monitor: SolveMonitor getting progress after every evaluation (see SolveMonitor.report_step);
+                        SolveCancelled is raised if its cancel callback asks to stop.
+        :return: (ids of edges to be reversed, number of evaluated orientations)
+        """
+        edges = np.array(self.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        sources, targets = edges[:, 0].copy(), edges[:, 1].copy()
+        transformed = np.flatnonzero([bool(flag) for flag in self.graph.es["transformed"]])
+        degrees = (np.bincount(targets, minlength=self.graph.vcount())
+                   - np.bincount(sources, minlength=self.graph.vcount()))
+        is_flipped = np.zeros(edges.shape[0], dtype=bool)
+        rows = {}   # vertex -> distances from it to all vertices in g2
+
+        def get_rows(vertices):
+            missing = [v for v in vertices if v not in rows]
+            if missing:
+                for v, row in zip(missing, g2.graph.distances(source=missing, weights="weight", mode=OUT)):
+                    rows[v] = np.asarray(row, dtype=float)
+            return np.array([rows[v] for v in vertices]).reshape(len(vertices), -1)
+
+        def evaluate(degrees, warm):
+            supply_vertices, demand_vertices = np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0)
+            costs = get_rows(supply_vertices.tolist())[:, demand_vertices]
+            initial_flows = None
+            if warm is not None:
+                warm_sources, warm_targets, warm_flows = warm
+                rows_of = np.searchsorted(supply_vertices, warm_sources)
+                columns_of = np.searchsorted(demand_vertices, warm_targets)
+                is_kept = ((rows_of < supply_vertices.size) & (columns_of < demand_vertices.size))
+                is_kept[is_kept] &= ((supply_vertices[rows_of[is_kept]] == warm_sources[is_kept])
+                                     & (demand_vertices[columns_of[is_kept]] == warm_targets[is_kept]))
+                initial_flows = np.zeros(costs.shape, dtype=np.int64)
+                initial_flows[rows_of[is_kept], columns_of[is_kept]] = warm_flows[is_kept]
+            flows = solve_transportation(degrees[supply_vertices], -degrees[demand_vertices], costs, initial_flows)
+            i, j = np.nonzero(flows)
+            return float((flows[i, j] * costs[i, j]).sum()), (supply_vertices[i], demand_vertices[j], flows[i, j])
+
+        def report_step():
+            if monitor is not None:
+                monitor.count("anytime_evaluations")
+                monitor.report_step("anytime_search",
+                                    (perf_counter() - search_start) / max(deadline - search_start, 1e-9))
+
+        search_start = perf_counter()
+        cost, warm = evaluate(degrees, None)
+        evaluations = 1
+        report_step()
+        is_improved = True
+        while is_improved and perf_counter() < deadline:
+            is_improved = False
+            du, dv = degrees[sources[transformed]], degrees[targets[transformed]]
+            change = np.abs(du + 2) - np.abs(du) + np.abs(dv - 2) - np.abs(dv)
+            for edge_id in transformed[np.argsort(change, kind="stable")][np.sort(change) <= 0].tolist():
+                if perf_counter() >= deadline:
+                    break
+                u, v = sources[edge_id], targets[edge_id]
+                if abs(degrees[u] + 2) + abs(degrees[v] - 2) > abs(degrees[u]) + abs(degrees[v]):
+                    continue    # earlier reversals made it worse
+                degrees[u] += 2
+                degrees[v] -= 2
+                new_cost, new_warm = evaluate(degrees, warm)
+                evaluations += 1
+                report_step()
+                if new_cost < cost:
+                    cost, warm = new_cost, new_warm
+                    sources[edge_id], targets[edge_id] = v, u
+                    is_flipped[edge_id] = ~is_flipped[edge_id]
+                    is_improved = True
+                else:
+                    degrees[u] -= 2
+                    degrees[v] += 2
+        return np.flatnonzero(is_flipped), evaluations
+
+    def get_postman_tours(self, useAvgPenalty, penalty, starting_vertex_labels, useConstW = False, constW = 80,
+                          balancing = "matching"):
+        """
+        Tours for many starting vertices (e.g. depots) at the cost of one solve - graph is balanced & Euler cycle
+        is found once, then it is rotated to start at every given vertex (see PostmanTour.rotate).
+        Parameters as in get_postman_tour.
+        :param starting_vertex_labels: labels of starting vertices
+        :return: list of PostmanTour objects, in order of starting_vertex_labels
+        """
+        starting_vertices = []
+        for label in starting_vertex_labels:
+            starting_vertices.append(self.get_vertex_index(label))
+        if not starting_vertices:
+            return []
+
+        tour = self.get_postman_tour(useAvgPenalty, penalty, None, useConstW, constW, balancing,
+                                     starting_vertices[0], quiet=True)
+        return [tour] + list(tour.iter_rotations(starting_vertices[1:]))
+
+
+class FeasibilityReport:
+    """
+    Result of the feasibility precheck of a network (see GenericGraph.check_feasibility), computed in linear time
+    before the expensive stages. Undirected edges are treated as two-way. Network is feasible if it is
+    strongly connected - every edge can be traversed & left without going against one-way edges.
+    Otherwise the tour exists only thanks to penalty edges (or not at all, if the network is not even
+    weakly connected).
+    """
+    def __init__(self, vertex_count: int, sources, targets, two_way):
+        """
+        :param sources: array of edges' start vertices
+        :param targets: array of edges' end vertices
+        :param two_way: boolean array - can the edge be traversed in both directions?
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        two_way = np.asarray(two_way, dtype=bool)
+        arcs_from = np.concatenate((sources, targets[two_way]))
+        arcs_to = np.concatenate((targets, sources[two_way]))
+        g = Graph(n=vertex_count, edges=GenericGraph.make_edge_list(arcs_from, arcs_to), directed=True)
+
+        self.vertex_count = vertex_count
+        self.weak_components = np.asarray(g.connected_components(mode=WEAK).membership, dtype=np.int64)
+        self.strong_components = np.asarray(g.connected_components(mode=STRONG).membership, dtype=np.int64)
+        self.is_connected = vertex_count == 0 or int(self.weak_components.max()) == 0
+        self.is_strongly_connected = vertex_count == 0 or int(self.strong_components.max()) == 0
+        # vertices which can not be left (dead ends) or entered without going against one-way edges
+        out_degrees = np.bincount(arcs_from, minlength=vertex_count)
+        in_degrees = np.bincount(arcs_to, minlength=vertex_count)
+        self.dead_ends = np.flatnonzero((out_degrees == 0) & (in_degrees > 0))
+        self.unreachable = np.flatnonzero((in_degrees == 0) & (out_degrees > 0))
+        self.isolated = np.flatnonzero((in_degrees == 0) & (out_degrees == 0)) if vertex_count > 1 \
+            else np.zeros(0, dtype=np.int64)
+        # one-way edges between different strong components - they can not be traversed & returned from legally
+        self.bridging_edges = np.flatnonzero(~two_way & (self.strong_components[sources]
+                                                         != self.strong_components[targets]))
+        self.bridging_ends = np.column_stack((sources[self.bridging_edges], targets[self.bridging_edges]))
+
+    def as_dict(self):
+        """
+        :return: JSON-serializable dictionary of the report
+        """
+        return {"is_connected": self.is_connected, "is_strongly_connected": self.is_strongly_connected,
+                "weak_component_count": int(self.weak_components.max()) + 1 if self.vertex_count else 0,
+                "strong_component_count": int(self.strong_components.max()) + 1 if self.vertex_count else 0,
+                "dead_ends": self.dead_ends.tolist(), "unreachable": self.unreachable.tolist(),
+                "isolated": self.isolated.tolist(), "bridging_edges": self.bridging_edges.tolist()}
+
+    def describe(self, labels: list = None, limit: int = 10):
+        """
+        :param labels: labels of vertices (vertex ids are shown if not given)
+        :param limit: maximal number of vertices & edges listed in every category
+        :return: one line summary of the problems found (empty if the network is feasible)
+        """
+        def name(vertex):
+            return str(labels[vertex]) if labels is not None else str(vertex)
+
+        def show(ids):
+            return ", ".join(name(i) for i in ids[:limit].tolist()) + (", ..." if ids.size > limit else "")
+
+        problems = []
+        if not self.is_connected:
+            problems.append("{} weakly connected components".format(int(self.weak_components.max()) + 1))
+        if self.isolated.size:
+            problems.append("isolated vertices: " + show(self.isolated))
+        if not self.is_strongly_connected:
+            problems.append("{} strongly connected components".format(int(self.strong_components.max()) + 1))
+        if self.dead_ends.size:
+            problems.append("dead ends: " + show(self.dead_ends))
+        if self.unreachable.size:
+            problems.append("unreachable vertices: " + show(self.unreachable))
+        if self.bridging_edges.size:
+            edges = ["#{} ({} -> {})".format(edge_id, name(source), name(target)) for edge_id, (source, target)
+                     in zip(self.bridging_edges[:limit].tolist(), self.bridging_ends[:limit].tolist())]
+            problems.append("one-way edges between components: " + ", ".join(edges)
+                            + (", ..." if self.bridging_edges.size > limit else ""))
+        return "; ".join(problems)
+
+
+class UnknownVertexLabel(LookupError, RuntimeError):
+    """
+    Raised by GenericGraph.get_vertex_index for label no vertex has.
+    """
+
+
+class InfeasibleNetwork(RuntimeError):
+    """
+    Raised by G1.get_postman_tour when the feasibility precheck rejects the network.
+    The report (FeasibilityReport) tells which vertices & edges are the problem.
+    """
+    def __init__(self, message: str, report: FeasibilityReport):
+        super(InfeasibleNetwork, self).__init__(message)
+        self.report = report
+
+
+class SolveCancelled(RuntimeError):
+    """
+    Raised by G1.get_postman_tour when cancel callback of its SolveMonitor asks to stop.
+    """
+
+
+class SolveMonitor:
+    """
+    Instrumentation of G1.get_postman_tour: per-stage wall & CPU time, peak memory, counters
+    & pluggable progress/cancellation callbacks. Stages are reported at their end, so the monitor
+    costs a few calls per stage - when no monitor is given, get_postman_tour does not use it at all.
+    """
+    STAGES = ["penalty_graph", "shortest_paths", "balancing", "euler_cycle"]
+
+    def __init__(self, progress=None, cancel=None, trace_memory: bool = False):
+        """
+        :param progress: function(stage, fraction) called after every stage; fraction - part of stages done (0..1)
+        :param cancel: function() called after every stage; if it returns True, solving stops with SolveCancelled
+        :param trace_memory: if True, peak memory is traced by tracemalloc (allocations made through Python,
+                             precise but slow), otherwise it is the growth of process' peak resident memory
+        """
+        self.progress = progress
+        self.cancel = cancel
+        self.trace_memory = trace_memory
+        self.stages = {}        # stage -> {"wall", "cpu", "peak_memory"}
+        self.counters = Counter()
+        self.stage_wall = None
+        self.stage_cpu = None
+        self.stage_peak = None
+
+    def start(self):
+        """
+        Starts measuring the first stage.
+        """
+        self.stages.clear()
+        self.counters.clear()
+        if self.trace_memory:
+            tracemalloc.start()
+        self.start_stage()
+        self.check_cancel()
+
+    def start_stage(self):
+        """
+        Starts measuring the next stage.
+        """
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.stage_peak = self.get_peak_rss()
+        self.stage_cpu = process_time()
+        self.stage_wall = perf_counter()
+
+    def end_stage(self, stage: str):
+        """
+        Records measurements of finished stage, reports progress & starts measuring the next stage.
+        :raise SolveCancelled: if cancel callback asks to stop
+        """
+        wall = perf_counter() - self.stage_wall
+        cpu = process_time() - self.stage_cpu
+        if self.trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
         else:
-            print("Finding Euler...")
-            cost, tour, tour_by_id = self.FindEuler(starting_vertex_label)
+            peak_rss = self.get_peak_rss()
+            peak_memory = None if peak_rss is None else peak_rss - self.stage_peak
+        self.stages[stage] = {"wall": wall, "cpu": cpu, "peak_memory": peak_memory}
+
+        if self.progress is not None:
+            done = self.STAGES.index(stage) + 1 if stage in self.STAGES else 0
+            self.progress(stage, done / len(self.STAGES))
+        self.check_cancel()
+        self.start_stage()
+
+    def report_step(self, stage: str, fraction: float):
+        """
+        Reports progress within a long stage (e.g. local search of anytime mode) & checks cancellation.
+        :param fraction: part of the stage done (0..1)
+        :raise SolveCancelled: if cancel callback asks to stop
+        """
+        if self.progress is not None:
+            self.progress(stage, min(max(fraction, 0.0), 1.0))
+        self.check_cancel()
+
+    def finish(self):
+        """
+        Stops measuring (called also when solving fails).
+        """
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def check_cancel(self):
+        """
+        :raise SolveCancelled: if cancel callback asks to stop
+        """
+        if self.cancel is not None and self.cancel():
+            self.finish()
+            raise SolveCancelled("Solving cancelled")
+
+    def count(self, counter: str, amount: int = 1):
+        """
+        Increases the counter (e.g. "shortest_path_searches") by given amount.
+        """
+        self.counters[counter] += amount
+
+    def report(self):
+        """
+        :return: dictionary with all measurements - {"stages": ..., "counters": ...}
+        """
+        return {"stages": dict(self.stages), "counters": dict(self.counters)}
+
+    @staticmethod
+    def get_peak_rss():
+        """
+        :return: peak resident memory of the process so far, in bytes (None if it cannot be read on this system)
+        """
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PostmanTour:
+    """
+    Result of chinese postman problem, returned by G1.get_postman_tour in quiet mode.
+    Route is kept as compact arrays of vertex & edge ids - labels are produced lazily, on demand.
+    """
+    def __init__(self, graph: GenericGraph, cost, vertex_ids, edge_ids, penalties: int, stats: dict):
+        """
+        :param graph: graph (G1) the tour goes through
+        :param cost: total weight of the tour
+        :param vertex_ids: consecutive vertices of the tour (first & last one are the same)
+        :param edge_ids: consecutive edges of the tour (ids in graph)
+        :param penalties: number of penalty edges in the tour
+        :param stats: statistics of the algorithm's stages (sizes & durations)
+        """
+        self.graph = graph
+        self.cost = cost
+        self.vertex_ids = np.asarray(vertex_ids, dtype=np.int64)
+        self.edge_ids = np.asarray(edge_ids, dtype=np.int64)
+        self.penalties = penalties
+        self.stats = stats
+        self.first_positions = None     # vertex id -> its first position in the tour (-1 if not visited)
+
+    def __len__(self):
+        """
+        :return: number of edges in the tour
+        """
+        return self.edge_ids.size
+
+    def iter_route(self):
+        """
+        Generator of the tour's vertices' labels, one by one.
+        """
+        labels = self.graph.get_vertex_labels()
+        for vertex_id in self.vertex_ids.tolist():
+            yield labels[vertex_id]
+
+    def iter_chunks(self, chunk_size: int = 10000):
+        """
+        Generator of the tour's vertices' labels, in lists of at most chunk_size labels.
+        """
+        labels = self.graph.get_vertex_labels()
+        for chunk_start in range(0, self.vertex_ids.size, chunk_size):
+            yield [labels[v] for v in self.vertex_ids[chunk_start:chunk_start + chunk_size].tolist()]
 
-        return cost, tour, tour_by_id, iPenCnt
+    def write_route(self, file, separator: str = "\n", chunk_size: int = 10000):
+        """
+        Writes labels of the tour's vertices to the file, chunk by chunk - whole route is never kept in memory.
+        :param file: path of the file or file object opened for writing text
+        :param separator: separator written between consecutive labels
+        :param chunk_size: number of labels written at once
+        """
+        if isinstance(file, str):
+            with open(file, "w") as opened_file:
+                return self.write_route(opened_file, separator, chunk_size)
+
+        is_first = True
+        for chunk in self.iter_chunks(chunk_size):
+            if not is_first:
+                file.write(separator)
+            file.write(separator.join(str(label) for label in chunk))
+            is_first = False
+        file.write("\n")
+
+    def rotate(self, starting_vertex: int):
+        """
+        The same closed tour, started at another vertex - cost, penalties & edges are the same, so no solving
+        is needed, just a linear time rotation of the arrays. Graph & stats are shared with this tour.
+        :param starting_vertex: index of new starting vertex
+        :return: PostmanTour starting (& ending) at given vertex
+        """
+        if self.first_positions is None:
+            visited, positions = np.unique(self.vertex_ids[:-1], return_index=True)
+            self.first_positions = np.full(len(self.graph.get_vertex_labels()), -1, dtype=np.int64)
+            self.first_positions[visited] = positions
+        if not 0 <= starting_vertex < self.first_positions.size or self.first_positions[starting_vertex] < 0:
+            raise RuntimeError("Tour does not visit vertex {}".format(starting_vertex))
+
+        position = self.first_positions[starting_vertex]
+        vertex_ids = np.concatenate((self.vertex_ids[position:-1], self.vertex_ids[:position + 1]))
+        edge_ids = np.concatenate((self.edge_ids[position:], self.edge_ids[:position]))
+        return PostmanTour(self.graph, self.cost, vertex_ids, edge_ids, self.penalties, self.stats)
+
+    def iter_rotations(self, starting_vertices):
+        """
+        Generator of tours started at given vertices (see rotate) - one by one, so only one of them
+        has to be kept in memory at a time.
+        :param starting_vertices: indices of starting vertices
+        """
+        for starting_vertex in starting_vertices:
+            yield self.rotate(starting_vertex)
 
+    def as_tuple(self):
+        """
+        :return: (cost, tour, tour_by_id, iPenCnt) - the same as get_postman_tour returns in normal mode.
+        """
+        return self.cost, list(self.iter_route()), self.vertex_ids.tolist(), self.penalties
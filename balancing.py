@@ -0,0 +1,183 @@
+import numpy as np
+
+
+def solve_transportation(supplies, demands, costs, initial_flows=None):
+    """
+    Solves balanced transportation problem with successive shortest paths method.
+    Every supply vertex is connected with every demand vertex by an arc of unlimited capacity.
+    Memory & time depend on the number of supply/demand vertices, not on the sum of supplies.
+    :param supplies: integer array - how many units every supply vertex sends
+    :param demands: integer array - how many units every demand vertex receives
+    :param costs: array of shape (supplies x demands) - cost of sending one unit (np.inf if arc does not exist)
+    :param initial_flows: flows to start from (warm start), e.g. solution of a similar problem; they are cut down
+                          to fit supplies & demands & used only if they are optimal for what they send
+    :return: integer array of shape (supplies x demands) - optimal flow on every arc
+    """
+    supplies = np.array(supplies, dtype=np.int64)
+    demands = np.array(demands, dtype=np.int64)
+    costs = np.asarray(costs, dtype=float).reshape(supplies.size, demands.size)
+
+    # safety check
+    if supplies.sum() != demands.sum() or np.any(supplies < 0) or np.any(demands < 0):
+        raise RuntimeError("Transportation problem is not balanced")
+
+    flows = np.zeros(costs.shape, dtype=np.int64)
+    if supplies.size == 0 or demands.size == 0:
+        return flows
+
+    is_arc = np.isfinite(costs)
+    costs = np.where(is_arc, costs, 0.0)
+    supply_count = supplies.size
+
+    potentials = None
+    if initial_flows is not None:
+        warm_flows, warm_supplies, warm_demands = fit_flows(initial_flows, supplies, demands, is_arc)
+        potentials = get_potentials(warm_flows, warm_supplies, costs, is_arc)
+        if potentials is not None:
+            flows, supplies, demands = warm_flows, warm_supplies, warm_demands
+
+    if potentials is not None:
+        # potentials of vertices, keeping reduced costs of residual arcs non-negative
+        potential_s, potential_d = potentials
+    else:
+        potential_s = np.zeros(supplies.size)
+        potential_d = np.where(is_arc.any(axis=0), np.where(is_arc, costs, np.inf).min(axis=0), 0.0)
+
+        # initial flow - every demand vertex takes what it can from its cheapest supply vertex
+        # (arcs of zero reduced cost)
+        cheapest = np.where(is_arc, costs, np.inf).argmin(axis=0).tolist()
+        for j, i in enumerate(cheapest):
+            if is_arc[i, j]:
+                amount = min(supplies[i], demands[j])
+                flows[i, j] += amount
+                supplies[i] -= amount
+                demands[j] -= amount
+
+    while supplies.sum() > 0:
+        reduced = np.where(is_arc, np.maximum(costs + potential_s[:, None] - potential_d[None, :], 0.0), np.inf)
+
+        # Dijkstra on dense residual graph, started from all vertices with remaining supply
+        # vertices are numbered: supply ones first, then demand ones
+        dist = np.full(supply_count + demands.size, np.inf)
+        # (as if from a super-source joined to them by arcs of zero cost - their potentials are not positive)
+        has_supply = supplies > 0
+        dist[:supply_count][has_supply] = np.maximum(-potential_s[has_supply], 0.0)
+        dist_s, dist_d = dist[:supply_count], dist[supply_count:]
+        open_dist = dist.copy()     # distances of vertices not settled yet (np.inf for settled ones)
+        pred = np.full(dist.size, -1)   # preceding vertex (demand one for supply vertex & vice versa)
+        terminal = -1
+        while True:
+            k = int(open_dist.argmin())
+            if open_dist[k] == np.inf:
+                break
+            open_dist[k] = np.inf
+
+            if k < supply_count:
+                # forward arcs: supply vertex k -> every demand vertex
+                new_dist = dist[k] + reduced[k]
+                is_better = new_dist < dist_d
+                dist_d[is_better] = new_dist[is_better]
+                open_dist[supply_count:][is_better] = new_dist[is_better]
+                pred[supply_count:][is_better] = k
+            else:
+                j = k - supply_count
+                if demands[j] > 0:
+                    terminal = j
+                    break
+                # backward arcs: demand vertex j -> supply vertices already sending flow to j
+                new_dist = dist[k] + np.maximum(-np.where(is_arc[:, j], reduced[:, j], 0.0), 0.0)
+                is_better = (flows[:, j] > 0) & (new_dist < dist_s)
+                dist_s[is_better] = new_dist[is_better]
+                open_dist[:supply_count][is_better] = new_dist[is_better]
+                pred[:supply_count][is_better] = k
+
+        if terminal == -1:
+            raise RuntimeError("Problem not solvable for this graph")
+
+        # find the path & its bottleneck
+        path = []   # consecutive arcs as (supply vertex, demand vertex, is forward)
+        j = terminal
+        while True:
+            i = pred[supply_count + j]
+            path.append((i, j, True))
+            if pred[i] == -1:
+                origin = i
+                break
+            j = pred[i] - supply_count
+            path.append((i, j, False))
+
+        amount = min(supplies[origin], demands[terminal])
+        for i, j, is_forward in path:
+            if not is_forward:
+                amount = min(amount, flows[i, j])
+
+        # augment
+        for i, j, is_forward in path:
+            flows[i, j] += amount if is_forward else -amount
+        supplies[origin] -= amount
+        demands[terminal] -= amount
+
+        limit = dist_d[terminal]
+        potential_s += np.minimum(dist_s, limit)
+        potential_d += np.minimum(dist_d, limit)
+
+    return flows
+
+
+def fit_flows(initial_flows, supplies, demands, is_arc):
+    """
+    Cuts flows down, so no vertex sends or receives more than it should & only existing arcs are used.
+    :return: (flows, remaining supplies, remaining demands)
+    """
+    supplies = supplies.copy()
+    demands = demands.copy()
+    flows = np.zeros(is_arc.shape, dtype=np.int64)
+    initial_flows = np.asarray(initial_flows, dtype=np.int64).reshape(is_arc.shape)
+    for i, j in zip(*np.nonzero((initial_flows > 0) & is_arc)):
+        amount = min(initial_flows[i, j], supplies[i], demands[j])
+        flows[i, j] = amount
+        supplies[i] -= amount
+        demands[j] -= amount
+    return flows, supplies, demands
+
+
+def get_potentials(flows, supplies, costs, is_arc):
+    """
+    Bellman-Ford on residual graph of the flows, started from all vertices at once.
+    Forward arcs (supply -> demand vertex) cost as given, backward ones (arcs with flow) - the opposite.
+    :return: (potential_s, potential_d) making reduced costs of residual arcs non-negative
+             (& not positive for vertices with remaining supply) or None if the flows are not optimal
+             (residual graph has a negative cycle)
+    """
+    forward_costs = np.where(is_arc, costs, np.inf)
+    backward_costs = np.where(flows > 0, -costs, np.inf)
+    dist_s = np.zeros(costs.shape[0])
+    dist_d = np.zeros(costs.shape[1])
+    for _ in range(sum(costs.shape) + 1):
+        new_dist_d = np.minimum(dist_d, (dist_s[:, None] + forward_costs).min(axis=0))
+        new_dist_s = np.minimum(dist_s, (new_dist_d[None, :] + backward_costs).min(axis=1))
+        if np.array_equal(new_dist_d, dist_d) and np.array_equal(new_dist_s, dist_s):
+            shift = dist_s[supplies > 0].max() if np.any(supplies > 0) else 0.0
+            return dist_s - shift, dist_d - shift
+        dist_s, dist_d = new_dist_s, new_dist_d
+    return None
+
+
+def solve_assignment(costs):
+    """
+    Solves (rectangular) assignment problem - every row is assigned to a different column with minimal total cost.
+    Uses linear sum assignment solver from scipy; costs may be any floats, np.inf marks forbidden pairs.
+    :param costs: array of shape (rows x columns)
+    :return: (rows, columns) - arrays of assigned pairs' indices
+    """
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        raise RuntimeError("Assignment solver requires scipy package")
+
+    costs = np.asarray(costs, dtype=float)
+    try:
+        rows, columns = linear_sum_assignment(costs)
+    except ValueError:
+        raise RuntimeError("Problem not solvable for this graph")
+    return rows, columns
@@ -0,0 +1,158 @@
+from algorithm import *
+import argparse
+import generators
+import json
+import sys
+import tracemalloc
+from time import perf_counter
+
+            # default benchmark params
+VERTEX_COUNTS = [100, 1000, 10000, 100000]
+UNDIRECTED_RATIOS = [0.1, 0.5, 0.9]
+EDGES_PER_VERTEX = 3
+PENALTY = 3
+STAGES = ["graph_g", "graph_g1", "penalty_graph", "shortest_paths", "balancing", "euler_cycle"]
+
+
+def make_benchmark_graph(vertex_count: int, undirected_ratio: float, edges_per_vertex: int = EDGES_PER_VERTEX,
+                         seed: int = 0):
+    """
+    Creates edge arrays of a random, strongly connected, partially directed graph.
+    Vertices are joined into a directed cycle (so the graph is strongly connected), rest of edges is random
+    (see generators.generate_graph).
+    :return: (sources, targets, directed, weights) - arrays describing edges
+    """
+    return generators.generate_graph(vertex_count, vertex_count * edges_per_vertex, undirected_ratio, "random",
+                                     strongly_connected=True, seed=seed)
+
+
+def measure(results: dict, stage: str, function, *args, trace_memory: bool = False, **kwargs):
+    """
+    Runs the stage & stores its duration (seconds) & memory it needed (bytes) in results.
+    By default memory is the growth of process' peak resident memory during the stage (it covers igraph's
+    allocations too, but stays 0 if the stage fits in memory used before). With trace_memory, it is the peak
+    of allocations made through Python (including numpy arrays), traced by tracemalloc - precise, but slow.
+    :return: value returned by the stage
+    """
+    if trace_memory:
+        tracemalloc.start()
+    peak_before = SolveMonitor.get_peak_rss() or 0
+    start = perf_counter()
+    value = function(*args, **kwargs)
+    duration = perf_counter() - start
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        peak_memory = (SolveMonitor.get_peak_rss() or 0) - peak_before
+    results[stage] = {"time": duration, "peak_memory": peak_memory}
+    return value
+
+
+def benchmark_pipeline(vertex_count: int, undirected_ratio: float, balancing: str = "flow", seed: int = 0,
+                       trace_memory: bool = False):
+    """
+    Runs every stage of the algorithm separately (as G1.get_postman_tour does) & measures it.
+    :return: dictionary - stage -> {"time", "peak_memory"}
+    """
+    sources, targets, directed, weights = make_benchmark_graph(vertex_count, undirected_ratio, seed=seed)
+    results = {}
+
+    def measure_stage(stage, function, *args, **kwargs):
+        return measure(results, stage, function, *args, trace_memory=trace_memory, **kwargs)
+
+    g = measure_stage("graph_g", PartiallyDirectedGraph.from_edge_arrays,
+                      sources, targets, directed, weights, vertex_count=vertex_count)
+    g1 = measure_stage("graph_g1", G1, g)
+    deg_list = []
+    if not g1.have_euler_tour(deg_list):
+        g2 = measure_stage("penalty_graph", g1.add_penaltyTm_edges, PENALTY)
+        degrees = np.asarray(deg_list)
+        paths = measure_stage("shortest_paths", ShortestPaths,
+                              g2, np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0))
+        if balancing == "flow":
+            measure_stage("balancing", g1.FlowBalancing, deg_list, g2, paths)
+        else:
+            def balance():
+                gd, _ = g1.create_complete_bipart(deg_list, g2, paths)
+                return g1.GraphBalancing(gd, g2, paths, useAssignmentSolver=(balancing == "assignment"))
+            measure_stage("balancing", balance)
+    measure_stage("euler_cycle", g1.FindEuler, None, 0, True)
+    return results
+
+
+def run_benchmarks(vertex_counts=VERTEX_COUNTS, undirected_ratios=UNDIRECTED_RATIOS, balancing: str = "flow",
+                   seed: int = 0, trace_memory: bool = False, report=print):
+    """
+    Benchmarks the pipeline for every graph size & ratio of undirected edges (scaling curves).
+    :return: dictionary - "<vertex count>/<undirected ratio>" -> results of benchmark_pipeline
+    """
+    all_results = {}
+    for vertex_count in vertex_counts:
+        for undirected_ratio in undirected_ratios:
+            key = "{}/{}".format(vertex_count, undirected_ratio)
+            all_results[key] = benchmark_pipeline(vertex_count, undirected_ratio, balancing, seed, trace_memory)
+            report(format_results(key, all_results[key]))
+    return all_results
+
+
+def format_results(key: str, results: dict):
+    """
+    :return: one line of the report - time [s] & peak memory [MB] of every stage
+    """
+    cells = ["{:>16}".format(key)]
+    for stage in STAGES:
+        if stage in results:
+            cells.append("{}: {:.4f}s {:.1f}MB".format(
+                stage, results[stage]["time"], results[stage]["peak_memory"] / 2 ** 20))
+    return " | ".join(cells)
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float = 0.5, min_time: float = 0.01):
+    """
+    Finds stages that got slower than in the baseline.
+    :param tolerance: allowed relative slowdown (0.5 - 50% slower)
+    :param min_time: stages faster than that (in seconds) are not compared - their timing is too noisy
+    :return: list of (key, stage, baseline time, current time) of regressed stages
+    """
+    regressions = []
+    for key, stages in results.items():
+        for stage, measurement in stages.items():
+            if key not in baseline or stage not in baseline[key]:
+                continue
+            baseline_time = baseline[key][stage]["time"]
+            if measurement["time"] > min_time and measurement["time"] > baseline_time * (1 + tolerance):
+                regressions.append((key, stage, baseline_time, measurement["time"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage by stage benchmark of chinese postman solver.")
+    parser.add_argument("--vertices", type=int, nargs="+", default=VERTEX_COUNTS, help="graph sizes")
+    parser.add_argument("--undirected", type=float, nargs="+", default=UNDIRECTED_RATIOS,
+                        help="ratios of undirected edges")
+    parser.add_argument("--balancing", default="flow", choices=["matching", "assignment", "flow"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure memory with tracemalloc (precise for Python allocations, but slow)")
+    parser.add_argument("--output", help="JSON file to save results to")
+    parser.add_argument("--baseline", help="JSON file with results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.vertices, args.undirected, args.balancing, args.seed, args.trace_memory)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_with_baseline(results, json.load(file), args.tolerance)
+        for key, stage, baseline_time, current_time in regressions:
+            print("REGRESSION {} {}: {:.4f}s -> {:.4f}s".format(key, stage, baseline_time, current_time))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
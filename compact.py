@@ -0,0 +1,320 @@
+from algorithm import *
+from storage import DIRECTED, TRANSFORMED, PENALTY
+
+
+class CompactGraph:
+    """
+    Array-backed graph - alternative to igraph's graph for G, G1 & G2. Edges are kept in flat arrays:
+    ends (int32), weights (int32 if they are integers) & flags (one byte: DIRECTED, TRANSFORMED & PENALTY bits,
+    as in storage module), with outgoing edges of every vertex indexed in CSR form (offsets & edge ids ordered
+    by source). It takes about 20 bytes per edge (nbytes, 3 edges per vertex), while igraph's graph with
+    attributes takes hundreds, & stages of the algorithm work on whole arrays. igraph's graph is built only
+    on request (to_igraph).
+    """
+    __slots__ = ("vertex_count", "sources", "targets", "weights", "flags", "offsets", "out_edges", "labels",
+                 "label_index")
+
+    def __init__(self, vertex_count: int, sources, targets, weights, flags, labels: list = None):
+        """
+        :param vertex_count: number of vertices
+        :param sources: array of edges' start vertices
+        :param targets: array of edges' end vertices
+        :param weights: array of edges' weights
+        :param flags: array of edges' flags (DIRECTED, TRANSFORMED & PENALTY bits)
+        :param labels: labels of vertices; by default as in PartiallyDirectedGraph.set_attributes
+        """
+        index_type = np.int32 if vertex_count < 2 ** 31 else np.int64
+        self.vertex_count = vertex_count
+        self.sources = np.asarray(sources).astype(index_type, copy=False)
+        self.targets = np.asarray(targets).astype(index_type, copy=False)
+        self.weights = self.get_compact_weights(np.asarray(weights))
+        self.flags = np.asarray(flags).astype(np.uint8, copy=False)
+        self.labels = labels.tolist() if isinstance(labels, np.ndarray) else labels
+        self.label_index = None
+
+        # CSR index of outgoing edges - edges of vertex v are out_edges[offsets[v]:offsets[v + 1]]
+        self.out_edges = np.argsort(self.sources, kind="stable").astype(index_type)
+        self.offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=vertex_count), out=self.offsets[1:])
+
+    @staticmethod
+    def get_compact_weights(weights: np.ndarray):
+        """
+        :return: weights as int32 array if they are integers in its range, otherwise as float64 array
+        """
+        if weights.size == 0:
+            return weights.astype(np.int32)
+        if np.issubdtype(weights.dtype, np.integer) or np.all(weights == np.round(weights)):
+            if -2 ** 31 <= weights.min() and weights.max() < 2 ** 31:
+                return weights.astype(np.int32)
+            return weights.astype(np.int64)
+        return weights.astype(np.float64)
+
+    @classmethod
+    def from_edge_arrays(cls, sources, targets, directed, weights=None, labels: list = None,
+                         vertex_count: int = None):
+        """
+        Creates graph G from edge arrays (parameters as in PartiallyDirectedGraph.from_edge_arrays).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        directed = np.asarray(directed, dtype=bool)
+        if sources.ndim != 1 or sources.shape != targets.shape or sources.shape != directed.shape:
+            raise RuntimeError("Wrong argument")
+        if vertex_count is None:
+            if labels is not None:
+                vertex_count = len(labels)
+            elif sources.size > 0:
+                vertex_count = int(max(sources.max(), targets.max())) + 1
+            else:
+                vertex_count = 0
+        if sources.size > 0 and (min(sources.min(), targets.min()) < 0
+                                 or max(sources.max(), targets.max()) >= vertex_count):
+            raise RuntimeError("Vertex id out of range")
+        if weights is None:
+            weights = np.ones(sources.size, dtype=np.int64)
+        return cls(vertex_count, sources, targets, weights, directed * np.uint8(DIRECTED), labels)
+
+    @classmethod
+    def from_graph(cls, graph: GenericGraph):
+        """
+        Creates compact copy of graph G, G1 or G2 (igraph-based).
+        """
+        g = graph.graph
+        edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        flags = np.zeros(g.ecount(), dtype=np.uint8)
+        for bit, attribute in ((DIRECTED, "directed"), (TRANSFORMED, "transformed"), (PENALTY, "IsPenalty")):
+            if attribute in g.es.attributes():
+                flags |= np.array([bool(value) for value in g.es[attribute]], dtype=np.uint8) * np.uint8(bit)
+        weights = np.asarray(g.es["weight"] if "weight" in g.es.attributes() else np.ones(g.ecount()))
+        return cls(g.vcount(), edges[:, 0], edges[:, 1], weights, flags, graph.get_vertex_labels())
+
+    @property
+    def nbytes(self):
+        """
+        :return: memory taken by arrays of the graph (bytes)
+        """
+        return sum(array.nbytes for array in (self.sources, self.targets, self.weights, self.flags, self.offsets,
+                                              self.out_edges))
+
+    def get_vertex_labels(self):
+        """
+        :return: list of labels, ordered by vertex index (default ones are made on first use)
+        """
+        if self.labels is None:
+            if self.vertex_count <= len(ascii_lowercase):
+                self.labels = list(ascii_lowercase[:self.vertex_count])
+            else:
+                self.labels = [str(i) for i in range(self.vertex_count)]
+        return self.labels
+
+    def get_vertex_index(self, label):
+        """
+        :return: index of the (first) vertex with given label
+        :raise UnknownVertexLabel: if there is no such vertex (as GenericGraph.get_vertex_index)
+        """
+        if self.label_index is None:
+            self.label_index = {lbl: idx for idx, lbl in reversed(list(enumerate(self.get_vertex_labels())))}
+        index = self.label_index.get(label)
+        if index is None:
+            raise UnknownVertexLabel("Unknown vertex label: {}".format(label))
+        return index
+
+    def get_flag(self, bit: int):
+        """
+        :return: boolean array - has given edge the flag (DIRECTED, TRANSFORMED or PENALTY)?
+        """
+        return (self.flags & np.uint8(bit)) != 0
+
+    def get_degrees(self):
+        """
+        :return: array - degree (incoming - outgoing edges) of every vertex, counting edges as directed
+        """
+        return (np.bincount(self.targets, minlength=self.vertex_count)
+                - np.bincount(self.sources, minlength=self.vertex_count))
+
+    def is_connected(self):
+        """
+        :return: Boolean value - is graph (weakly) connected? Checked without building igraph's graph.
+        """
+        if self.vertex_count <= 1:
+            return True
+        parents = np.arange(self.vertex_count)      # union-find over edges, all at once per round
+        sources, targets = self.sources.astype(np.int64), self.targets.astype(np.int64)
+        while True:
+            roots_s, roots_t = parents[sources], parents[targets]
+            lower = np.minimum(roots_s, roots_t)
+            new_parents = parents.copy()
+            np.minimum.at(new_parents, roots_s, lower)
+            np.minimum.at(new_parents, roots_t, lower)
+            new_parents = new_parents[new_parents]
+            if np.array_equal(new_parents, parents):
+                return bool(np.all(parents == 0))
+            parents = new_parents
+
+    def orient(self):
+        """
+        Transformation from graph G to G1 - undirected edges are oriented greedily (G1.orient_undirected_edges).
+        :return: CompactGraph G1 - all edges directed, originally undirected ones flagged as TRANSFORMED
+        """
+        directed = self.get_flag(DIRECTED)
+        sources, targets = G1.orient_undirected_edges(self.vertex_count, self.sources.astype(np.int64),
+                                                      self.targets.astype(np.int64), directed)
+        flags = np.where(directed, np.uint8(DIRECTED), np.uint8(DIRECTED | TRANSFORMED)).astype(np.uint8)
+        return CompactGraph(self.vertex_count, sources, targets, self.weights, flags, self.labels)
+
+    def add_penalty_edges(self, penalty_weights):
+        """
+        Creates G2 from G1 (as G1.add_penalty_edges) - edge in reverse direction is added for every edge;
+        i-th edge keeps its id, its reverse gets id (number of edges + i).
+        :param penalty_weights: array - weight of penalty edge for every edge (used for non-transformed ones)
+        :return: CompactGraph G2
+        """
+        transformed = self.get_flag(TRANSFORMED)
+        backward_weights = np.where(transformed, self.weights, np.asarray(penalty_weights))
+        backward_flags = np.where(transformed, self.flags, self.flags | np.uint8(PENALTY)).astype(np.uint8)
+        return CompactGraph(self.vertex_count, np.concatenate((self.sources, self.targets)),
+                            np.concatenate((self.targets, self.sources)),
+                            np.concatenate((self.weights, backward_weights)),
+                            np.concatenate((self.flags, backward_flags)), self.labels)
+
+    def get_penalty_weights(self, useAvgPenalty, penalty, useConstW=False, constW=80):
+        """
+        :return: weights of penalty edges, chosen as in G1.get_postman_tour
+        """
+        if useAvgPenalty:
+            average = int((self.weights.sum() / self.weights.size) + 0.5) if self.weights.size else 0
+            return np.full(self.weights.size, average * penalty)
+        if useConstW:
+            return np.full(self.weights.size, constW)
+        return self.weights.astype(np.int64) * penalty
+
+    def get_shortest_paths(self, sources: np.ndarray, targets: np.ndarray):
+        """
+        Dijkstra searches from all sources at once, on sparse matrix of the graph (scipy.sparse.csgraph).
+        Parallel edges are reduced to the cheapest one.
+        :return: (distances - array (sources x targets), function(source row, target) -> list of edges' ids)
+        """
+        try:
+            from scipy.sparse import csr_matrix
+            from scipy.sparse.csgraph import dijkstra
+        except ImportError:
+            raise RuntimeError("Shortest paths in compact graph require scipy package")
+
+        # the cheapest edge for every (source, target) pair of vertices
+        keys = self.sources.astype(np.int64) * self.vertex_count + self.targets
+        order = np.lexsort((self.weights, keys))
+        is_first = np.concatenate(([True], keys[order][1:] != keys[order][:-1]))
+        cheapest = order[is_first]
+        cheapest_keys = keys[cheapest]
+        matrix = csr_matrix((self.weights[cheapest].astype(float), (self.sources[cheapest], self.targets[cheapest])),
+                            shape=(self.vertex_count, self.vertex_count))
+        all_distances, predecessors = dijkstra(matrix, indices=sources, return_predecessors=True)
+
+        def get_edge_path(row: int, target: int):
+            vertices = [target]
+            while predecessors[row, vertices[-1]] >= 0:
+                vertices.append(int(predecessors[row, vertices[-1]]))
+            vertices.reverse()
+            path_keys = np.asarray(vertices[:-1], dtype=np.int64) * self.vertex_count + vertices[1:]
+            return cheapest[np.searchsorted(cheapest_keys, path_keys)].tolist()
+
+        return all_distances[:, targets], get_edge_path
+
+    def find_euler(self, start_vertex: int = 0, counts: np.ndarray = None):
+        """
+        Euler cycle (Hierholzer's algorithm, as G1.FindEuler) walking CSR index of outgoing edges.
+        :param counts: how many times every edge is traversed (default: once); edges with count 0 are skipped
+        :return: (vertex ids, edge ids) - consecutive vertices & edges of the cycle
+        """
+        if counts is None:
+            counts = np.ones(self.sources.size, dtype=np.int64)
+        remaining = counts.tolist()
+        out_edges = self.out_edges.tolist()
+        targets = self.targets.tolist()
+        position = self.offsets[:-1].tolist()   # next outgoing edge of every vertex
+        ends = self.offsets[1:].tolist()
+
+        curr_path = [start_vertex]
+        curr_edges = []
+        circuit = []
+        edge_circuit = []
+        while curr_path:
+            curr_v = curr_path[-1]
+            while position[curr_v] < ends[curr_v] and remaining[out_edges[position[curr_v]]] == 0:
+                position[curr_v] += 1
+            if position[curr_v] < ends[curr_v]:
+                next_e = out_edges[position[curr_v]]
+                remaining[next_e] -= 1
+                curr_edges.append(next_e)
+                curr_path.append(targets[next_e])
+            else:
+                circuit.append(curr_path.pop())
+                if curr_edges:
+                    edge_circuit.append(curr_edges.pop())
+
+        if len(edge_circuit) != int(counts.sum()):
+            raise RuntimeError("G1 has no Euler cycle")
+        circuit.reverse()
+        edge_circuit.reverse()
+        return np.array(circuit, dtype=np.int64), np.array(edge_circuit, dtype=np.int64)
+
+    def get_postman_tour(self, useAvgPenalty, penalty, starting_vertex_label=None, useConstW=False, constW=80,
+                         starting_vertex: int = None):
+        """
+        Chinese postman tour of graph G, solved on arrays only (flow balancing, as G1.get_postman_tour with
+        balancing="flow", quiet=True). Balancing paths are not materialized as duplicated edges - every edge
+        of G2 gets traversal count instead & the tour is given as ids of edges in G2.
+        :return: PostmanTour (its graph is compact G2)
+        """
+        if starting_vertex is None:
+            starting_vertex = 0 if starting_vertex_label is None else self.get_vertex_index(starting_vertex_label)
+        g1 = self.orient()
+        if not g1.is_connected():
+            raise RuntimeError("G1 is not connected.")
+
+        stats = {"vertices": self.vertex_count, "edges": self.sources.size}
+        stage_start = perf_counter()
+        g2 = g1.add_penalty_edges(g1.get_penalty_weights(useAvgPenalty, penalty, useConstW, constW))
+        counts = np.concatenate((np.ones(g1.sources.size, dtype=np.int64), np.zeros(g1.sources.size, dtype=np.int64)))
+        stage_start = G1.record_stage_time(None, stats, "penalty_graph", stage_start)
+
+        degrees = g1.get_degrees()
+        sources, targets = np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0)
+        if sources.size:
+            distances, get_edge_path = g2.get_shortest_paths(sources, targets)
+            stats["unbalanced_vertices"] = sources.size + targets.size
+            stage_start = G1.record_stage_time(None, stats, "shortest_paths", stage_start)
+            flows = solve_transportation(degrees[sources], -degrees[targets], distances)
+            for i, j in zip(*np.nonzero(flows)):
+                np.add.at(counts, get_edge_path(int(i), int(targets[j])), int(flows[i, j]))
+            stats["added_edges"] = int(counts.sum()) - g1.sources.size
+            stage_start = G1.record_stage_time(None, stats, "balancing", stage_start)
+
+        vertex_ids, edge_ids = g2.find_euler(starting_vertex, counts)
+        G1.record_stage_time(None, stats, "euler_cycle", stage_start)
+        cost = (g2.weights * counts).sum().item()
+        penalties = int(counts[g2.get_flag(PENALTY)].sum())
+        return PostmanTour(g2, cost, vertex_ids, edge_ids, penalties, stats)
+
+    def to_igraph(self):
+        """
+        Builds igraph's graph with attributes as in the rest of the algorithm (label, weight, directed,
+        transformed & IsPenalty for G1/G2).
+        :return: igraph's Graph
+        """
+        g = Graph(n=self.vertex_count, edges=GenericGraph.make_edge_list(self.sources, self.targets), directed=True)
+        g.vs["label"] = self.get_vertex_labels()
+        g.es["weight"] = self.weights.tolist()
+        g.es["directed"] = self.get_flag(DIRECTED).tolist()
+        if self.flags.size and (self.get_flag(TRANSFORMED) | self.get_flag(PENALTY)).any():
+            g.es["transformed"] = self.get_flag(TRANSFORMED).tolist()
+            g.es["IsPenalty"] = self.get_flag(PENALTY).tolist()
+        return g
+
+    def to_partially_directed(self):
+        """
+        :return: PartiallyDirectedGraph (graph G) with the same edges
+        """
+        return PartiallyDirectedGraph.from_edge_arrays(self.sources, self.targets, self.get_flag(DIRECTED),
+                                                       self.weights, self.get_vertex_labels(), self.vertex_count)
@@ -1,6 +1,10 @@
 from algorithm import *
-import random
 import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import generators
 
             # experiment params
 vertex_count = 100
@@ -10,66 +14,135 @@ undirected_count = int(0.5*edge_count)
 IsAvgModeForPenalty = True
 penaltyMultiplier = 3
 
-            #prepare file for writing experiment data
-csvfile = open("Data1.csv", 'w', newline = '')
-csvwriter = csv.writer(csvfile)
-csvFields = ['Num of vertex',   'Num of edges', 'Num of undirected',    'Using Avg penalties',  'Penalty edege multiplier']
-csvwriter.writerow(csvFields)
-csvwriter.writerow( [vertex_count, edge_count, undirected_count, IsAvgModeForPenalty, penaltyMultiplier] )
-csvwriter.writerow([])
-csvwriter.writerow( ['Experiment iteration', 'Num of penalty eges in tour', 'Tour cost'] )
-
-for expN in range(100):
-    print( "Iteration: {}".format(expN) )
-    # draw a random, fully connected graph
-    is_connected = False
-    while not is_connected:
-        g = Graph.Erdos_Renyi(n=vertex_count, m=edge_count, directed=True, loops=False)
-        is_connected = g.is_connected()
-
-    print("Generated connected graph")
-    # assign random weights to it
-    weights = [random.randint(10, 100) for _ in range(edge_count)]
+            # default parameter grid - every combination of values is one experiment setting
+PARAM_GRID = {
+    "vertex_count": [vertex_count],
+    "edge_count": [edge_count],
+    "undirected_count": [undirected_count],
+    "family": ["random"],
+    "use_avg_penalty": [IsAvgModeForPenalty],
+    "penalty": [penaltyMultiplier],
+    "balancing": ["matching"],
+}
+
+            # columns of the output file (besides parameters)
+RESULT_FIELDS = ['iteration', 'seed', 'penalty_edges', 'cost', 'has_upstream_edge', 'tour_length',
+                 'unbalanced_vertices', 'added_edges', 'time_generation', 'time_graph_g', 'time_graph_g1',
+                 'time_penalty_graph', 'time_shortest_paths', 'time_balancing', 'time_euler_cycle', 'time_total']
+
+
+def generate_graph(vertex_count: int, edge_count: int, undirected_count: int, seed=None, family: str = "random"):
+    """
+    Draws a random, strongly connected, partially directed graph with random weights (see generators.generate_graph).
+    :param seed: seed of the graph - the same seed gives the same graph
+    :return: (sources, targets, directed, weights, vertex_labels) - data needed to create graph G
+    """
+    sources, targets, directed, weights = generators.generate_graph(
+        vertex_count, edge_count, undirected_count / edge_count if edge_count else 0, family,
+        strongly_connected=True, seed=seed)
     #generate labels
     vertex_labels = list()
     for i in range(vertex_count):
         slb = chr(ord('a') + i % 26) + str(i // 25)
         vertex_labels.append(slb)
+    return sources, targets, directed, weights, vertex_labels
 
-    g.es["weights"] = weights
-    g.es["label"] = weights
-    g.vs["label"] = vertex_labels
-    #plot(g)
-
-    # manipulate adjacency matrix
-    # WARNING: weights sequence is not preserved
-    full_adjacency_matrix = PartiallyDirectedGraph.transform_adj_mat_to_full(g.get_adjacency())
-    for _ in range(undirected_count):   # set random edges as undirected
-        edge_idx = random.randint(0, edge_count-1)
-        full_adjacency_matrix[:, edge_idx] = -1*abs(full_adjacency_matrix[:, edge_idx])
-    g = PartiallyDirectedGraph(full_adjacency_matrix, weights, vertex_labels)
-    #g.plotGraph()
-    print('Graph G generated')
-    g1 = G1(g)
-    #g1.plotGraph()
-    print('Graph G1 generated')
-    cost, tour, tour_by_id, ipenCnt = g1.get_postman_tour(IsAvgModeForPenalty, penaltyMultiplier, 'a0')
 
-    # check the tour
-    # iterate through each edge that tour consists of
+def has_upstream_edge(g: PartiallyDirectedGraph, tour_by_id):
+    """
+    Checks the tour - iterates through each edge that tour consists of.
+    :return: Boolean value - does the tour go against direction of any directed edge of G?
+    """
     prev_vertex = None
     for vertex in tour_by_id:
         if prev_vertex is not None:
             edge_idx, is_upstream = g.get_edge_between(prev_vertex, vertex)
             if is_upstream:
-                vertex_name = g.graph.vs[vertex]["label"]
-                prev_vertex_name = g.graph.vs[prev_vertex]["label"]
-                print(f"\n\nChinese postman tour consists of an upstream path (road: {prev_vertex_name}->{vertex_name})!")
-                #g.plotGraph()
-                break
-
+                return True
         prev_vertex = vertex
+    return False
+
+
+def run_experiment(task):
+    """
+    Single experiment iteration: draws a graph & finds chinese postman tour in it.
+    Runs in a worker process, so it only depends on given task.
+    :param task: (params, iteration, seed) - experiment setting, its iteration number & seed of the iteration
+    :return: dictionary - parameters & results of the iteration (including durations of algorithm's stages)
+    """
+    params, iteration, seed = task
+    start = perf_counter()
+
+    sources, targets, directed, weights, vertex_labels = generate_graph(
+        params["vertex_count"], params["edge_count"], params["undirected_count"], seed, params.get("family", "random"))
+    time_generation = perf_counter()
+    g = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights, vertex_labels)
+    time_graph_g = perf_counter()
+    g1 = G1(g)
+    time_graph_g1 = perf_counter()
+    result = g1.get_postman_tour(params["use_avg_penalty"], params["penalty"], vertex_labels[0],
+                                 balancing=params["balancing"], quiet=True)
+    end = perf_counter()
+
+    row = dict(params)
+    row.update(result.stats)
+    row.update({
+        'iteration': iteration,
+        'seed': seed,
+        'penalty_edges': result.penalties,
+        'cost': result.cost,
+        'has_upstream_edge': has_upstream_edge(g, result.vertex_ids.tolist()),
+        'tour_length': len(result),
+        'time_generation': time_generation - start,
+        'time_graph_g': time_graph_g - time_generation,
+        'time_graph_g1': time_graph_g1 - time_graph_g,
+        'time_total': end - start,
+    })
+    return row
+
+
+def make_tasks(param_grid: dict, iterations: int, seed: int = 0):
+    """
+    Creates tasks for every combination of parameters in the grid, repeated given number of times.
+    Seed of every task depends only on base seed, setting's position in the grid & iteration number,
+    so results do not depend on the number of processes nor on the order of execution.
+    :return: list of tasks (params, iteration, seed)
+    """
+    names = list(param_grid.keys())
+    tasks = []
+    for setting_idx, values in enumerate(itertools.product(*param_grid.values())):
+        params = dict(zip(names, values))
+        for iteration in range(iterations):
+            task_seed = int(np.random.SeedSequence([seed, setting_idx, iteration]).generate_state(1)[0])
+            tasks.append((params, iteration, task_seed))
+    return tasks
+
+
+def run_experiments(param_grid: dict, iterations: int, output_path: str, processes: int = None, seed: int = 0):
+    """
+    Runs experiments for the whole parameter grid in a pool of processes
+    & writes all results into a single CSV file, one row per iteration.
+    :param param_grid: dictionary - parameter name -> list of its values (see PARAM_GRID)
+    :param iterations: number of iterations for every combination of parameters
+    :param output_path: path of the output CSV file
+    :param processes: number of worker processes (default: number of CPUs)
+    :param seed: base seed of all experiments
+    :return: list of result rows
+    """
+    tasks = make_tasks(param_grid, iterations, seed)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    chunk_size = max(1, len(tasks) // (4 * processes))     # a few chunks per process, for load balancing
+    with ProcessPoolExecutor(processes) as executor:
+        rows = list(executor.map(run_experiment, tasks, chunksize=chunk_size))
+
+    fields = list(param_grid.keys()) + RESULT_FIELDS
+    with open(output_path, 'w', newline='') as csvfile:
+        csvwriter = csv.DictWriter(csvfile, fieldnames=fields, extrasaction='ignore', restval=0)
+        csvwriter.writeheader()
+        csvwriter.writerows(rows)
+    return rows
 
-    csvwriter.writerow( [expN, ipenCnt, cost] )
 
-csvfile.close()
+if __name__ == "__main__":
+    run_experiments(PARAM_GRID, 100, "Data1.csv")
@@ -0,0 +1,174 @@
+from algorithm import *
+
+            # families of generated graphs
+FAMILIES = ["random", "grid", "road"]
+WEIGHT_DISTRIBUTIONS = ["uniform", "normal", "exponential", "length"]
+
+
+def generate_graph(vertex_count: int, edge_count: int = None, undirected_ratio: float = 0.5, family: str = "random",
+                   weight_distribution="uniform", weight_range=(10, 100), strongly_connected: bool = False,
+                   seed=None):
+    """
+    Generates connected partially directed graph directly as edge arrays - connectivity is guaranteed
+    by construction, so nothing is drawn again & no adjacency matrix is built.
+    Families:
+    - "random" - random spanning tree (or directed Hamiltonian cycle, if strongly connected) & random edges,
+    - "grid" - rectangular lattice (as close to square as possible; the last row may be partial),
+    - "road" - lattice with jittered vertex positions, some streets removed & some diagonals added.
+    :param vertex_count: number of vertices
+    :param edge_count: number of edges ("random" & "road"; default: 3 per vertex for "random", 2 for "road");
+                       "grid" has as many edges as the lattice has
+    :param undirected_ratio: part of edges which are undirected (two-way); if the graph has to be strongly
+                             connected, one-way edges between its strong components are made two-way too,
+                             so the ratio may be exceeded ("grid" & "road" only)
+    :param weight_distribution: "uniform", "normal", "exponential" (integers in weight_range), "length"
+                                (lengths of edges between vertex positions, scaled to weight_range)
+                                or function(rng, edge lengths) -> weights
+    :param weight_range: (minimal, maximal) weight
+    :param strongly_connected: if True, every vertex is reachable from every other one without going against
+                               one-way edges; otherwise graph is (weakly) connected
+    :param seed: seed of random generator (or numpy Generator)
+    :return: (sources, targets, directed, weights) - arrays describing edges
+    """
+    rng = np.random.default_rng(seed)
+    if family == "random":
+        sources, targets, directed_sources, lengths = get_random_edges(
+            rng, vertex_count, 3 * vertex_count if edge_count is None else edge_count, strongly_connected)
+    elif family == "grid":
+        sources, targets, directed_sources, lengths = get_grid_edges(rng, vertex_count)
+    elif family == "road":
+        sources, targets, directed_sources, lengths = get_road_edges(
+            rng, vertex_count, 2 * vertex_count if edge_count is None else edge_count)
+    else:
+        raise RuntimeError("Unknown graph family: {}".format(family))
+
+    if not strongly_connected:
+        # one-way edges go in random direction
+        is_flipped = rng.random(sources.size) < 0.5
+        sources, targets = np.where(is_flipped, targets, sources), np.where(is_flipped, sources, targets)
+    else:
+        sources, targets = directed_sources, np.where(directed_sources == sources, targets, sources)
+
+    directed = np.ones(sources.size, dtype=bool)
+    directed[rng.choice(sources.size, int(round(undirected_ratio * sources.size)), replace=False)] = False
+    if strongly_connected and family != "random":
+        directed &= ~get_bridging_edges(vertex_count, sources, targets, directed)
+    weights = get_weights(rng, weight_distribution, weight_range, lengths)
+    return sources, targets, directed, weights
+
+
+def get_random_edges(rng: np.random.Generator, vertex_count: int, edge_count: int, strongly_connected: bool):
+    """
+    Random spanning tree (every vertex joined to a random earlier one in random order) or, for strongly
+    connected graph, directed cycle through all vertices in random order - then random edges (no loops).
+    :return: (sources, targets, start vertices of edges if they are one-way, lengths - all equal to 1)
+    """
+    order = rng.permutation(vertex_count)
+    if strongly_connected:
+        backbone_sources, backbone_targets = order, np.roll(order, -1)
+    else:
+        backbone_sources = order[(rng.random(vertex_count - 1) * np.arange(1, vertex_count)).astype(np.int64)]
+        backbone_targets = order[1:]
+    if vertex_count < 2:
+        backbone_sources = backbone_targets = np.zeros(0, dtype=np.int64)
+    extra_count = max(edge_count - backbone_sources.size, 0)
+    extra_sources = rng.integers(0, vertex_count, extra_count)
+    extra_targets = (extra_sources + rng.integers(1, max(vertex_count, 2), extra_count)) % max(vertex_count, 1)
+    sources = np.concatenate((backbone_sources, extra_sources)).astype(np.int64)
+    targets = np.concatenate((backbone_targets, extra_targets)).astype(np.int64)
+    return sources, targets, sources, np.ones(sources.size)
+
+
+def get_grid_shape(vertex_count: int):
+    """
+    :return: (rows, columns) - the most square lattice holding vertex_count vertices, row by row
+    """
+    rows = max(int(np.sqrt(vertex_count)), 1)
+    return rows, -(-vertex_count // rows)
+
+
+def get_grid_edges(rng: np.random.Generator, vertex_count: int):
+    """
+    Lattice edges, vertex v is in row v // columns & column v % columns. One-way directions alternate
+    like in a Manhattan street grid: even rows go east, odd ones west, even columns go north, odd ones south -
+    with even number of rows & columns the perimeter is a cycle & the grid is strongly connected.
+    :return: (sources, targets, start vertices of edges if they are one-way, lengths - all equal to 1)
+    """
+    _, columns = get_grid_shape(vertex_count)
+    vertices = np.arange(vertex_count)
+    row, column = vertices // columns, vertices % columns
+    horizontal = vertices[(column + 1 < columns) & (vertices + 1 < vertex_count)]
+    vertical = vertices[vertices + columns < vertex_count]
+    sources = np.concatenate((horizontal, vertical))
+    targets = np.concatenate((horizontal + 1, vertical + columns))
+    one_way_sources = np.concatenate((np.where(row[horizontal] % 2 == 0, horizontal, horizontal + 1),
+                                      np.where(column[vertical] % 2 == 0, vertical + columns, vertical)))
+    return sources, targets, one_way_sources, np.ones(sources.size)
+
+
+def get_road_edges(rng: np.random.Generator, vertex_count: int, edge_count: int):
+    """
+    Road-like planar network: lattice with vertex positions jittered. Streets (not on a spanning tree) are
+    removed at random, or diagonals (one per cell at most) are added, to get close to edge_count.
+    :return: (sources, targets, start vertices of edges if they are one-way, lengths of edges)
+    """
+    _, columns = get_grid_shape(vertex_count)
+    sources, targets, one_way_sources, _ = get_grid_edges(rng, vertex_count)
+    vertices = np.arange(vertex_count)
+    positions = np.column_stack((vertices % columns, vertices // columns)) + rng.uniform(-0.3, 0.3, (vertex_count, 2))
+
+    if edge_count < sources.size:
+        # spanning tree of the lattice: first row & every column - its edges are never removed
+        is_tree = ((sources < columns) & (targets == sources + 1)) | (targets == sources + columns)
+        removable = np.flatnonzero(~is_tree)
+        removed = rng.choice(removable, min(sources.size - edge_count, removable.size), replace=False)
+        is_kept = np.ones(sources.size, dtype=bool)
+        is_kept[removed] = False
+        sources, targets, one_way_sources = sources[is_kept], targets[is_kept], one_way_sources[is_kept]
+    elif edge_count > sources.size:
+        corners = vertices[(vertices % columns + 1 < columns) & (vertices + columns + 1 < vertex_count)]
+        corners = rng.choice(corners, min(edge_count - sources.size, corners.size), replace=False)
+        is_rising = rng.random(corners.size) < 0.5     # diagonal "/" instead of "\"
+        diagonal_sources = np.where(is_rising, corners + 1, corners)
+        diagonal_targets = np.where(is_rising, corners + columns, corners + columns + 1)
+        sources = np.concatenate((sources, diagonal_sources))
+        targets = np.concatenate((targets, diagonal_targets))
+        one_way_sources = np.concatenate((one_way_sources, np.where(rng.random(corners.size) < 0.5,
+                                                                    diagonal_sources, diagonal_targets)))
+    lengths = np.sqrt(((positions[sources] - positions[targets]) ** 2).sum(axis=1))
+    return sources, targets, one_way_sources, lengths
+
+
+def get_bridging_edges(vertex_count: int, sources: np.ndarray, targets: np.ndarray, directed: np.ndarray):
+    """
+    One-way edges between strong components (undirected edges are two-way) - making them two-way makes
+    connected graph strongly connected.
+    :return: boolean array - is given edge such one?
+    """
+    report = FeasibilityReport(vertex_count, sources, targets, ~directed)
+    is_bridging = np.zeros(sources.size, dtype=bool)
+    is_bridging[report.bridging_edges] = True
+    return is_bridging
+
+
+def get_weights(rng: np.random.Generator, weight_distribution, weight_range, lengths: np.ndarray):
+    """
+    :return: integer array of weights, drawn from given distribution (see generate_graph)
+    """
+    low, high = weight_range
+    size = lengths.size
+    if callable(weight_distribution):
+        return np.asarray(weight_distribution(rng, lengths))
+    if weight_distribution == "uniform":
+        weights = rng.integers(low, high + 1, size)
+    elif weight_distribution == "normal":
+        weights = np.round(rng.normal((low + high) / 2, (high - low) / 6, size))
+    elif weight_distribution == "exponential":
+        weights = np.round(low + rng.exponential((high - low) / 4, size))
+    elif weight_distribution == "length":
+        spread = lengths.max() - lengths.min() if size else 0
+        relative = (lengths - lengths.min()) / spread if spread > 0 else np.full(size, 0.5)
+        weights = np.round(low + relative * (high - low))
+    else:
+        raise RuntimeError("Unknown weight distribution: {}".format(weight_distribution))
+    return np.clip(weights, low, high).astype(np.int64)
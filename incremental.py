@@ -0,0 +1,240 @@
+from algorithm import *
+
+
+class IncrementalPostman:
+    """
+    Chinese postman solver for a network changing a few edges at a time (updated weights, closures,
+    new one-way rules). State of the previous solve is kept & reused by the next one:
+    - orientation of undirected edges - only changed edges are oriented again (greedily, as in G1),
+    - graph with penalty edges (G2) - its edges are compared with the previous ones,
+      so only shortest paths affected by changed edges are searched again,
+    - flows of the transportation problem (balancing) - used as a warm start.
+    Balancing is done as in G1.FlowBalancing.
+    """
+    def __init__(self, graph_G: PartiallyDirectedGraph, useAvgPenalty: bool, penalty,
+                 useConstW: bool = False, constW=80):
+        """
+        :param graph_G: partially directed graph - starting state of the network (it is not modified)
+        :param useAvgPenalty: if true penalty edges are weighted as in add_penaltyAvg_edges,
+                              otherwise as in add_penaltyTm_edges
+        :param penalty: penalty for choosing incorrect direction
+        """
+        g = graph_G.graph
+        edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        self.vertex_count = g.vcount()
+        self.labels = graph_G.get_vertex_labels()
+        self.sources = edges[:, 0].copy()
+        self.targets = edges[:, 1].copy()
+        self.directed = np.array(g.es["directed"], dtype=bool)
+        self.weights = np.array(g.es["weight"])
+        self.is_open = np.ones(self.sources.size, dtype=bool)
+        self.useAvgPenalty = useAvgPenalty
+        self.penalty = penalty
+        self.useConstW = useConstW
+        self.constW = constW
+
+        oriented_sources, _ = G1.orient_undirected_edges(self.vertex_count, self.sources, self.targets,
+                                                         self.directed)
+        self.is_reversed = oriented_sources != self.sources     # orientation of edges in G1
+
+        # state of the previous solve
+        self.penalty_edges = None   # edges of G2, see get_penalty_edge_arrays
+        self.paths = None
+        self.flows = None
+
+    def get_penalty_edge_arrays(self):
+        """
+        Edges of G2 are identified by keys: 2 * (id of edge in G) goes as the edge in G, 2 * id + 1 - backwards.
+        Keys do not depend on orientation of undirected edges in G1 - both directions of them are legal.
+        :return: (sources, targets, weights, is_penalty, exists) - arrays indexed by keys
+        """
+        if self.useAvgPenalty:
+            open_weights = self.weights[self.is_open]
+            penalty_weight = int((open_weights.sum() / open_weights.size) + 0.5) * self.penalty \
+                if open_weights.size else 0
+            backward_weights = np.full(self.weights.size, penalty_weight, dtype=self.weights.dtype)
+        elif self.useConstW:
+            backward_weights = np.full(self.weights.size, self.constW, dtype=self.weights.dtype)
+        else:
+            backward_weights = self.weights * self.penalty
+        is_penalty = np.zeros(2 * self.weights.size, dtype=bool)
+        is_penalty[1::2] = self.directed
+
+        sources = np.column_stack((self.sources, self.targets)).ravel()
+        targets = np.column_stack((self.targets, self.sources)).ravel()
+        weights = np.column_stack((self.weights, np.where(self.directed, backward_weights, self.weights))).ravel()
+        return sources, targets, weights, is_penalty, np.repeat(self.is_open, 2)
+
+    def update(self, weights: dict = None, closed=(), opened=(), directions: dict = None):
+        """
+        Applies changes of the network & solves it again, reusing results of the previous solve.
+        :param weights: dictionary - edge id (in G) -> new weight
+        :param closed: ids of edges to be closed (removed from the network)
+        :param opened: ids of previously closed edges to be opened again
+        :param directions: dictionary - edge id -> None (edge becomes two-way)
+                           or id of vertex the edge starts at (edge becomes one-way)
+        :return: PostmanTour - new tour (its stats tell how many shortest path searches were reused)
+        """
+        affected = []   # undirected edges to be oriented again
+        for edge_id, weight in (weights or {}).items():
+            self.weights[edge_id] = weight
+        for edge_id in closed:
+            self.is_open[edge_id] = False
+        for edge_id in opened:
+            if not self.is_open[edge_id]:
+                self.is_open[edge_id] = True
+                affected.append(edge_id)
+        for edge_id, start_vertex in (directions or {}).items():
+            if start_vertex is None:
+                self.directed[edge_id] = False
+                affected.append(edge_id)
+            else:
+                if start_vertex not in (self.sources[edge_id], self.targets[edge_id]):
+                    raise RuntimeError("Vertex {} is not an end of edge {}".format(start_vertex, edge_id))
+                if start_vertex != self.sources[edge_id]:
+                    self.sources[edge_id], self.targets[edge_id] = self.targets[edge_id], self.sources[edge_id]
+                self.directed[edge_id] = True
+                self.is_reversed[edge_id] = False
+        self.orient_edges([edge_id for edge_id in affected if not self.directed[edge_id] and self.is_open[edge_id]])
+        return self.solve()
+
+    def orient_edges(self, edge_ids: list):
+        """
+        Greedy orientation of given undirected edges (as in G1.orient_undirected_edges),
+        against degrees of vertices resulting from all other open edges.
+        """
+        if not edge_ids:
+            return
+        is_counted = self.is_open.copy()
+        is_counted[edge_ids] = False
+        g1_sources = np.where(self.is_reversed, self.targets, self.sources)[is_counted]
+        g1_targets = np.where(self.is_reversed, self.sources, self.targets)[is_counted]
+        degrees = (np.bincount(g1_targets, minlength=self.vertex_count)
+                   - np.bincount(g1_sources, minlength=self.vertex_count))
+        for edge_id in edge_ids:
+            source_vertex_id = self.sources[edge_id]
+            target_vertex_id = self.targets[edge_id]
+            self.is_reversed[edge_id] = degrees[source_vertex_id] < 0
+            if self.is_reversed[edge_id]:
+                degrees[source_vertex_id] += 1
+                degrees[target_vertex_id] -= 1
+            else:
+                degrees[source_vertex_id] -= 1
+                degrees[target_vertex_id] += 1
+
+    def solve(self, starting_vertex: int = 0):
+        """
+        Finds chinese postman tour in current state of the network. Shortest paths & flows of the previous
+        solve are reused where the network did not change (the first solve computes everything).
+        :param starting_vertex: index of starting vertex
+        :return: PostmanTour
+        """
+        open_ids = np.flatnonzero(self.is_open)
+        graph_G = PartiallyDirectedGraph.from_edge_arrays(
+            self.sources[open_ids], self.targets[open_ids], self.directed[open_ids], self.weights[open_ids],
+            self.labels, self.vertex_count)
+        is_reversed = self.is_reversed[open_ids]
+        g1 = G1.from_orientation(graph_G, np.where(is_reversed, self.targets[open_ids], self.sources[open_ids]),
+                                 np.where(is_reversed, self.sources[open_ids], self.targets[open_ids]))
+        if not g1.is_connected():
+            raise RuntimeError("G1 is not connected.")
+
+        stats = {"vertices": self.vertex_count, "edges": g1.graph.ecount(), "reused_sources": 0}
+        penalties = 0
+        deg_list = []
+        if not g1.have_euler_tour(deg_list):
+            penalty_edges = self.get_penalty_edge_arrays()
+            g2, edge_ids = self.build_penalty_graph(penalty_edges)
+            degrees = np.asarray(deg_list, dtype=np.int64)
+            sources, targets = np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0)
+            paths = ShortestPaths(g2, sources, targets, self.get_reusable_paths(g2, penalty_edges, edge_ids))
+            stats["reused_sources"] = int(paths.is_reused.sum())
+            stats["unbalanced_vertices"] = sources.size + targets.size
+
+            flows = solve_transportation(degrees[paths.sources], -degrees[paths.targets], paths.distances,
+                                         self.get_initial_flows(paths))
+            for i, j in zip(*np.nonzero(flows)):
+                penalties += g1.duplicate_path(int(paths.sources[i]), int(paths.targets[j]), g2,
+                                               int(flows[i, j]), paths)
+            stats["added_edges"] = int(g1.get_traversal_counts().sum()) - stats["edges"]
+            self.penalty_edges = penalty_edges + (edge_ids,)
+            self.paths = paths
+            self.flows = flows
+
+        cost, _, tour_by_id, tour_edges = g1.FindEuler(None, starting_vertex, quiet=True)
+        return PostmanTour(g1, cost, tour_by_id, tour_edges, penalties, stats)
+
+    def build_penalty_graph(self, penalty_edges: tuple):
+        """
+        Builds G2 in bulk from arrays made by get_penalty_edge_arrays.
+        :return: (G2, array - key -> id of edge in G2 or -1 for closed edges)
+        """
+        sources, targets, weights, is_penalty, exists = penalty_edges
+        keys = np.flatnonzero(exists)
+        g2 = Graph(n=self.vertex_count, edges=GenericGraph.make_edge_list(sources[keys], targets[keys]), directed=True)
+        g2.es["weight"] = weights[keys].tolist()
+        g2.es["IsPenalty"] = is_penalty[keys].tolist()
+        g2.es["directed"] = True
+        g2.es["g1_edge_id"] = (np.cumsum(self.is_open) - 1)[keys // 2].tolist()     # G1 has open edges only
+        edge_ids = np.full(exists.size, -1, dtype=np.int64)
+        edge_ids[keys] = np.arange(keys.size)
+        return GenericGraph(g2), edge_ids
+
+    def get_reusable_paths(self, g2: GenericGraph, penalty_edges: tuple, edge_ids: np.ndarray):
+        """
+        Finds shortest path searches of the previous solve, which are still valid in new G2:
+        - their trees contain no edge which got longer, was closed or has changed its ends,
+        - no edge which got shorter, was opened or has changed its ends makes any of their paths shorter
+          (checked with two searches per such edge - from its end & to its start).
+        :return: reuse argument of ShortestPaths or None if nothing can be reused
+        """
+        if self.paths is None:
+            return None
+        sources, targets, weights, _, exists = penalty_edges
+        old_sources, old_targets, old_weights, _, old_exists, old_edge_ids = self.penalty_edges
+        is_moved = (sources != old_sources) | (targets != old_targets)
+        is_worse = old_exists & (~exists | is_moved | (weights > old_weights))
+        is_better = exists & (~old_exists | is_moved | (weights < old_weights))
+
+        previous = self.paths
+        valid_sources = set(previous.sources.tolist())
+        better_keys = np.flatnonzero(is_better)
+        if 2 * better_keys.size >= previous.sources.size:
+            return None     # searching everything again is cheaper
+
+        worse_edges = old_edge_ids[is_worse]
+        for row, source in enumerate(previous.sources.tolist()):
+            if np.isin(previous.predecessors[row][1], worse_edges).any():
+                valid_sources.discard(source)
+
+        for key in better_keys.tolist():
+            to_start = np.array(g2.graph.distances(target=int(sources[key]), weights="weight", mode=OUT))[:, 0]
+            from_end = np.array(g2.graph.distances(source=int(targets[key]), weights="weight", mode=OUT))[0]
+            shortcuts = to_start[previous.sources][:, None] + weights[key] + from_end[previous.targets][None, :]
+            for row in np.flatnonzero((shortcuts < previous.distances).any(axis=1)).tolist():
+                valid_sources.discard(int(previous.sources[row]))
+
+        edge_map = np.full(old_edge_ids.size, -1, dtype=np.int64)
+        old_keys = np.flatnonzero(old_exists)
+        edge_map[old_edge_ids[old_keys]] = edge_ids[old_keys]
+        return previous, valid_sources, edge_map
+
+    def get_initial_flows(self, paths: ShortestPaths):
+        """
+        Flows of the previous solve are kept only for sources, whose shortest paths were reused.
+        These are a part of optimal solution & costs of their arcs have not changed, so they are still optimal
+        (for what they send) & can be used as a warm start.
+        :return: flows of the previous solve, moved to rows & columns of new unbalanced vertices
+                 (None if there was no previous solve)
+        """
+        if self.flows is None:
+            return None
+        previous = self.paths
+        initial_flows = np.zeros((paths.sources.size, paths.targets.size), dtype=np.int64)
+        rows = np.array([previous.source_index.get(source, -1) if is_reused else -1
+                         for source, is_reused in zip(paths.sources.tolist(), paths.is_reused.tolist())],
+                        dtype=np.int64)
+        columns = np.array([previous.target_index.get(target, -1) for target in paths.targets.tolist()],
+                           dtype=np.int64)
+        initial_flows[np.ix_(rows >= 0, columns >= 0)] = self.flows[np.ix_(rows[rows >= 0], columns[columns >= 0])]
+        return initial_flows
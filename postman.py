@@ -0,0 +1,92 @@
+"""
+Command line entry point - solves chinese postman problem for a network file & writes the tour:
+
+    python -m postman network.graph --penalty 3 --output tour.txt
+
+Network file is either a binary graph file (see storage module) or a text edge list: one edge per line,
+"source target directed weight" (vertex ids, 0/1 flag, weight), separated by whitespace or commas.
+Heavy modules (numpy, igraph & the algorithm) are imported only after arguments are parsed,
+so --help & argument errors return at once; plotting & scipy are never loaded by the solver itself.
+"""
+import argparse
+import sys
+from time import perf_counter
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m postman",
+                                     description="Finds chinese postman tour in partially directed network.")
+    parser.add_argument("network", help="binary graph file (storage module) or text edge list")
+    parser.add_argument("--penalty", type=float, default=3, help="penalty multiplier for going against direction")
+    parser.add_argument("--avg-penalty", action="store_true",
+                        help="weight penalty edges by average weight (instead of weight of the edge)")
+    parser.add_argument("--balancing", default="flow", choices=["matching", "assignment", "flow"])
+    parser.add_argument("--start", help="label of starting vertex (default: the first vertex)")
+    parser.add_argument("--output", help="file to write the tour to (default: standard output)")
+    parser.add_argument("--separator", default="\n", help="separator of vertices in the tour")
+    parser.add_argument("--strict", action="store_true",
+                        help="reject network which is not strongly connected (instead of using penalty edges)")
+    parser.add_argument("--stats", action="store_true",
+                        help="print cost, penalty edges & durations of stages to standard error")
+    return parser.parse_args(argv)
+
+
+def load_network(path: str):
+    """
+    :return: graph G read from binary graph file or from text edge list
+    """
+    import numpy as np
+    import storage
+    from algorithm import PartiallyDirectedGraph
+    with open(path, "rb") as file:
+        is_binary = file.read(len(storage.MAGIC)) == storage.MAGIC
+    if is_binary:
+        return storage.load_graph(path)
+
+    with open(path) as file:
+        rows = np.loadtxt((line.replace(",", " ") for line in file), ndmin=2)
+    if rows.size == 0:
+        rows = rows.reshape(0, 4)
+    if rows.shape[1] != 4:
+        raise RuntimeError("Edge list should have 4 columns: source target directed weight")
+    weights = rows[:, 3]
+    if np.all(weights == np.round(weights)):
+        weights = weights.astype(np.int64)
+    return PartiallyDirectedGraph.from_edge_arrays(rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64),
+                                                   rows[:, 2] != 0, weights)
+
+
+def main(argv=None):
+    start = perf_counter()
+    args = parse_args(argv)
+    from algorithm import G1, InfeasibleNetwork
+    import_end = perf_counter()
+
+    graph_G = load_network(args.network)
+    load_end = perf_counter()
+    starting_vertex = 0 if args.start is None else None
+    penalty = int(args.penalty) if args.penalty == int(args.penalty) else args.penalty
+    try:
+        tour = G1(graph_G).get_postman_tour(args.avg_penalty, penalty, args.start, balancing=args.balancing,
+                                            starting_vertex=starting_vertex, quiet=True, strict=args.strict)
+    except InfeasibleNetwork as error:
+        print(error, file=sys.stderr)
+        return 2
+    solve_end = perf_counter()
+
+    if args.output:
+        tour.write_route(args.output, args.separator)
+    else:
+        tour.write_route(sys.stdout, args.separator)
+    end = perf_counter()
+
+    if args.stats:
+        print("cost: {}, penalty edges: {}, tour length: {}".format(tour.cost, tour.penalties, len(tour)),
+              file=sys.stderr)
+        print("import: {:.3f}s, load: {:.3f}s, solve: {:.3f}s, write: {:.3f}s".format(
+            import_end - start, load_end - import_end, solve_end - load_end, end - solve_end), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+from algorithm import *
+from concurrent.futures import ProcessPoolExecutor
+import os
+import warnings
+
+
+def partition_regions(graph_G: PartiallyDirectedGraph, region_count: int):
+    """
+    Splits vertices into regions of (almost) equal size. Vertices are ordered by breadth-first search
+    (directions of edges are ignored) & the order is cut into region_count parts - every region is a run
+    of consecutive BFS layers, so on road-like networks only edges between neighbouring layers are cut.
+    :return: array - region number of every vertex
+    """
+    g = graph_G.graph
+    vertex_count = g.vcount()
+    order = []
+    is_visited = np.zeros(vertex_count, dtype=bool)
+    for root in range(vertex_count):
+        if not is_visited[root]:
+            component = g.bfs(root, mode=ALL)[0]
+            order.extend(component)
+            is_visited[component] = True
+    regions = np.empty(vertex_count, dtype=np.int64)
+    positions = np.arange(vertex_count)
+    regions[np.asarray(order, dtype=np.int64)] = positions * max(region_count, 1) // max(vertex_count, 1)
+    return regions
+
+
+def balance_region(task: tuple):
+    """
+    Balancing of one region, run in a worker process. Unbalanced vertices of the region are joined
+    by shortest paths within the region (in G2 restricted to its vertices), solving transportation problem
+    in which every unit may be also left unbalanced, at cost higher than any path - so as much as possible
+    is balanced inside the region & the rest is left for reconciliation between regions.
+    :param task: (vertex ids of the region, G2 edges within the region: sources, targets, weights
+                  & their ids in G2, degrees of the region's vertices)
+    :return: (list of (source, target, times, ids of path's edges in G2), residual degrees of the region's vertices)
+    """
+    vertex_ids, sources, targets, weights, edge_ids, degrees = task
+    local_sources = np.searchsorted(vertex_ids, sources)     # vertex ids of the region are sorted
+    local_targets = np.searchsorted(vertex_ids, targets)
+    g = Graph(n=vertex_ids.size, edges=GenericGraph.make_edge_list(local_sources, local_targets), directed=True)
+    g.es["weight"] = weights.tolist()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # region may be not strongly connected
+        paths = ShortestPaths(GenericGraph(g), np.flatnonzero(degrees > 0), np.flatnonzero(degrees < 0))
+
+    supplies = degrees[paths.sources]
+    demands = -degrees[paths.targets]
+    reachable = paths.distances[np.isfinite(paths.distances)]
+    leave_cost = float(reachable.max()) + 1 if reachable.size else 1.0
+    # dummy row & column: units sent to dummy column / received from dummy row are left unbalanced
+    costs = np.full((supplies.size + 1, demands.size + 1), leave_cost)
+    costs[:-1, :-1] = paths.distances
+    costs[-1, -1] = 0
+    flows = solve_transportation(np.append(supplies, demands.sum()), np.append(demands, supplies.sum()), costs)
+
+    pairs = []
+    residual = degrees.copy()
+    for i, j in zip(*np.nonzero(flows[:-1, :-1])):
+        source, target = int(paths.sources[i]), int(paths.targets[j])
+        times = int(flows[i, j])
+        pairs.append((int(vertex_ids[source]), int(vertex_ids[target]), times,
+                      edge_ids[paths.get_edge_path(source, target)].tolist()))
+        residual[source] -= times
+        residual[target] += times
+    return pairs, residual
+
+
+def solve_by_regions(graph_G: PartiallyDirectedGraph, useAvgPenalty, penalty, starting_vertex_label=None,
+                     region_count: int = None, region_labels=None, processes: int = None, compare: bool = False,
+                     useConstW=False, constW=80, starting_vertex: int = None):
+    """
+    Chinese postman tour of a huge network, balanced region by region in a pool of processes:
+    1. graph is oriented greedily (as in G1) & G2 is built for the whole graph,
+    2. every region balances its unbalanced vertices with paths inside the region (see balance_region),
+    3. what is left unbalanced (close to region boundaries) is reconciled by flow balancing on whole G2,
+    4. paths of all regions are duplicated in G1, which is then balanced as a whole - one Euler cycle
+       stitches tours of regions together.
+    The tour is correct, but its cost may be higher than of monolithic solve (paths of step 2 do not leave
+    their region & step 3 does not revise step 2) - compare=True measures the gap.
+    :param region_count: number of regions made by partition_regions (default: number of processes)
+    :param region_labels: region of every vertex (e.g. district labels, any hashable values) - used instead
+                          of partition_regions
+    :param processes: number of worker processes (default: number of CPUs; 1 - regions are balanced
+                      in this process)
+    :param compare: if True, the network is solved also as a whole (flow balancing) & stats get "monolithic_cost"
+                    & "cost_gap" (relative excess of the cost)
+    Other parameters as in G1.get_postman_tour.
+    :return: PostmanTour
+    """
+    g1 = G1(graph_G)
+    if not g1.is_connected():
+        raise RuntimeError("G1 is not connected.")
+    if starting_vertex is None:
+        starting_vertex = 0 if starting_vertex_label is None else g1.get_vertex_index(starting_vertex_label)
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    stats = {"vertices": g1.graph.vcount(), "edges": g1.graph.ecount()}
+    stage_start = perf_counter()
+    if region_labels is not None:
+        _, regions = np.unique(np.asarray(region_labels), return_inverse=True)
+    else:
+        regions = partition_regions(graph_G, region_count or processes)
+    stats["regions"] = int(regions.max()) + 1 if regions.size else 0
+    edges = np.array(graph_G.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    stats["boundary_edges"] = int((regions[edges[:, 0]] != regions[edges[:, 1]]).sum())
+    stage_start = G1.record_stage_time(None, stats, "partition", stage_start)
+
+    penalties = 0
+    deg_list = []
+    if not g1.have_euler_tour(deg_list):
+        if useAvgPenalty:
+            g2 = g1.add_penaltyAvg_edges(penalty)
+        else:
+            g2 = g1.add_penaltyTm_edges(penalty, useConstW, constW)
+        stage_start = G1.record_stage_time(None, stats, "penalty_graph", stage_start)
+
+        degrees = np.asarray(deg_list, dtype=np.int64)
+        g2_edges = np.array(g2.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        g2_weights = np.asarray(g2.graph.es["weight"])
+        is_inner = regions[g2_edges[:, 0]] == regions[g2_edges[:, 1]]
+        tasks = []
+        for region in range(stats["regions"]):
+            vertex_ids = np.flatnonzero(regions == region)
+            if not degrees[vertex_ids].any():
+                continue
+            edge_ids = np.flatnonzero(is_inner & (regions[g2_edges[:, 0]] == region))
+            tasks.append((vertex_ids, g2_edges[edge_ids, 0], g2_edges[edge_ids, 1], g2_weights[edge_ids], edge_ids,
+                          degrees[vertex_ids]))
+        if processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(min(processes, len(tasks))) as executor:
+                results = list(executor.map(balance_region, tasks))
+        else:
+            results = [balance_region(task) for task in tasks]
+        stage_start = G1.record_stage_time(None, stats, "regions", stage_start)
+
+        residual = np.zeros_like(degrees)
+        duplicated_edges = []   # edges of all paths are duplicated at once
+        for task, (pairs, region_residual) in zip(tasks, results):
+            residual[task[0]] = region_residual
+            for _, _, times, edge_path in pairs:
+                duplicated_edges.extend(edge_path * times)
+        paths = ShortestPaths(g2, np.flatnonzero(residual > 0), np.flatnonzero(residual < 0))
+        stats["residual_vertices"] = paths.sources.size + paths.targets.size
+        flows = solve_transportation(residual[paths.sources], -residual[paths.targets], paths.distances)
+        for i, j in zip(*np.nonzero(flows)):
+            edge_path = paths.get_edge_path(int(paths.sources[i]), int(paths.targets[j]))
+            duplicated_edges.extend(edge_path * int(flows[i, j]))
+        g1.graph.es["IsPenalty"] = False
+        penalties = g1.duplicate_edges(duplicated_edges, g2)
+        stats["added_edges"] = int(g1.get_traversal_counts().sum()) - stats["edges"]
+        stage_start = G1.record_stage_time(None, stats, "reconciliation", stage_start)
+
+    cost, _, tour_by_id, tour_edges = g1.FindEuler(None, starting_vertex, quiet=True)
+    G1.record_stage_time(None, stats, "euler_cycle", stage_start)
+
+    if compare:
+        monolithic = G1(graph_G).get_postman_tour(useAvgPenalty, penalty, None, useConstW, constW, "flow",
+                                                  starting_vertex, quiet=True)
+        stats["monolithic_cost"] = monolithic.cost
+        stats["cost_gap"] = (cost - monolithic.cost) / monolithic.cost if monolithic.cost else 0.0
+    return PostmanTour(g1, cost, tour_by_id, tour_edges, penalties, stats)
@@ -0,0 +1,300 @@
+"""
+Long-running local solver service - keeps networks loaded & solves chinese postman requests over HTTP
+(on localhost TCP port or on Unix socket):
+
+    python service.py --port 8080 --network city=city.graph
+
+Endpoints (JSON bodies & answers):
+    POST /networks/<id>  {"path": file} or {"edges": [[source, target, directed, weight], ...], "labels": [...]}
+    POST /solve          {"network": id, "penalty": 3, "avg_penalty": false, "balancing": "flow", "start": label}
+                         -> {"cost", "penalties", "tour": [labels]}
+    GET  /stats          -> queue depth, batches & latencies
+
+Requests are queued & solved by one worker thread. Requests waiting in the queue are taken together
+& those against the same network with the same settings share one solve - the network is balanced once
+& its Euler cycle is rotated to every requested start vertex (see PostmanTour.rotate).
+Balanced networks are also kept in SolutionCache, so later batches of the same network skip balancing.
+"""
+from algorithm import *
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+import argparse
+import json
+import queue
+import socketserver
+import sys
+import threading
+import postman
+from solution_cache import SolutionCache
+
+
+class SolverService:
+    """
+    Queue of solve requests with a batching worker thread. It can be used directly (submit returns a Future)
+    or served over HTTP (see make_server).
+    """
+    def __init__(self, max_batch: int = 256, batch_delay: float = 0.002, latency_window: int = 1000,
+                 cache: SolutionCache = None):
+        """
+        :param max_batch: maximal number of requests taken from the queue at once
+        :param batch_delay: time (seconds) the worker waits for more requests after the first one of a batch
+        :param latency_window: number of the latest requests latency statistics are computed from
+        :param cache: cache of balanced networks (a new one if not given)
+        """
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.cache = cache if cache is not None else SolutionCache()
+        self.networks = {}      # network id -> (graph G, {settings -> network key of the cache})
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=latency_window)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "batches": 0, "solves": 0, "errors": 0, "max_queue_depth": 0}
+        self.worker = None
+
+    def add_network(self, network_id: str, graph_G: PartiallyDirectedGraph):
+        """
+        Registers (or replaces) the network under given id.
+        """
+        with self.lock:
+            self.networks[network_id] = (graph_G, {})
+
+    def start(self):
+        """
+        Starts the worker thread (it is a daemon thread, stopped by stop or with the process).
+        """
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.run, daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the worker thread after requests queued before.
+        """
+        if self.worker is not None:
+            self.requests.put(None)
+            self.worker.join()
+            self.worker = None
+
+    def submit(self, network_id: str, penalty=3, useAvgPenalty: bool = False, starting_vertex_label=None,
+               balancing: str = "flow"):
+        """
+        Queues solve request. Without starting vertex label the tour starts at the first vertex.
+        :return: Future of PostmanTour
+        """
+        future = Future()
+        self.requests.put((perf_counter(), (network_id, penalty, bool(useAvgPenalty), balancing),
+                           starting_vertex_label, future))
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], self.requests.qsize())
+        return future
+
+    def run(self):
+        """
+        Worker loop - takes batches of requests from the queue & solves them.
+        """
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = perf_counter() + self.batch_delay
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=max(deadline - perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None)     # stop after this batch
+                    break
+                batch.append(request)
+            self.solve_batch(batch)
+
+    def solve_batch(self, batch: list):
+        """
+        Groups requests by network & settings - every group is solved once & the tour is rotated
+        to start vertices of its requests.
+        """
+        groups = {}
+        for request in batch:
+            groups.setdefault(request[1], []).append(request)
+        with self.lock:
+            self.counters["batches"] += 1
+
+        for settings, requests in groups.items():
+            try:
+                results = self.solve_group(settings, [label for _, _, label, _ in requests])
+            except Exception as error:
+                results = [error] * len(requests)
+            end = perf_counter()
+            failed = sum(isinstance(result, Exception) for result in results)
+            with self.lock:
+                self.counters["errors"] += failed
+                self.latencies.extend(end - submitted for (submitted, _, _, _), result in zip(requests, results)
+                                      if not isinstance(result, Exception))
+            for (_, _, _, future), result in zip(requests, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def solve_group(self, settings: tuple, starting_vertex_labels: list):
+        """
+        Start labels are resolved one by one - unknown label fails only its own request.
+        :return: list of PostmanTour objects (or exceptions of failed requests), in order of starting_vertex_labels
+        """
+        network_id, penalty, useAvgPenalty, balancing = settings
+        with self.lock:
+            if network_id not in self.networks:
+                raise RuntimeError("Unknown network: {}".format(network_id))
+            graph_G, network_keys = self.networks[network_id]
+        results = []
+        for label in starting_vertex_labels:
+            try:
+                results.append(0 if label is None else graph_G.get_vertex_index(label))
+            except UnknownVertexLabel as error:
+                results.append(error)
+        starting_vertices = [result for result in results if not isinstance(result, Exception)]
+        if not starting_vertices:
+            return results
+
+        if settings not in network_keys:
+            network_keys[settings] = SolutionCache.get_network_key(graph_G, useAvgPenalty, penalty,
+                                                                   balancing=balancing)
+        tour = self.cache.get_postman_tour(graph_G, useAvgPenalty, penalty, None, balancing=balancing,
+                                           starting_vertex=starting_vertices[0],
+                                           network_key=network_keys[settings])
+        with self.lock:
+            self.counters["solves"] += 1
+        tours = iter([tour] + list(tour.iter_rotations(starting_vertices[1:])))
+        return [result if isinstance(result, Exception) else next(tours) for result in results]
+
+    def get_stats(self):
+        """
+        :return: dictionary - counters, current queue depth & latency (seconds, from submit to result)
+                 of the latest requests: mean, median, 95th percentile & maximum
+        """
+        with self.lock:
+            stats = dict(self.counters, queue_depth=self.requests.qsize(), networks=len(self.networks))
+            latencies = np.array(self.latencies)
+        if latencies.size:
+            stats["latency"] = {"mean": float(latencies.mean()), "p50": float(np.percentile(latencies, 50)),
+                                "p95": float(np.percentile(latencies, 95)), "max": float(latencies.max())}
+        return stats
+
+
+class SolverRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of SolverService (server.service).
+    """
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.service.get_stats())
+        else:
+            self.send_json(404, {"error": "Unknown path: {}".format(self.path)})
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Request body has to be JSON object")
+            if self.path.startswith("/networks/"):
+                self.send_json(200, self.add_network(self.path[len("/networks/"):], body))
+            elif self.path == "/solve":
+                self.send_json(200, self.solve(body))
+            else:
+                self.send_json(404, {"error": "Unknown path: {}".format(self.path)})
+        except (RuntimeError, ValueError, TypeError, KeyError, OSError) as error:
+            self.send_json(400, {"error": str(error)})
+        except Exception as error:
+            self.send_json(500, {"error": "{}: {}".format(type(error).__name__, error)})
+
+    def add_network(self, network_id: str, body: dict):
+        if "path" in body:
+            graph_G = postman.load_network(body["path"])
+        else:
+            edges = np.array(body["edges"]).reshape(-1, 4)
+            weights = edges[:, 3]
+            if np.all(weights == np.round(weights)):
+                weights = weights.astype(np.int64)
+            vertex_count = len(body["labels"]) if "labels" in body else None
+            graph_G = PartiallyDirectedGraph.from_edge_arrays(edges[:, 0].astype(np.int64),
+                                                              edges[:, 1].astype(np.int64), edges[:, 2] != 0,
+                                                              weights, body.get("labels"), vertex_count)
+        self.server.service.add_network(network_id, graph_G)
+        return {"network": network_id, "vertices": graph_G.graph.vcount(), "edges": graph_G.graph.ecount()}
+
+    def solve(self, body: dict):
+        future = self.server.service.submit(body["network"], body.get("penalty", 3), body.get("avg_penalty", False),
+                                            body.get("start"), body.get("balancing", "flow"))
+        tour = future.result()
+        return {"cost": tour.cost, "penalties": tour.penalties, "tour": list(tour.iter_route())}
+
+    def send_json(self, status: int, value):
+        data = json.dumps(value, default=lambda item: item.item() if isinstance(item, np.generic) else str(item))
+        data = data.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixSolverServer(socketserver.ThreadingUnixStreamServer):
+    """
+    HTTP server listening on Unix socket.
+    """
+    daemon_threads = True
+
+
+def make_server(service: SolverService, port: int = 0, host: str = "127.0.0.1", socket_path: str = None):
+    """
+    :param port: TCP port on host (0 - any free port, see server.server_address)
+    :param socket_path: path of Unix socket to listen on instead of TCP port
+    :return: server (not started yet - call serve_forever, e.g. in a thread)
+    """
+    if socket_path is not None:
+        server = UnixSolverServer(socket_path, SolverRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), SolverRequestHandler)
+        server.daemon_threads = True
+    server.service = service.start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local chinese postman solver service.")
+    parser.add_argument("--port", type=int, default=8080, help="TCP port on localhost")
+    parser.add_argument("--socket", help="path of Unix socket to listen on instead of TCP port")
+    parser.add_argument("--network", action="append", default=[], metavar="ID=PATH",
+                        help="network loaded at start (binary graph file or text edge list)")
+    parser.add_argument("--batch-delay", type=float, default=0.002,
+                        help="time (seconds) to wait for more requests of a batch")
+    args = parser.parse_args(argv)
+
+    service = SolverService(batch_delay=args.batch_delay)
+    for network in args.network:
+        network_id, path = network.split("=", 1)
+        service.add_network(network_id, postman.load_network(path))
+    server = make_server(service, args.port, socket_path=args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
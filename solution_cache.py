@@ -0,0 +1,129 @@
+from algorithm import *
+from collections import OrderedDict
+import hashlib
+import os
+import storage
+
+
+class SolutionCache:
+    """
+    Cache in front of G1.get_postman_tour for repeated solves of the same network.
+    Entries are addressed by content: canonical hash of edges (ends, directions, weights), vertices' labels,
+    penalty settings & balancing method - so the same network gives the same key, whatever order of edges.
+    Two levels are kept, both as in-memory LRU:
+    - balanced G1 of the network (reused when only start vertex differs - just Euler cycle is searched),
+    - tours (network & start vertex).
+    Balanced networks may be also stored on disk (one file per network, in format of storage module),
+    to be shared between processes.
+    """
+    def __init__(self, max_entries: int = 128, directory: str = None):
+        """
+        :param max_entries: maximal number of tours (& separately - networks) kept in memory
+        :param directory: directory of on-disk store (no on-disk store if not given)
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.networks = OrderedDict()    # network key -> (balanced G1, penalties, stats)
+        self.tours = OrderedDict()       # (network key, start vertex) -> PostmanTour
+        self.hits = 0
+        self.network_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def get_network_key(graph_G: PartiallyDirectedGraph, useAvgPenalty, penalty, useConstW=False, constW=80,
+                        balancing="matching"):
+        """
+        Canonical hash of the network & solving settings. It costs a sort of edges, so it may be computed once
+        & passed to get_postman_tour, when the same graph is solved repeatedly.
+        :return: hexadecimal string
+        """
+        g = graph_G.graph
+        edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        canonical_edges = PartiallyDirectedGraph.get_canonical_edges(
+            edges[:, 0], edges[:, 1], g.es["directed"], g.es["weight"])
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(canonical_edges).tobytes())
+        digest.update("\0".join(str(label) for label in graph_G.get_vertex_labels()).encode())
+        settings = [bool(useAvgPenalty), penalty, bool(useConstW), constW if useConstW else None, balancing]
+        digest.update(repr(settings).encode())
+        return digest.hexdigest()
+
+    def get_postman_tour(self, graph_G: PartiallyDirectedGraph, useAvgPenalty, penalty, starting_vertex_label,
+                         useConstW=False, constW=80, balancing="matching", starting_vertex: int = None,
+                         network_key: str = None):
+        """
+        Returns cached tour or solves the network (as G1(graph_G).get_postman_tour in quiet mode) & caches it.
+        Parameters as in G1.get_postman_tour.
+        :param network_key: key computed before by get_network_key (computed here if not given)
+        :return: PostmanTour - the same object for repeated requests, so it should not be modified
+        """
+        if starting_vertex is None:
+            starting_vertex = graph_G.get_vertex_index(starting_vertex_label)
+        if network_key is None:
+            network_key = self.get_network_key(graph_G, useAvgPenalty, penalty, useConstW, constW, balancing)
+
+        tour_key = (network_key, starting_vertex)
+        if tour_key in self.tours:
+            self.hits += 1
+            self.tours.move_to_end(tour_key)
+            return self.tours[tour_key]
+
+        network = self.get_network(network_key)
+        if network is not None:
+            self.network_hits += 1
+            g1, penalties, stats = network
+            cost, _, tour_by_id, tour_edges = g1.FindEuler(None, starting_vertex, quiet=True)
+            result = PostmanTour(g1, cost, tour_by_id, tour_edges, penalties, stats)
+        else:
+            self.misses += 1
+            g1 = G1(graph_G)
+            result = g1.get_postman_tour(useAvgPenalty, penalty, starting_vertex_label, useConstW, constW,
+                                         balancing, starting_vertex, quiet=True)
+            self.put_network(network_key, (g1, result.penalties, result.stats))
+
+        self.tours[tour_key] = result
+        if len(self.tours) > self.max_entries:
+            self.tours.popitem(last=False)
+        return result
+
+    def get_network(self, network_key: str):
+        """
+        :return: (balanced G1, penalties, stats) from memory or from disk; None if the network is not cached
+        """
+        if network_key in self.networks:
+            self.networks.move_to_end(network_key)
+            return self.networks[network_key]
+        if self.directory is None:
+            return None
+
+        path = os.path.join(self.directory, network_key + ".graph")
+        if not os.path.exists(path):
+            return None
+        metadata = storage.load_metadata(path)["metadata"]
+        network = (storage.load_graph(path), metadata["penalties"], metadata["stats"])
+        self.put_network(network_key, network, save=False)
+        return network
+
+    def put_network(self, network_key: str, network: tuple, save: bool = True):
+        """
+        Keeps balanced network in memory & (if save is True & there is on-disk store) saves it on disk.
+        """
+        self.networks[network_key] = network
+        if len(self.networks) > self.max_entries:
+            self.networks.popitem(last=False)
+        if not save or self.directory is None:
+            return
+
+        g1, penalties, stats = network
+        storage.save_graph(os.path.join(self.directory, network_key + ".graph"), g1,
+                           {"penalties": penalties, "stats": stats})
+
+    def clear(self):
+        """
+        Clears in-memory cache (on-disk store is left as it is).
+        """
+        self.networks.clear()
+        self.tours.clear()
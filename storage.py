@@ -0,0 +1,196 @@
+from algorithm import *
+import json
+import mmap
+import os
+import tempfile
+
+            # file layout: magic, length of JSON header (8 bytes, little endian), header, then arrays
+            # every array starts at offset aligned to ALIGNMENT, so it can be memory-mapped as it is
+MAGIC = b"CPPGRAPH"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+            # bits of "flags" array
+DIRECTED = 1
+TRANSFORMED = 2
+PENALTY = 4
+
+
+def save_arrays(path: str, arrays: dict, header: dict = None):
+    """
+    Saves flat typed arrays into one binary file. File is written under temporary name & then renamed,
+    so readers (also other processes mapping the file) never see it half-written.
+    :param arrays: dictionary - name -> numpy array
+    :param header: JSON-serializable dictionary saved with arrays
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = dict(header or {}, format_version=FORMAT_VERSION, arrays={})
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(file_descriptor, "wb") as file:
+        file.write(MAGIC)
+        file.write(len(header_bytes).to_bytes(8, "little"))
+        file.write(header_bytes)
+        for name, array in arrays.items():
+            file.seek(data_start + header["arrays"][name]["offset"])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(temporary_path, path)
+
+
+def read_header(file):
+    """
+    :param file: file opened for binary reading
+    :return: (header, offset of the first array)
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise RuntimeError("Not a graph file")
+    header_length = int.from_bytes(file.read(8), "little")
+    header = json.loads(file.read(header_length).decode())
+    if header.get("format_version") != FORMAT_VERSION:
+        raise RuntimeError("Unsupported graph file version: {}".format(header.get("format_version")))
+    return header, -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+
+def load_arrays(path: str):
+    """
+    Maps the file into memory - arrays are read-only views of the mapping, so nothing is read until it is used
+    & processes mapping the same file share its pages.
+    :return: (header, dictionary - name -> numpy array)
+    """
+    with open(path, "rb") as file:
+        header, data_start = read_header(file)
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b""
+    arrays = {}
+    for name, description in header.pop("arrays").items():
+        dtype = np.dtype(description["dtype"])
+        count = int(np.prod(description["shape"]))
+        arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count,
+                                     offset=data_start + description["offset"]).reshape(description["shape"])
+    return header, arrays
+
+
+def load_metadata(path: str):
+    """
+    :return: header of the file (graph kind, sizes & metadata saved with it), without touching arrays
+    """
+    with open(path, "rb") as file:
+        header, _ = read_header(file)
+    header.pop("arrays")
+    return header
+
+
+def encode_labels(labels: list):
+    """
+    :return: labels as UTF-8 bytes (uint8 array), separated by zero bytes
+    """
+    return np.frombuffer("\0".join(str(label) for label in labels).encode(), dtype=np.uint8)
+
+
+def decode_labels(data: np.ndarray, vertex_count: int):
+    """
+    :return: list of labels encoded by encode_labels
+    """
+    labels = data.tobytes().decode().split("\0")
+    return labels if vertex_count else []
+
+
+def get_graph_arrays(graph: GenericGraph):
+    """
+    :return: dictionary of arrays describing vertices & edges of the graph
+    """
+    if isinstance(graph, G1):
+        graph.apply_duplicates()
+    g = graph.graph
+    edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    index_type = np.int32 if g.vcount() < 2 ** 31 else np.int64
+    flags = np.zeros(g.ecount(), dtype=np.uint8)
+    for bit, attribute in ((DIRECTED, "directed"), (TRANSFORMED, "transformed"), (PENALTY, "IsPenalty")):
+        if attribute in g.es.attributes():
+            flags |= np.array([bool(value) for value in g.es[attribute]], dtype=np.uint8) * np.uint8(bit)
+    weights = np.asarray(g.es["weight"] if "weight" in g.es.attributes() else np.ones(g.ecount()))
+    if weights.dtype.kind not in "iuf":
+        # object array (e.g. missing weights) - raw objects can not be written to the file
+        invalid = {type(weight).__name__ for weight in weights.tolist()
+                   if not isinstance(weight, (int, float, np.integer, np.floating))}
+        if invalid:
+            raise RuntimeError("Weights of edges have to be numbers to be saved, got: {}".format(
+                ", ".join(sorted(invalid))))
+        weights = weights.astype(np.float64)
+    arrays = {"sources": edges[:, 0].astype(index_type), "targets": edges[:, 1].astype(index_type), "flags": flags,
+              "weights": weights, "labels": encode_labels(graph.get_vertex_labels())}
+    if getattr(graph, "traversal_counts", None) is not None:
+        arrays["traversal_counts"] = graph.traversal_counts
+    return arrays
+
+
+def build_graph_from_arrays(header: dict, arrays: dict):
+    """
+    Builds graph G or G1 from arrays, with all edges & attributes set in bulk.
+    """
+    vertex_count = header["vertex_count"]
+    labels = decode_labels(arrays["labels"], vertex_count)
+    flags = arrays["flags"]
+    if header["kind"] == "G":
+        return PartiallyDirectedGraph.from_edge_arrays(arrays["sources"], arrays["targets"], flags & DIRECTED,
+                                                       arrays["weights"], labels, vertex_count)
+
+    graph = Graph(n=vertex_count, edges=GenericGraph.make_edge_list(arrays["sources"], arrays["targets"]),
+                  directed=True)
+    graph.vs["label"] = labels
+    graph.es["weight"] = arrays["weights"].tolist()
+    graph.es["directed"] = True
+    graph.es["transformed"] = (flags & TRANSFORMED).astype(bool).tolist()
+    graph.es["IsPenalty"] = (flags & PENALTY).astype(bool).tolist()
+    graph_G1 = G1.__new__(G1)
+    GenericGraph.__init__(graph_G1, graph)
+    if "traversal_counts" in arrays:
+        graph_G1.traversal_counts = np.array(arrays["traversal_counts"])
+    return graph_G1
+
+
+def save_graph(path: str, graph: GenericGraph, metadata: dict = None):
+    """
+    Saves graph G (PartiallyDirectedGraph) or G1 in binary format.
+    :param metadata: JSON-serializable dictionary saved with the graph (see load_metadata)
+    """
+    kind = "G" if isinstance(graph, PartiallyDirectedGraph) else "G1"
+    header = {"kind": kind, "vertex_count": graph.graph.vcount(), "edge_count": graph.graph.ecount(),
+              "metadata": metadata or {}}
+    save_arrays(path, get_graph_arrays(graph), header)
+
+
+def load_graph(path: str):
+    """
+    :return: graph G (PartiallyDirectedGraph) or G1 saved by save_graph (or graph of a tour saved by save_tour)
+    """
+    header, arrays = load_arrays(path)
+    return build_graph_from_arrays(header, arrays)
+
+
+def save_tour(path: str, tour: PostmanTour):
+    """
+    Saves solved tour together with its (balanced) graph in binary format.
+    """
+    arrays = get_graph_arrays(tour.graph)
+    arrays["tour_vertices"] = tour.vertex_ids
+    arrays["tour_edges"] = tour.edge_ids
+    header = {"kind": "G1", "vertex_count": tour.graph.graph.vcount(), "edge_count": tour.graph.graph.ecount(),
+              "metadata": {"cost": tour.cost, "penalties": tour.penalties, "stats": tour.stats}}
+    save_arrays(path, arrays, header)
+
+
+def load_tour(path: str):
+    """
+    :return: PostmanTour saved by save_tour (its vertex & edge ids are memory-mapped arrays)
+    """
+    header, arrays = load_arrays(path)
+    metadata = header["metadata"]
+    return PostmanTour(build_graph_from_arrays(header, arrays), metadata["cost"], arrays["tour_vertices"],
+                       arrays["tour_edges"], metadata["penalties"], metadata["stats"])
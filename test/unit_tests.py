@@ -1,5 +1,28 @@
+import copy
+import csv
+import http.client
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
 import unittest
+from contextlib import redirect_stdout
 from algorithm import *
+from balancing import solve_transportation, solve_assignment
+from compact import CompactGraph
+from incremental import IncrementalPostman
+from solution_cache import SolutionCache
+import benchmarks
+import experiments
+import generators
+import postman
+import regions
+import service
+import storage
 
 
 class MyTestCase(unittest.TestCase):
@@ -141,5 +164,762 @@ class MyTestCase(unittest.TestCase):
         self.assertIsNone(edge)
 
 
+    def test_creating_from_edge_arrays(self):
+        """
+        Test alternative constructors of graph G - from edge arrays & from sparse full adjacency matrix.
+        Both have to give the same graph as the one created from dense full adjacency matrix.
+        """
+
+        full_adj_mat = np.array([
+            [-1, 0,-1, 1],  # a
+            [ 1,-1, 0,-1],  # b
+            [ 0, 1,-1, 0],  # c
+            [ 0, 0, 0, 0]   # d
+        ])
+        weights = [1, 2, 3, 4]
+        g = PartiallyDirectedGraph(full_adj_mat, weights)
+
+        g_arr = PartiallyDirectedGraph.from_edge_arrays(
+            sources=np.array([1, 2, 0, 0]),
+            targets=np.array([0, 1, 2, 1]),
+            directed=np.array([True, True, False, True]),
+            weights=np.array(weights),
+            vertex_count=4
+        )
+        self.assertEqual(g.graph.get_edgelist(), g_arr.graph.get_edgelist())
+        self.assertEqual(g.graph.es["directed"], g_arr.graph.es["directed"])
+        self.assertEqual(g.graph.es["weight"], g_arr.graph.es["weight"])
+        self.assertEqual(g.graph.vs["label"], g_arr.graph.vs["label"])
+
+        with self.assertRaises(RuntimeError):
+            PartiallyDirectedGraph.from_incidence(np.array([[1, 1], [-1, 0]]), [1, 1])
+
+        try:
+            from scipy.sparse import csc_matrix
+        except ImportError:
+            self.skipTest("scipy not installed")
+        g_sparse = PartiallyDirectedGraph.from_incidence(csc_matrix(full_adj_mat), weights)
+        self.assertEqual(g.graph.get_edgelist(), g_sparse.graph.get_edgelist())
+        self.assertEqual(g.graph.es["directed"], g_sparse.graph.es["directed"])
+
+
+    def test_comparing_full_adj_mats_as_multisets(self):
+        """
+        Test comparing full adjacency matrices - order of columns & ends of undirected edges do not matter,
+        but number of parallel edges does.
+        """
+
+        full_adj_mat = np.array([
+            [ 1, 1,-1],  # a
+            [-1,-1, 0],  # b
+            [ 0, 0,-1]   # c
+        ])
+        shuffled = np.array([
+            [-1, 1, 1],  # a
+            [ 0,-1,-1],  # b
+            [-1, 0, 0]   # c
+        ])
+        not_parallel = np.array([
+            [ 1,-1,-1],  # a
+            [-1, 1, 0],  # b
+            [ 0, 0,-1]   # c
+        ])
+        self.assertTrue(PartiallyDirectedGraph.are_full_adj_mat_equal(full_adj_mat, shuffled))
+        self.assertFalse(PartiallyDirectedGraph.are_full_adj_mat_equal(full_adj_mat, not_parallel))
+        self.assertFalse(PartiallyDirectedGraph.are_full_adj_mat_equal(not_parallel, full_adj_mat))
+
+
+    def test_orienting_undirected_edges(self):
+        """
+        Test greedy orientation of undirected edges - edges keep their ids & balanced orientation is chosen.
+        """
+
+        full_adj_mat = np.array([
+            [-1,-1, 0],  # a
+            [-1, 0, 1],  # b
+            [ 0,-1,-1]   # c
+        ])
+        # a<->b; a<->c; b->c : edges
+        g = PartiallyDirectedGraph(full_adj_mat, [1, 2, 3])
+        g1 = G1(g)
+        self.assertEqual([(0, 1), (2, 0), (1, 2)], g1.graph.get_edgelist())
+        self.assertEqual([True, True, False], g1.graph.es["transformed"])
+        self.assertEqual([1, 2, 3], g1.graph.es["weight"])
+        self.assertEqual(g1.graph.indegree(), g1.graph.outdegree())
+
+
+    def test_doc_fig7_flow_balancing(self):
+        """
+        Test finding chinese postman's tour with balancing based on transportation problem.
+        Uses graph depicted on fig. 7 in documentation - cost has to be the same as with matching.
+        """
+
+        # graph G1 depicted on fig. 7 in documentation (edges d->f & f->c are undirected)
+        full_adjacency_matrix = np.array([
+            [ 1, 1,-1, 0, 0, 0, 0, 0, 0, 0, 0],  # a
+            [-1, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0],  # b
+            [ 0,-1, 0, 0, 0, 1, 1,-1, 0, 0, 0],  # c
+            [ 0, 0, 0, 0,-1, 0,-1, 0, 1,-1, 0],  # d
+            [ 0, 0, 1,-1, 0,-1, 0, 0,-1, 0, 1],  # e
+            [ 0, 0, 0, 0, 0, 0, 0,-1, 0,-1,-1]   # f
+        ])
+        labels = ["a", "b", "c", "d", "e", "f"]
+        weights = [10, 20, 12, 11, 12, 18, 20, 22, 5, 14, 3]
+        g1 = G1(PartiallyDirectedGraph(full_adjacency_matrix, weights, labels))
+        cost, tour, _, _ = g1.get_postman_tour(
+            useAvgPenalty=False,
+            penalty=None,
+            starting_vertex_label='a',
+            useConstW=True,
+            constW=80,
+            balancing="flow"
+        )
+        self.assertEqual(200, cost)
+        self.assertEqual('a', tour[0])
+        self.assertEqual('a', tour[-1])
+
+    def test_solving_transportation_problem(self):
+        """
+        Test transportation problem solver - vertex with supply 3 has to serve both cheap demand vertices.
+        """
+
+        costs = np.array([
+            [ 1, 2, 9],
+            [ 5, 5, 1]
+        ])
+        flows = solve_transportation([3, 1], [2, 1, 1], costs)
+        expected_flows = np.array([
+            [ 2, 1, 0],
+            [ 0, 0, 1]
+        ])
+        self.assertTrue(np.array_equal(expected_flows, flows))
+
+        with self.assertRaises(RuntimeError):
+            solve_transportation([1], [1], np.array([[np.inf]]))
+
+
+    def test_shortest_paths_from_predecessor_trees(self):
+        """
+        Test shortest paths between unbalanced vertices - paths are reconstructed from stored predecessor trees.
+        """
+
+        g = Graph([(0, 1), (1, 2), (0, 2), (2, 3), (3, 0)], directed=True)
+        g.es["weight"] = [1, 1, 5, 2, 1]
+        paths = ShortestPaths(GenericGraph(g), sources=[0, 2], targets=[2, 3])
+        self.assertEqual(2, paths.get_distance(0, 2))
+        self.assertEqual(4, paths.get_distance(0, 3))
+        self.assertEqual(0, paths.get_distance(2, 2))
+        self.assertEqual([0, 1, 3], paths.get_edge_path(0, 3))
+        self.assertEqual([3], paths.get_edge_path(2, 3))
+        self.assertEqual([], paths.get_edge_path(2, 2))
+
+
+    def test_vertex_label_index(self):
+        """
+        Test cached label -> vertex index mapping, including its rebuilding after labels have changed.
+        """
+
+        full_adj_mat = np.array([
+            [ 1, 0,-1],  # a
+            [-1,-1, 0],  # b
+            [ 0,-1, 1]   # c
+        ])
+        g = PartiallyDirectedGraph(full_adj_mat, [1, 1, 1], ["a", "b", "c"])
+        self.assertEqual(1, g.get_vertex_index("b"))
+        with self.assertRaises(UnknownVertexLabel):
+            g.get_vertex_index("x")
+
+        g.graph.vs["label"] = ["x", "y", "z"]
+        self.assertEqual(0, g.get_vertex_index("x"))
+        self.assertRaises(LookupError, g.get_vertex_index, "a")
+        g.graph.add_vertex(label="w")
+        self.assertEqual(["x", "y", "z", "w"], g.get_vertex_labels())
+        self.assertEqual(3, g.get_vertex_index("w"))
+        g.graph.vs["label"] = ["y", "x", "z", "w"]
+        self.assertEqual(0, g.get_vertex_index("y"))
+
+        g1 = G1(PartiallyDirectedGraph(full_adj_mat, [1, 1, 1], ["a", "b", "c"]))
+        _, tour, tour_by_id, _ = g1.get_postman_tour(False, 3, None, starting_vertex=2)
+        self.assertEqual(2, tour_by_id[0])
+        self.assertEqual("c", tour[0])
+
+
+    def test_euler_cycle_with_parallel_edges(self):
+        """
+        Test finding Euler cycle in graph with parallel edges of different weights - every edge is used once.
+        """
+
+        full_adj_mat = np.array([
+            [ 1, 1,-1,-1],  # a
+            [-1,-1, 1, 1]   # b
+        ])
+        g1 = G1(PartiallyDirectedGraph(full_adj_mat, [1, 5, 2, 2]))
+        cost, tour, tour_by_id, edges = g1.FindEuler("a")
+        self.assertEqual(10, cost)
+        self.assertEqual(['a', 'b', 'a', 'b', 'a'], tour)
+        self.assertEqual([0, 1, 2, 3], sorted(edges))
+        for i, edge_id in enumerate(edges):
+            self.assertEqual((tour_by_id[i], tour_by_id[i + 1]), g1.graph.es[edge_id].tuple)
+
+
+    def test_quiet_postman_tour(self):
+        """
+        Test quiet mode of finding chinese postman's tour - nothing is printed & result object is returned.
+        Uses graph depicted on fig. 2 in documentation (with c->a edge reversed, so balancing is needed).
+        """
+
+        full_adjacency_matrix_sample = np.array([
+            [ 1, 0, 1],  # a
+            [-1,-1, 0],  # b
+            [ 0,-1,-1]   # c
+        ])
+        g1 = G1(PartiallyDirectedGraph(full_adjacency_matrix_sample, [1, 1, 1], ["a", "b", "c"]))
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            result = g1.get_postman_tour(False, 3, "a", quiet=True)
+        self.assertEqual("", stdout.getvalue())
+
+        self.assertIsInstance(result, PostmanTour)
+        self.assertEqual(len(result), result.vertex_ids.size - 1)
+        self.assertEqual(result.cost, sum(g1.graph.es[e]["weight"] for e in result.edge_ids.tolist()))
+        self.assertIn("time_euler_cycle", result.stats)
+        route = list(result.iter_route())
+        self.assertEqual("a", route[0])
+        self.assertEqual("a", route[-1])
+
+        output = io.StringIO()
+        result.write_route(output, separator=",", chunk_size=2)
+        self.assertEqual(",".join(route) + "\n", output.getvalue())
+
+
+    def test_min_cost_assignment(self):
+        """
+        Test minimum cost assignment in bipartite graph with big & float weights (no weight inversion is used).
+        """
+
+        gd = Graph.Full_Bipartite(2, 2)
+        # edges: 0-2, 0-3, 1-2, 1-3
+        gd.es["weight"] = [25000.5, 10000.0, 30000.0, 25000.5]
+        pairs = G1.get_min_cost_assignment(GenericGraph(gd))
+        self.assertEqual([(0, 3), (1, 2)], sorted(pairs))
+
+        rows, columns = solve_assignment(np.array([[1.5, np.inf], [np.inf, 2.5]]))
+        self.assertEqual([0, 1], columns.tolist())
+        with self.assertRaises(RuntimeError):
+            solve_assignment(np.array([[1.0, np.inf], [1.0, np.inf]]))
+
+
+    def test_parallel_experiments(self):
+        """
+        Test parallel experiment runner - results do not depend on number of processes & land in one CSV file.
+        """
+
+        grid = dict(experiments.PARAM_GRID, vertex_count=[8, 10], edge_count=[40], undirected_count=[10])
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "results.csv")
+            rows = experiments.run_experiments(grid, 2, output_path, processes=2, seed=7)
+            with open(output_path, newline='') as csvfile:
+                saved_rows = list(csv.DictReader(csvfile))
+
+        self.assertEqual(4, len(saved_rows))
+        self.assertEqual([str(row["cost"]) for row in rows], [row["cost"] for row in saved_rows])
+        self.assertIn("time_balancing", saved_rows[0])
+        single_row = experiments.run_experiment(experiments.make_tasks(grid, 2, seed=7)[3])
+        self.assertEqual(rows[3]["cost"], single_row["cost"])
+
+
+    def test_benchmark_regression_check(self):
+        """
+        Test benchmark suite - every stage gets measured & slowdown against the baseline is reported.
+        """
+
+        results = benchmarks.run_benchmarks([30], [0.5], report=lambda line: None)
+        stages = results["30/0.5"]
+        self.assertEqual(benchmarks.STAGES, list(stages.keys()))
+        self.assertTrue(all(stage["time"] >= 0 and stage["peak_memory"] >= 0 for stage in stages.values()))
+
+        baseline = {"30/0.5": {"balancing": {"time": 0.1, "peak_memory": 0}}}
+        slower = {"30/0.5": {"balancing": {"time": 0.2, "peak_memory": 0},
+                             "euler_cycle": {"time": 9.0, "peak_memory": 0}}}
+        self.assertEqual([("30/0.5", "balancing", 0.1, 0.2)], benchmarks.compare_with_baseline(slower, baseline))
+        self.assertEqual([], benchmarks.compare_with_baseline(baseline, slower))
+
+
+    def test_solve_monitor(self):
+        """
+        Test instrumentation of finding chinese postman's tour - stages & counters are recorded,
+        progress is reported & cancel callback stops solving.
+        """
+
+        full_adjacency_matrix_sample = np.array([
+            [ 1, 0, 1],  # a
+            [-1,-1, 0],  # b
+            [ 0,-1,-1]   # c
+        ])
+        g = PartiallyDirectedGraph(full_adjacency_matrix_sample, [1, 1, 1], ["a", "b", "c"])
+        progress = []
+        monitor = SolveMonitor(progress=lambda stage, fraction: progress.append((stage, fraction)))
+        result = G1(g).get_postman_tour(False, 3, "a", quiet=True, monitor=monitor)
+
+        self.assertEqual(SolveMonitor.STAGES, list(monitor.stages.keys()))
+        self.assertEqual(("euler_cycle", 1.0), progress[-1])
+        self.assertTrue(all(stage["cpu"] >= 0 for stage in monitor.stages.values()))
+        counters = monitor.report()["counters"]
+        self.assertEqual(result.penalties, counters["penalty_edges"])
+        self.assertEqual(result.stats["added_edges"], counters["duplicated_edges"])
+        self.assertEqual(1, counters["shortest_path_searches"])
+        self.assertEqual(4, counters["bipartite_edges"])
+
+        monitor = SolveMonitor(progress=lambda stage, fraction: progress.append(stage),
+                               cancel=lambda: "shortest_paths" in progress, trace_memory=True)
+        progress.clear()
+        with self.assertRaises(SolveCancelled):
+            G1(g).get_postman_tour(False, 3, "a", quiet=True, monitor=monitor)
+        self.assertEqual(["penalty_graph", "shortest_paths"], progress)
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+    def test_incremental_resolve(self):
+        """
+        Test incremental solving - after every change of the network the tour costs the same as when solved
+        from scratch (with the same orientation), while results of unaffected searches are reused.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(60, 0.5, seed=3)
+        g = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights, vertex_count=60)
+        solver = IncrementalPostman(g, False, 3)
+        self.assertEqual(0, solver.solve().stats["reused_sources"])
+
+        changes = [dict(weights={100: 95}), dict(closed=[101]), dict(directions={102: None, 103: int(targets[103])}),
+                   dict(opened=[101], weights={104: 10})]
+        reused_sources = 0
+        for change in changes:
+            result = solver.update(**change)
+            reused_sources += result.stats["reused_sources"]
+            cold_solver = copy.deepcopy(solver)
+            cold_solver.paths = cold_solver.flows = cold_solver.penalty_edges = None
+            self.assertEqual(cold_solver.solve().cost, result.cost)
+            self.assertEqual(len(result), result.graph.get_traversal_counts().sum())
+        self.assertGreater(reused_sources, 0)
+        self.assertFalse(solver.directed[102])
+        self.assertEqual(targets[103], solver.sources[103])
+
+        # warm start of transportation problem gives optimal flows as well
+        costs = np.array([[4.0, 1.0], [2.0, 3.0]])
+        flows = solve_transportation([1, 1], [1, 1], costs, initial_flows=[[1, 0], [0, 1]])
+        self.assertEqual([[0, 1], [1, 0]], flows.tolist())
+
+
+    def test_solution_cache(self):
+        """
+        Test solution cache - the same network (with edges given in other order) hits the cache,
+        other start vertex reuses balanced network & on-disk store is shared between caches.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(40, 0.5, seed=4)
+        g = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights, vertex_count=40)
+        order = np.arange(sources.size)[::-1]
+        is_swapped = ~directed[order]     # undirected edges may be given with ends swapped
+        g_reordered = PartiallyDirectedGraph.from_edge_arrays(
+            np.where(is_swapped, targets[order], sources[order]), np.where(is_swapped, sources[order], targets[order]),
+            directed[order], weights[order], vertex_count=40)
+        key = SolutionCache.get_network_key(g, False, 3)
+        self.assertEqual(key, SolutionCache.get_network_key(g_reordered, False, 3))
+        self.assertNotEqual(key, SolutionCache.get_network_key(g, False, 4))
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SolutionCache(directory=directory)
+            result = cache.get_postman_tour(g, False, 3, "0")
+            self.assertIs(result, cache.get_postman_tour(g_reordered, False, 3, "0"))
+            other_start = cache.get_postman_tour(g, False, 3, "5")
+            self.assertEqual((1, 1, 1), (cache.misses, cache.network_hits, cache.hits))
+            self.assertEqual(result.cost, other_start.cost)
+            self.assertEqual("5", next(other_start.iter_route()))
+
+            loaded = SolutionCache(directory=directory).get_postman_tour(g, False, 3, "7")
+            self.assertEqual(result.cost, loaded.cost)
+            self.assertEqual(result.penalties, loaded.penalties)
+            self.assertEqual(len(result), len(loaded))
+
+
+    def test_rotating_tour_for_many_starts(self):
+        """
+        Test tours for many starting vertices - one solve, the cycle is rotated for every start vertex.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(30, 0.5, seed=5)
+        g = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights, vertex_count=30)
+        g1 = G1(g)
+        tours = g1.get_postman_tours(False, 3, ["0", "7", "12"])
+        self.assertEqual(3, len(tours))
+        edge_list = g1.graph.get_edgelist()
+        for label, tour in zip(["0", "7", "12"], tours):
+            route = list(tour.iter_route())
+            self.assertEqual((label, label), (route[0], route[-1]))
+            self.assertEqual(tours[0].cost, tour.cost)
+            self.assertEqual(sorted(tours[0].edge_ids.tolist()), sorted(tour.edge_ids.tolist()))
+            for position, edge_id in enumerate(tour.edge_ids.tolist()):
+                self.assertEqual(edge_list[edge_id], tuple(tour.vertex_ids[position:position + 2].tolist()))
+
+        with self.assertRaises(RuntimeError):
+            tours[0].rotate(30)
+
+
+    def test_penalty_sweep(self):
+        """
+        Test sweep over penalty values - results are the same as of separate solves & G1 is not changed.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(40, 0.5, seed=6)
+        g = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights, vertex_count=40)
+        penalties = [4, 1, 2, 8]
+        for useAvgPenalty in (False, True):
+            g1 = G1(g)
+            results = g1.penalty_sweep(penalties, useAvgPenalty)
+            self.assertEqual(sources.size, g1.graph.ecount())
+            self.assertEqual(penalties, [result["penalty"] for result in results])
+            for penalty, result in zip(penalties, results):
+                tour = G1(g).get_postman_tour(useAvgPenalty, penalty, "0", balancing="flow", quiet=True)
+                self.assertEqual(tour.cost, result["cost"])
+                self.assertEqual(tour.penalties, result["penalty_edges"])
+
+        # penalty edges of G2 are added in bulk - reverse edge of i-th edge has id (edges + i)
+        g2 = G1(g).add_penaltyTm_edges(3)
+        edge_count = sources.size
+        self.assertEqual(2 * edge_count, g2.graph.ecount())
+        self.assertEqual(g2.graph.es[0].tuple[::-1], g2.graph.es[edge_count].tuple)
+        self.assertEqual(directed.tolist(), g2.graph.es[edge_count:]["IsPenalty"])
+
+
+    def test_binary_graph_format(self):
+        """
+        Test binary format - graphs & tours are saved as flat arrays & loaded back (memory-mapped) unchanged.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(30, 0.5, seed=7)
+        g = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights, vertex_count=30)
+        g1 = G1(g)
+        tour = g1.get_postman_tour(False, 3, "0", quiet=True)
+        with tempfile.TemporaryDirectory() as directory:
+            storage.save_graph(os.path.join(directory, "g.graph"), g, {"name": "test"})
+            storage.save_tour(os.path.join(directory, "tour.graph"), tour)
+
+            loaded_g = storage.load_graph(os.path.join(directory, "g.graph"))
+            self.assertIsInstance(loaded_g, PartiallyDirectedGraph)
+            self.assertEqual(g.graph.get_edgelist(), loaded_g.graph.get_edgelist())
+            self.assertEqual(g.graph.es["directed"], loaded_g.graph.es["directed"])
+            self.assertEqual(g.graph.es["weight"], loaded_g.graph.es["weight"])
+            self.assertEqual(g.get_vertex_labels(), loaded_g.get_vertex_labels())
+            self.assertEqual({"name": "test"}, storage.load_metadata(os.path.join(directory, "g.graph"))["metadata"])
+
+            header, arrays = storage.load_arrays(os.path.join(directory, "tour.graph"))
+            self.assertEqual("G1", header["kind"])
+            self.assertFalse(arrays["sources"].flags.writeable)     # view of the mapped file
+            loaded_tour = storage.load_tour(os.path.join(directory, "tour.graph"))
+            self.assertIsInstance(loaded_tour.graph, G1)
+            self.assertEqual((tour.cost, tour.penalties), (loaded_tour.cost, loaded_tour.penalties))
+            self.assertEqual(list(tour.iter_route()), list(loaded_tour.iter_route()))
+            self.assertEqual(tour.graph.graph.es["IsPenalty"], loaded_tour.graph.graph.es["IsPenalty"])
+            del header, arrays, loaded_tour
+
+            mixed_g = PartiallyDirectedGraph.from_edge_arrays([0, 1], [1, 0], [True, True])
+            mixed_g.graph.es["weight"] = [1, 2 ** 70]     # object array
+            storage.save_graph(os.path.join(directory, "mixed.graph"), mixed_g)
+            self.assertEqual([1.0, 2.0 ** 70],
+                             storage.load_graph(os.path.join(directory, "mixed.graph")).graph.es["weight"])
+            with self.assertRaises(RuntimeError):
+                storage.save_graph(os.path.join(directory, "none.graph"),
+                                   PartiallyDirectedGraph.from_edge_arrays([0, 1], [1, 0], [True, True]))
+
+
+    def test_command_line_entry_point(self):
+        """
+        Test command line entry point - the tour is written for text edge list & binary graph file,
+        while importing the entry point itself loads neither numpy nor igraph.
+        """
+
+        code = "import postman, sys; print('numpy' in sys.modules or 'igraph' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(postman.__file__)))
+        self.assertEqual("False", output.stdout.strip())
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(20, 0.5, seed=8)
+        with tempfile.TemporaryDirectory() as directory:
+            text_path = os.path.join(directory, "network.txt")
+            np.savetxt(text_path, np.column_stack((sources, targets, directed, weights)), fmt="%d", delimiter=",")
+            binary_path = os.path.join(directory, "network.graph")
+            storage.save_graph(binary_path, PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed,
+                                                                                    weights))
+            routes = []
+            for network_path in (text_path, binary_path):
+                tour_path = os.path.join(directory, "tour.txt")
+                self.assertEqual(0, postman.main([network_path, "--start", "d", "--output", tour_path]))
+                with open(tour_path) as file:
+                    routes.append(file.read().split())
+        self.assertEqual(routes[0], routes[1])
+        self.assertEqual(("d", "d"), (routes[0][0], routes[0][-1]))
+        self.assertGreater(len(routes[0]), sources.size)
+
+
+    def test_solver_service(self):
+        """
+        Test solver service - requests queued together against one network are solved once (& rotated),
+        results match direct solves & are served over HTTP on localhost.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(30, 0.5, seed=9)
+        graph_G = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights)
+        labels = graph_G.get_vertex_labels()
+        solver = service.SolverService()
+        solver.add_network("city", graph_G)
+        futures = [solver.submit("city", 3, False, label) for label in labels[:5]]
+        unknown = solver.submit("village")
+        solver.start()
+        tours = [future.result(timeout=10) for future in futures]
+        self.assertRaises(RuntimeError, unknown.result, 10)
+        expected = G1(graph_G).get_postman_tour(False, 3, labels[0], balancing="flow", quiet=True)
+        self.assertEqual([expected.cost] * 5, [tour.cost for tour in tours])
+        self.assertEqual(labels[:5], [tour.iter_route().__next__() for tour in tours])
+        stats = solver.get_stats()
+        self.assertEqual((6, 1, 1, 1), (stats["requests"], stats["batches"], stats["solves"], stats["errors"]))
+
+        # unknown start label fails only its own request of the batch
+        solver.stop()
+        valid, invalid = solver.submit("city", 3, False, labels[1]), solver.submit("city", 3, False, "nope")
+        solver.start()
+        self.assertEqual((expected.cost, labels[1]), (valid.result(10).cost, next(valid.result(10).iter_route())))
+        self.assertRaises(UnknownVertexLabel, invalid.result, 10)
+        self.assertEqual(2, solver.get_stats()["errors"])
+
+        server = service.make_server(solver)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+            connection.request("POST", "/networks/town", json.dumps(
+                {"edges": np.column_stack((sources, targets, directed, weights)).tolist()}))
+            self.assertEqual(200, connection.getresponse().status)
+            connection.request("POST", "/solve", json.dumps({"network": "town", "start": labels[3]}))
+            answer = json.loads(connection.getresponse().read())
+            self.assertEqual(expected.cost, answer["cost"])
+            self.assertEqual((labels[3], len(tours[3]) + 1), (answer["tour"][0], len(answer["tour"])))
+            connection.request("GET", "/stats")
+            self.assertEqual(9, json.loads(connection.getresponse().read())["requests"])
+            for body in ([], {"network": "town", "penalty": "x"}):
+                connection.request("POST", "/solve", json.dumps(body))
+                response = connection.getresponse()
+                self.assertEqual(400, response.status)
+                self.assertIn("error", json.loads(response.read()))
+        finally:
+            server.shutdown()
+            server.server_close()
+            solver.stop()
+
+
+    def test_solve_by_regions(self):
+        """
+        Test solving by regions - the tour goes through every edge of G1 (stitched into one cycle),
+        one region gives the monolithic solution & cost gap is reported.
+        """
+
+        grid = np.array(Graph.Lattice([8, 8], circular=False).get_edgelist())
+        rng = np.random.default_rng(4)
+        directed = rng.random(len(grid)) < 0.6
+        weights = rng.integers(10, 101, len(grid))
+        graph_G = PartiallyDirectedGraph.from_edge_arrays(grid[:, 0], grid[:, 1], directed, weights)
+        monolithic = G1(graph_G).get_postman_tour(False, 3, None, balancing="flow", starting_vertex=0, quiet=True)
+
+        tour = regions.solve_by_regions(graph_G, False, 3, region_count=1, processes=1)
+        self.assertEqual(monolithic.cost, tour.cost)
+        district_labels = ["north" if vertex < 32 else "south" for vertex in range(64)]
+        by_districts = regions.solve_by_regions(graph_G, False, 3, region_labels=district_labels, compare=True,
+                                                processes=1)
+        self.assertEqual((2, 8), (by_districts.stats["regions"], by_districts.stats["boundary_edges"]))
+        self.assertEqual(monolithic.cost, by_districts.stats["monolithic_cost"])
+        self.assertAlmostEqual((by_districts.cost - monolithic.cost) / monolithic.cost, by_districts.stats["cost_gap"])
+        for tour in (by_districts, regions.solve_by_regions(graph_G, False, 3, region_count=4, processes=2)):
+            g = tour.graph.graph
+            self.assertEqual(g.ecount(), len(set(tour.edge_ids.tolist())))
+            self.assertEqual(tour.vertex_ids[1:].tolist(), [g.es[e].target for e in tour.edge_ids.tolist()])
+            self.assertGreaterEqual(tour.cost, monolithic.cost)
+
+
+    def test_compact_graph(self):
+        """
+        Test array-backed graph - the same tour cost & penalties as igraph-based solve (flow balancing),
+        tens of bytes per edge & igraph's graph built only on request.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(40, 0.5, seed=10)
+        graph_G = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights)
+        expected = G1(graph_G).get_postman_tour(False, 3, None, balancing="flow", starting_vertex=2, quiet=True)
+
+        compact_G = CompactGraph.from_edge_arrays(sources, targets, directed, weights)
+        self.assertLess(compact_G.nbytes, 32 * sources.size)
+        self.assertEqual(np.int32, compact_G.weights.dtype)
+        tour = compact_G.get_postman_tour(False, 3, "2")
+        self.assertEqual((expected.cost, expected.penalties, len(expected)), (tour.cost, tour.penalties, len(tour)))
+        self.assertEqual(["2", "2"], [tour.graph.get_vertex_labels()[v] for v in tour.vertex_ids[[0, -1]]])
+        with self.assertRaises(UnknownVertexLabel):
+            compact_G.get_postman_tour(False, 3, "nope")
+        g2 = tour.graph
+        self.assertEqual(tour.vertex_ids[1:].tolist(), g2.targets[tour.edge_ids].tolist())
+
+        g1 = compact_G.orient()
+        self.assertEqual(G1(graph_G).graph.get_edgelist(), g1.to_igraph().get_edgelist())
+        self.assertEqual(graph_G.graph.es["directed"], compact_G.to_partially_directed().graph.es["directed"])
+        self.assertTrue(CompactGraph.from_graph(graph_G).is_connected())
+        self.assertFalse(CompactGraph.from_edge_arrays([0, 2], [1, 3], [True, True]).is_connected())
+
+
+    def test_feasibility_precheck(self):
+        """
+        Test feasibility precheck - one-way dead end is reported (& rejected in strict mode),
+        disconnected network is rejected with report of its components.
+        """
+
+        # a -> b, b - c (undirected), c -> a, b -> d: d is a dead end
+        graph_G = PartiallyDirectedGraph.from_edge_arrays([0, 1, 2, 1], [1, 2, 0, 3], [True, False, True, True],
+                                                          [1, 2, 3, 4])
+        feasibility = graph_G.check_feasibility()
+        self.assertEqual((True, False), (feasibility.is_connected, feasibility.is_strongly_connected))
+        self.assertEqual(([3], [], [3]), (feasibility.dead_ends.tolist(), feasibility.unreachable.tolist(),
+                                          feasibility.bridging_edges.tolist()))
+        self.assertEqual(feasibility.as_dict(), G1(graph_G).check_feasibility().as_dict())
+        self.assertIn("dead ends: d", feasibility.describe(graph_G.get_vertex_labels()))
+
+        tour = G1(graph_G).get_postman_tour(False, 3, "a", balancing="flow", quiet=True)
+        self.assertGreater(tour.penalties, 0)
+        with self.assertRaises(InfeasibleNetwork) as context:
+            G1(graph_G).get_postman_tour(False, 3, "a", balancing="flow", quiet=True, strict=True)
+        self.assertEqual([3], context.exception.report.dead_ends.tolist())
+
+        disconnected = PartiallyDirectedGraph.from_edge_arrays([0, 1], [1, 0], [True, True], [1, 1], vertex_count=3)
+        with self.assertRaises(InfeasibleNetwork) as context:
+            G1(disconnected).get_postman_tour(False, 3, "a", quiet=True)
+        self.assertEqual([2], context.exception.report.isolated.tolist())
+        self.assertEqual(2, context.exception.report.as_dict()["weak_component_count"])
+
+
+    def test_traversal_counts(self):
+        """
+        Test traversal counts - an edge used by balancing many times is counted, not duplicated,
+        & Euler cycle goes through it as many times as its count says (also after saving & loading G1).
+        """
+
+        # a -> b three times, b -> a once: path b -> a has to be traversed twice more
+        graph_G = PartiallyDirectedGraph.from_edge_arrays([0, 0, 0, 1], [1, 1, 1, 0], [True] * 4, [2, 3, 4, 5])
+        for balancing in ("matching", "flow"):
+            g1 = G1(graph_G)
+            tour = g1.get_postman_tour(False, 3, "a", balancing=balancing, quiet=True)
+            self.assertEqual(4, g1.graph.ecount())
+            self.assertEqual([1, 1, 1, 3], g1.get_traversal_counts().tolist())
+            self.assertEqual((6, 24, 2), (len(tour), tour.cost, tour.stats["added_edges"]))
+            self.assertEqual(3, tour.edge_ids.tolist().count(3))
+
+        # penalty edge b -> a is added once, however many times it is used (paths b -> a & c -> b -> a)
+        graph_G = PartiallyDirectedGraph.from_edge_arrays([0, 0, 1], [1, 1, 2], [True, True, False], [1, 1, 1])
+        g1 = G1(graph_G)
+        tour = g1.get_postman_tour(False, 3, "a", balancing="flow", quiet=True)
+        self.assertEqual([1, 1, 1, 2, 1], g1.get_traversal_counts().tolist())
+        self.assertEqual((2, 10), (tour.penalties, tour.cost))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "g1.graph")
+            storage.save_graph(path, g1)
+            loaded = storage.load_graph(path)
+        self.assertEqual(g1.get_traversal_counts().tolist(), loaded.get_traversal_counts().tolist())
+        self.assertEqual(tour.cost, loaded.FindEuler(None, 0, quiet=True)[0])
+
+        # balanced G1 (also loaded one) is not balanced again
+        graph_G = PartiallyDirectedGraph.from_edge_arrays(*benchmarks.make_benchmark_graph(60, 0.3, seed=1))
+        for balancing in ("matching", "flow"):
+            g1 = G1(graph_G)
+            tour = g1.get_postman_tour(False, 3, None, balancing=balancing, starting_vertex=0, quiet=True)
+            counts = g1.get_traversal_counts().tolist()
+            again = g1.get_postman_tour(False, 3, None, balancing=balancing, starting_vertex=0, quiet=True)
+            self.assertEqual((tour.cost, len(tour), counts),
+                             (again.cost, len(again), g1.get_traversal_counts().tolist()))
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "g1.graph")
+                storage.save_graph(path, g1)
+                loaded = storage.load_graph(path)
+            self.assertEqual(tour.cost, loaded.get_postman_tour(False, 3, None, balancing=balancing, starting_vertex=0,
+                                                                quiet=True).cost)
+
+        # counts go to the very edge of g2 path, also among parallel edges of equal weight
+        g1 = G1(PartiallyDirectedGraph.from_edge_arrays([0, 0, 1], [1, 1, 0], [True] * 3, [1, 1, 1]))
+        g2 = g1.add_penaltyTm_edges(3)
+        g1.duplicate_edges([1, 4, 4], g2)
+        self.assertEqual([1, 2, 1, 2], g1.get_traversal_counts().tolist())
+        self.assertEqual(((1, 0), 1, 3), (g1.graph.es[3].tuple, g1.graph.es[3]["reverse_of"], g1.graph.es[3]["weight"]))
+
+
+    def test_anytime_tour(self):
+        """
+        Test anytime mode - greedy tour is returned when there is no time left, otherwise local search
+        over orientation of undirected edges gives valid tour, which is not worse than the greedy one.
+        """
+
+        sources, targets, directed, weights = benchmarks.make_benchmark_graph(60, 0.7, seed=4)
+        graph_G = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights)
+        greedy = G1(graph_G).get_postman_tour(False, 3, None, balancing="flow", starting_vertex=0, quiet=True)
+
+        rushed = G1(graph_G).get_postman_tour(False, 3, None, balancing="flow", starting_vertex=0, quiet=True,
+                                              time_budget=0)
+        self.assertEqual((greedy.cost, 0), (rushed.cost, rushed.stats["evaluations"]))
+
+        tour = G1(graph_G).get_postman_tour(False, 3, None, balancing="flow", starting_vertex=0, quiet=True,
+                                            time_budget=5)
+        self.assertEqual(greedy.cost, tour.stats["greedy_cost"])
+        self.assertLess(tour.cost, greedy.cost)
+        self.assertGreater(tour.stats["flipped_edges"], 0)
+        g = tour.graph.graph
+        self.assertEqual(tour.vertex_ids[1:].tolist(), [g.es[e].target for e in tour.edge_ids.tolist()])
+        self.assertEqual(tour.cost, sum(g.es[tour.edge_ids.tolist()]["weight"]))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cost, route, _, _ = G1(graph_G).get_postman_tour(False, 3, "0", balancing="flow", time_budget=5)
+        self.assertEqual((tour.cost, "0"), (cost, route[0]))
+        self.assertIn(" -> ".join(route), output.getvalue())
+
+        # local search reports progress & can be cancelled
+        stages = []
+        monitor = SolveMonitor(progress=lambda stage, fraction: stages.append(stage),
+                               cancel=lambda: stages.count("anytime_search") >= 3)
+        with self.assertRaises(SolveCancelled):
+            G1(graph_G).get_postman_tour(False, 3, None, balancing="flow", starting_vertex=0, quiet=True,
+                                         monitor=monitor, time_budget=5)
+        self.assertEqual((3, 3), (stages.count("anytime_search"), monitor.counters["anytime_evaluations"]))
+
+
+    def test_graph_generators(self):
+        """
+        Test graph generators - connected graphs of every family, given ratio of undirected edges, repeatable seeds.
+        """
+
+        for family, vertex_count, strongly_connected in [("random", 300, True), ("random", 300, False),
+                                                         ("grid", 400, True), ("grid", 399, True), ("road", 400, True),
+                                                         ("road", 400, False)]:
+            sources, targets, directed, weights = generators.generate_graph(
+                vertex_count, 900, 0.25, family, weight_distribution="length" if family == "road" else "normal",
+                strongly_connected=strongly_connected, seed=3)
+            self.assertTrue(((sources >= 0) & (sources < vertex_count) & (sources != targets)).all())
+            self.assertTrue(((weights >= 10) & (weights <= 100)).all())
+            report = PartiallyDirectedGraph.from_edge_arrays(sources, targets, directed, weights,
+                                                             vertex_count=vertex_count).check_feasibility()
+            self.assertTrue(report.is_connected)
+            self.assertEqual(strongly_connected, report.is_strongly_connected)
+            if family == "random" or not strongly_connected:
+                self.assertEqual(round(0.25 * sources.size), (~directed).sum())
+            else:
+                self.assertGreaterEqual((~directed).sum(), round(0.25 * sources.size))
+            again = generators.generate_graph(vertex_count, 900, 0.25, family, strongly_connected=strongly_connected,
+                                              weight_distribution="length" if family == "road" else "normal", seed=3)
+            self.assertTrue(all(np.array_equal(a, b) for a, b in zip((sources, targets, directed, weights), again)))
+        self.assertEqual(900, generators.generate_graph(300, 900, family="random", seed=1)[0].size)
+        self.assertEqual(2 * 20 * 19, generators.generate_graph(400, family="grid", seed=1)[0].size)
+        with self.assertRaises(RuntimeError):
+            generators.generate_graph(10, family="hexagonal")
+
+
 if __name__ == '__main__':
     unittest.main()